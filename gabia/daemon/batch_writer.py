@@ -0,0 +1,206 @@
+# /srv/iot/batch_writer.py
+"""
+DB 묶음 INSERT 기록기
+
+MQTT 콜백은 put()으로 행을 큐에 넣기만 하고, 기록 스레드가
+batch_size개가 모이거나 flush_ms가 지나면 executemany + commit 한 번으로 넣는다.
+(mysql.connector는 INSERT ... VALUES executemany를 multi-VALUES 한 문장으로 바꿔 보냄)
+
+  - 큐는 queue_size로 제한, 가득 차면 새 행을 버리고 dropped 증가 (MQTT 스레드는 안 막힘)
+  - 실행/커밋이 실패하면 연결을 새로 맺고 같은 묶음을 다시 시도 (지수 백오프, 최대 max_backoff초)
+  - close()는 남은 행을 모두 넣고 끝냄
+
+연결은 connect() 함수로 받으므로 MySQL / SQLite 어느 쪽이든 쓸 수 있다.
+SQLite로 동작 확인 (끊김/재연결 포함):
+    python batch_writer.py selftest
+"""
+
+import logging, queue, threading, time
+
+_STOP = object()
+
+
+class BatchWriter:
+    def __init__(self, connect, sql: str,
+                 batch_size: int = 500,
+                 flush_ms: float = 200,
+                 queue_size: int = 100000,
+                 max_backoff: float = 30.0,
+                 name: str = "db-writer"):
+        """
+        connect     : 새 DB-API 연결을 돌려주는 함수
+        sql         : 행 하나에 대한 INSERT/UPSERT 문 (executemany로 실행)
+        batch_size  : 이만큼 모이면 바로 기록
+        flush_ms    : 덜 모여도 이 시간이 지나면 기록
+        queue_size  : 대기 행 최대 수
+        max_backoff : 재연결 대기 최대(초)
+        """
+        self.connect = connect
+        self.sql = sql
+        self.batch_size = batch_size
+        self.flush_sec = flush_ms / 1000.0
+        self.max_backoff = max_backoff
+        self.name = name
+
+        self.q = queue.Queue(maxsize=queue_size)
+        self.written = 0    # 커밋된 행 수
+        self.batches = 0    # 커밋 횟수
+        self.dropped = 0    # 큐가 가득 차서 버린 행 수
+        self.retries = 0    # 실패 후 재시도 횟수
+
+        self._conn = None
+        self._t = threading.Thread(target=self._run, name=name, daemon=True)
+        self._t.start()
+
+    # ---------- 호출 스레드 쪽 (절대 블록하지 않음) ----------
+    def put(self, row) -> bool:
+        try:
+            self.q.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logging.warning(f"{self.name}: 큐 가득 참 – 누적 {self.dropped}행 버림")
+            return False
+
+    def put_many(self, rows):
+        for r in rows:
+            self.put(r)
+
+    def qsize(self) -> int:
+        return self.q.qsize()
+
+    def close(self, timeout: float = 10.0):
+        """남은 행을 모두 기록하고 종료"""
+        try:
+            self.q.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._t.join(timeout)
+
+    # ---------- 기록 스레드 ----------
+    def _reset(self):
+        try:
+            if self._conn is not None:
+                self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def _write(self, rows):
+        """성공할 때까지 재시도 (그동안 새 행은 큐에 쌓이고, 넘치면 put()에서 버림)"""
+        backoff = 0.5
+        while True:
+            try:
+                if self._conn is None:
+                    self._conn = self.connect()
+                cur = self._conn.cursor()
+                try:
+                    cur.executemany(self.sql, rows)
+                    self._conn.commit()
+                finally:
+                    cur.close()
+                self.written += len(rows)
+                self.batches += 1
+                return
+            except Exception as e:
+                self.retries += 1
+                logging.warning(f"{self.name}: {len(rows)}행 기록 실패 ({e!r}) – {backoff:.1f}초 후 재연결")
+                try:
+                    if self._conn is not None:
+                        self._conn.rollback()
+                except Exception:
+                    pass
+                self._reset()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                item = self.q.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if item is _STOP:
+                break
+            rows = [item]
+            deadline = time.monotonic() + self.flush_sec
+            while len(rows) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self.q.get(timeout=remaining) if remaining > 0 else self.q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                rows.append(item)
+            self._write(rows)
+        self._reset()
+
+
+# ========= SQLite 대역 자가 점검 =========
+def _selftest():
+    import os, random, sqlite3, tempfile
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    path = os.path.join(tempfile.mkdtemp(prefix="bw_"), "t.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE sensor_data (id INTEGER PRIMARY KEY, nursinghome_id TEXT, room_id TEXT,"
+               " bed_id TEXT, call_button INT, fall_event INT)")
+    db.commit()
+    db.close()
+
+    # 처음 몇 번은 연결 실패, 중간에 한 번 커밋 도중 끊김
+    state = {"fail_connect": 2, "fail_commit": 1, "connects": 0}
+
+    class FlakyConn:
+        def __init__(self):
+            self.c = sqlite3.connect(path)
+
+        def cursor(self):
+            return self.c.cursor()
+
+        def commit(self):
+            if state["fail_commit"] and random.random() < 0.3:
+                state["fail_commit"] -= 1
+                raise sqlite3.OperationalError("연결 끊김 (시뮬레이션)")
+            self.c.commit()
+
+        def rollback(self):
+            self.c.rollback()
+
+        def close(self):
+            self.c.close()
+
+    def connect():
+        state["connects"] += 1
+        if state["fail_connect"]:
+            state["fail_connect"] -= 1
+            raise sqlite3.OperationalError("연결 거부 (시뮬레이션)")
+        return FlakyConn()
+
+    sql = ("INSERT INTO sensor_data (nursinghome_id, room_id, bed_id, call_button, fall_event)"
+           " VALUES (?, ?, ?, ?, ?)")
+    w = BatchWriter(connect, sql, batch_size=200, flush_ms=50, max_backoff=0.5)
+    n = 20000
+    t0 = time.perf_counter()
+    for i in range(n):
+        w.put(("NH-001", "301A", f"B{i % 40:03d}", i % 2, i % 3))
+    w.close(timeout=60)
+    dt = time.perf_counter() - t0
+
+    db = sqlite3.connect(path)
+    got = db.execute("SELECT COUNT(*) FROM sensor_data").fetchone()[0]
+    print(f"넣은 행 {n}, 테이블 {got}, 커밋 {w.batches}회, 재시도 {w.retries}회, 연결 {state['connects']}회, "
+          f"버림 {w.dropped}, {n / dt:,.0f} rows/s")
+    return got == n and not w.dropped
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "selftest":
+        sys.exit(0 if _selftest() else 1)
+    print(__doc__)
@@ -1,8 +1,12 @@
 # /srv/iot/collector.py
 import json, os, ssl, logging
-import mysql.connector as mc
 from paho.mqtt import client as mqtt
 
+import wire_format
+from batch_writer import BatchWriter
+import db
+import partitions
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
 # ================== MQTT 설정 ==================
@@ -10,27 +14,29 @@ MQTT_HOST = os.getenv("MQTT_HOST", "127.0.0.1")
 MQTT_PORT = int(os.getenv("MQTT_PORT", "8883"))
 # 라즈베리파이 → 서버 토픽: pi/<NH_ID>/<ROOM_ID>/data
 MQTT_TOPIC = os.getenv("MQTT_TOPIC", "pi/+/+/data")
+# 바이너리 프레임 토픽: pi/<NH_ID>/<ROOM_ID>/bin (wire_format.py, 침대 여러 개)
+MQTT_TOPIC_BIN = os.getenv("MQTT_TOPIC_BIN", "pi/+/+/bin")
 
 # ================== MySQL 설정 ==================
-DB_CFG = dict(
-    host=os.getenv("DB_HOST", "127.0.0.1"),
-    port=int(os.getenv("DB_PORT", "3306")),
-    user=os.getenv("DB_USER", "kbu1"),
-    password=os.getenv("DB_PASSWORD", "kbu1"),
-    database=os.getenv("DB_NAME", "kbuproject_db"),
-    autocommit=True,
-)
-
-conn = mc.connect(**DB_CFG)
-cur = conn.cursor()
+# 접속 정보/풀/재연결은 db.py (DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME)
+# 묶음마다 한 트랜잭션으로 커밋하므로 autocommit 끔
+database = db.Database("collector", autocommit=False)
+
+# 묶음 INSERT: BATCH_ROWS개가 모이거나 BATCH_MS가 지나면 executemany 한 번
+BATCH_ROWS  = int(os.getenv("BATCH_ROWS", "500"))
+BATCH_MS    = float(os.getenv("BATCH_MS", "200"))
+BATCH_QUEUE = int(os.getenv("BATCH_QUEUE", "100000"))
+
+# sensor_data 파티션 생성/삭제 + 시간별 롤업 (partitions.py, PART_UNIT/PART_AHEAD/PART_KEEP)
+PART_MANAGE = os.getenv("PART_MANAGE", "1") == "1"
 
 # sensor_data 테이블에 맞는 INSERT
-# id, timestamp 는 DB에서 자동 생성
+# id 는 DB에서 자동 생성. timestamp 는 받은 시각 (묶음/재시도로 늦게 기록돼도 DB 기본값이 아님)
 SQL_INSERT = """
 INSERT INTO sensor_data
-    (nursinghome_id, room_id, bed_id, call_button, fall_event)
+    (nursinghome_id, room_id, bed_id, call_button, fall_event, timestamp)
 VALUES
-    (%s, %s, %s, %s, %s)
+    (%s, %s, %s, %s, %s, %s)
 """
 
 
@@ -43,7 +49,7 @@ def _as_int(v, default=None):
         return default
 
 
-def parse_message(topic: str, payload: bytes):
+def parse_message(topic: str, payload: bytes, received=None):
     """
     토픽: pi/<NH_ID>/<ROOM_ID>/data
     페이로드(JSON):
@@ -52,14 +58,25 @@ def parse_message(topic: str, payload: bytes):
         "call_button": 0 or 1,
         "fall_event": 0 or 1 or 2
       }
+    토픽: pi/<NH_ID>/<ROOM_ID>/bin
+    페이로드: wire_format 프레임 (침대 여러 개)
+
+    received: 받은 시각 (없으면 지금, db.now())
+    반환: INSERT할 행 리스트 [(nursinghome_id, room_id, bed_id, call_button, fall_event, timestamp), ...]
     """
+    if received is None:
+        received = db.now()
     parts = topic.split("/")
-    if len(parts) != 4 or parts[0] != "pi" or parts[3] != "data":
+    if len(parts) != 4 or parts[0] != "pi" or parts[3] not in ("data", "bin"):
         raise ValueError(f"INVALID_TOPIC: {topic}")
 
     nursinghome_id = parts[1].strip()
     room_id        = parts[2].strip()
 
+    if parts[3] == "bin":
+        return [(nursinghome_id, room_id, bed_id, call_button, fall_event, received)
+                for bed_id, call_button, fall_event in wire_format.decode_frame(payload)]
+
     d = json.loads(payload.decode("utf-8"))
 
     bed_id = str(d.get("bed_id", "")).strip()
@@ -81,20 +98,25 @@ def parse_message(topic: str, payload: bytes):
     else:
         fall_event = fe_raw
 
-    return (nursinghome_id, room_id, bed_id, call_button, fall_event)
+    return [(nursinghome_id, room_id, bed_id, call_button, fall_event, received)]
+
+
+writer = BatchWriter(database.connect, SQL_INSERT,
+                     batch_size=BATCH_ROWS, flush_ms=BATCH_MS, queue_size=BATCH_QUEUE,
+                     name="sensor_data-writer")
 
 
 def on_connect(client, userdata, flags, rc):
     logging.info(f"MQTT CONNECTED rc={rc}")
-    client.subscribe(MQTT_TOPIC, qos=0)
-    logging.info(f"SUBSCRIBE {MQTT_TOPIC}")
+    client.subscribe([(MQTT_TOPIC, 0), (MQTT_TOPIC_BIN, 1)])
+    logging.info(f"SUBSCRIBE {MQTT_TOPIC} {MQTT_TOPIC_BIN}")
 
 
 def on_message(client, userdata, msg):
     try:
-        vals = parse_message(msg.topic, msg.payload)
-        cur.execute(SQL_INSERT, vals)
-        logging.info(f"INSERT sensor_data OK topic={msg.topic} vals={vals}")
+        rows = parse_message(msg.topic, msg.payload)
+        writer.put_many(rows)
+        logging.debug(f"QUEUE sensor_data topic={msg.topic} rows={rows}")
     except Exception:
         logging.exception(f"INSERT sensor_data ERROR topic=%s payload=%r", msg.topic, msg.payload)
 
@@ -115,8 +137,16 @@ def main():
     client.on_connect = on_connect
     client.on_message = on_message
 
+    parts = partitions.PartitionManager(database.connect) if PART_MANAGE else None
+
     client.connect(MQTT_HOST, MQTT_PORT, keepalive=60)
-    client.loop_forever()
+    try:
+        client.loop_forever()
+    finally:
+        writer.close()
+        if parts is not None:
+            parts.close()
+        logging.info(f"sensor_data 기록 {writer.written}행 / 커밋 {writer.batches}회 / 버림 {writer.dropped}행")
 
 
 if __name__ == "__main__":
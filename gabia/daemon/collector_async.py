@@ -0,0 +1,682 @@
+# /srv/iot/collector_async.py
+"""
+통합 수집기 (asyncio) – collector.py / collector_sensor.py / collector_ultrasonic.py 대체
+
+  - MQTT(TLS) 연결 1개로 pi/+/+/data, pi/+/+/bin 구독
+  - 메시지는 한 번만 파싱(parse)하고, 등록된 싱크에 나눠줌(offer – 버퍼에 넣기만 함)
+  - 싱크마다 기록 태스크가 따로 돌면서 aiomysql 풀로 묶음 기록 (싱크끼리 동시에 진행)
+      SensorDataSink : sensor_data INSERT (BATCH_ROWS개 또는 BATCH_MS마다 executemany)
+      UltrasonicSink : ultrasonic 최신값 UPSERT (ULTRA_FLUSH_SEC마다 바뀐 키만)
+  - 새 싱크는 Sink를 상속해서 sql과 offer() / take() / restore() / pending()만 정하면 됨
+    (SINKS 환경변수로 고름, 기본 "sensor_data,ultrasonic")
+
+수평 확장
+  - SHARE_GROUP=<그룹>: $share/<그룹>/<토픽> 공유 구독 (MQTT v5 / mosquitto 1.6+)
+    같은 그룹의 수집기들이 메시지를 나눠 받는다 – 여러 호스트로 늘릴 때.
+    브로커가 메시지 단위로 나누므로 호스트 사이에서는 방 단위 순서가 보장되지 않는다.
+  - WORKERS=N (N > 1): 이 프로세스는 MQTT 수신 + 방(nursinghome_id/room_id) 일관 해싱 분배만 하고
+    파싱/기록은 워커 프로세스 N개가 한다. 같은 방은 항상 같은 워커 → 방 단위 순서 유지.
+  - 로컬 브로커 확장 테스트: python scale_bench.py
+
+기존 세 데몬 대비 파싱/DB 문장 수 비교 (DB 없이):
+    python collector_async.py bench [메시지 수]
+"""
+
+import asyncio, json, os, ssl, logging, queue, signal, threading, time
+import multiprocessing as mp
+
+import wire_format
+import db
+import partitions
+from sharding import HashRing, room_key
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+# ================== MQTT 설정 ==================
+MQTT_HOST = os.getenv("MQTT_HOST", "127.0.0.1")
+MQTT_PORT = int(os.getenv("MQTT_PORT", "8883"))
+MQTT_TOPIC = os.getenv("MQTT_TOPIC", "pi/+/+/data")
+MQTT_TOPIC_BIN = os.getenv("MQTT_TOPIC_BIN", "pi/+/+/bin")
+CA_FILE   = os.getenv("MQTT_CA", "/etc/mosquitto/certs/ca.crt")
+CERT_FILE = os.getenv("MQTT_CERT", "/etc/mosquitto/certs/client.crt")
+KEY_FILE  = os.getenv("MQTT_KEY", "/etc/mosquitto/certs/client.key")
+
+# ================== 수평 확장 ==================
+SHARE_GROUP   = os.getenv("SHARE_GROUP", "")
+MQTT_PROTOCOL = os.getenv("MQTT_PROTOCOL", "5" if SHARE_GROUP else "3.1.1")
+WORKERS       = int(os.getenv("WORKERS", "1"))
+WORKER_QUEUE  = int(os.getenv("WORKER_QUEUE", "100000"))   # 워커별 대기 메시지 최대
+
+# ================== 싱크 설정 ==================
+BATCH_ROWS      = int(os.getenv("BATCH_ROWS", "500"))
+BATCH_MS        = float(os.getenv("BATCH_MS", "200"))
+BATCH_QUEUE     = int(os.getenv("BATCH_QUEUE", "100000"))
+ULTRA_FLUSH_SEC = float(os.getenv("ULTRA_FLUSH_SEC", "1.0"))
+STATS_SEC       = float(os.getenv("STATS_SEC", "60"))
+SINKS           = os.getenv("SINKS", "sensor_data,ultrasonic")
+NULL_SINK_US    = float(os.getenv("NULL_SINK_US", "0"))      # null 싱크의 행당 모의 기록 시간
+# sensor_data 파티션 생성/삭제 + 시간별 롤업 (partitions.py, 단일 프로세스 또는 분배 프로세스에서)
+PART_MANAGE     = os.getenv("PART_MANAGE", "1") == "1"
+
+
+def _as_int(v, default=None):
+    try:
+        if v is None:
+            return default
+        return int(round(float(v)))
+    except Exception:
+        return default
+
+
+# ================== 파싱 (메시지당 한 번) ==================
+class Message:
+    __slots__ = ("nursinghome_id", "room_id", "received", "d", "frame")
+
+    def __init__(self, nursinghome_id, room_id, received, d=None, frame=None):
+        self.nursinghome_id = nursinghome_id
+        self.room_id = room_id
+        self.received = received   # 받은 시각 (sensor_data.timestamp, 세션 시간대 기준)
+        self.d = d            # JSON 페이로드 dict (data 토픽)
+        self.frame = frame    # [(bed_id, call_button, fall_event), ...] (bin 토픽)
+
+
+def parse(topic: str, payload: bytes, received=None) -> Message:
+    """received: MQTT에서 받은 시각 (워커 모드는 분배 프로세스가 찍어서 넘김, 없으면 지금)"""
+    parts = topic.split("/")
+    if len(parts) != 4 or parts[0] != "pi" or parts[3] not in ("data", "bin"):
+        raise ValueError(f"INVALID_TOPIC: {topic}")
+    nh, room = parts[1].strip(), parts[2].strip()
+    if received is None:
+        received = db.now()
+    if parts[3] == "bin":
+        return Message(nh, room, received, frame=wire_format.decode_frame(payload))
+    d = json.loads(payload)
+    if not isinstance(d, dict):
+        raise ValueError(f"INVALID_PAYLOAD: {payload!r}")
+    return Message(nh, room, received, d=d)
+
+
+# ================== 싱크 ==================
+class Sink:
+    """offer()는 버퍼에 넣고 바로 돌아오고, 실제 기록은 싱크별 기록 태스크(_sink_loop)가 한다"""
+    name = "sink"
+    sql = ""
+    interval = 1.0      # flush 주기(초)
+
+    def __init__(self):
+        self.accepted = 0   # 이 싱크가 받은 행
+        self.skipped = 0    # 형식이 안 맞아 건너뛴 메시지
+        self.written = 0
+        self.dropped = 0
+        self.wake = asyncio.Event()   # 버퍼가 차면 기록 태스크를 바로 깨움
+
+    def offer(self, msg: Message):
+        raise NotImplementedError
+
+    def take(self) -> list:
+        """기록할 행을 꺼냄 (실패하면 restore()로 돌려받음)"""
+        raise NotImplementedError
+
+    def restore(self, rows: list):
+        raise NotImplementedError
+
+    def pending(self) -> int:
+        raise NotImplementedError
+
+    async def write(self, pool, rows: list):
+        await _write(pool, (self.sql, rows))
+
+    def close(self):
+        """종료 직전 (남은 행 기록 후) 호출"""
+
+    def summary(self) -> str:
+        return (f"{self.name}: 받음 {self.accepted} 기록 {self.written} 대기 {self.pending()} "
+                f"건너뜀 {self.skipped} 버림 {self.dropped}")
+
+
+class SensorDataSink(Sink):
+    """게이트웨이 상태 → sensor_data (collector.py와 같은 규칙)"""
+    name = "sensor_data"
+    sql = """
+INSERT INTO sensor_data
+    (nursinghome_id, room_id, bed_id, call_button, fall_event, timestamp)
+VALUES
+    (%s, %s, %s, %s, %s, %s)
+"""
+
+    def __init__(self, batch_rows=BATCH_ROWS, batch_ms=BATCH_MS, max_rows=BATCH_QUEUE):
+        super().__init__()
+        self.batch_rows = batch_rows
+        self.interval = batch_ms / 1000.0
+        self.max_rows = max_rows
+        self.rows = []
+
+    def _add(self, row):
+        if len(self.rows) >= self.max_rows:
+            self.dropped += 1
+            return
+        self.rows.append(row)
+        self.accepted += 1
+        if len(self.rows) == self.batch_rows:     # 처음 넘을 때만 (실패 후 쌓여 있는 동안은 깨우지 않음)
+            self.wake.set()
+
+    def offer(self, msg: Message):
+        nh, room, ts = msg.nursinghome_id, msg.room_id, msg.received
+        if msg.frame is not None:
+            for bed_id, call_button, fall_event in msg.frame:
+                self._add((nh, room, bed_id, call_button, fall_event, ts))
+            return
+        d = msg.d
+        if "fall_event" not in d and "call_button" not in d:
+            self.skipped += 1      # 센서 원시값 메시지
+            return
+        bed_id = str(d.get("bed_id", "")).strip() or "UNKNOWN"
+        call_button = 1 if (_as_int(d.get("call_button", 0), 0) or 0) else 0
+        fe = _as_int(d.get("fall_event", 0), 0) or 0
+        self._add((nh, room, bed_id, call_button, min(max(fe, 0), 2), ts))
+
+    def take(self):
+        rows, self.rows = self.rows[:self.batch_rows], self.rows[self.batch_rows:]
+        return rows
+
+    def restore(self, rows):
+        self.rows[:0] = rows
+        over = len(self.rows) - self.max_rows
+        if over > 0:
+            del self.rows[self.max_rows:]
+            self.dropped += over
+
+    def pending(self):
+        return len(self.rows)
+
+
+class UltrasonicSink(Sink):
+    """
+    센서 원시값 → ultrasonic 최신값 UPSERT
+    (collector_ultrasonic.py 형식, bed_id가 없으면 collector_sensor.py처럼 "A")
+    """
+    name = "ultrasonic"
+    sql = """
+INSERT INTO ultrasonic (sensor_id, bed_id, ultrasonic, lidar)
+VALUES (%s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+  bed_id = VALUES(bed_id),
+  ultrasonic = VALUES(ultrasonic),
+  lidar = VALUES(lidar)
+"""
+    # lidar 필드가 없는 메시지 (collector_sensor.py 형식) – 기존 lidar 값은 그대로 둠
+    sql_no_lidar = """
+INSERT INTO ultrasonic (sensor_id, bed_id, ultrasonic)
+VALUES (%s, %s, %s)
+ON DUPLICATE KEY UPDATE
+  bed_id = VALUES(bed_id),
+  ultrasonic = VALUES(ultrasonic)
+"""
+
+    def __init__(self, flush_sec=ULTRA_FLUSH_SEC):
+        super().__init__()
+        self.interval = flush_sec
+        self.dirty = {}      # (sensor_id, bed_id) → row
+        self.flushed = {}    # 마지막으로 기록한 row
+
+    def offer(self, msg: Message):
+        d = msg.d
+        if d is None or "ultrasonic" not in d:
+            self.skipped += 1
+            return
+        sensor_id = str(d.get("sensor_id", "")).strip()
+        bed_id = str(d.get("bed_id", "") or "A").strip()
+        ultrasonic = _as_int(d.get("ultrasonic"))
+        if not sensor_id or len(sensor_id) > 32 or len(bed_id) > 32 or ultrasonic is None:
+            self.skipped += 1
+            return
+        has_lidar = "lidar" in d
+        lidar = _as_int(d.get("lidar")) if d.get("lidar") not in (None, "") else None
+        key = (sensor_id, bed_id)
+        row = (sensor_id, bed_id, ultrasonic, lidar, has_lidar)
+        self.accepted += 1
+        self.dirty.pop(key, None)
+        if self.flushed.get(key) != row:
+            self.dirty[key] = row
+
+    def take(self):
+        batch, self.dirty = self.dirty, {}
+        self.flushed.update(batch)      # 실패하면 restore()에서 되돌림
+        return list(batch.values())
+
+    def restore(self, rows):
+        newer, self.dirty = self.dirty, {}
+        for row in rows:
+            key = (row[0], row[1])
+            self.flushed.pop(key, None)
+            self.dirty[key] = row
+        for key, row in newer.items():
+            self.dirty.pop(key, None)
+            self.dirty[key] = row
+
+    def pending(self):
+        return len(self.dirty)
+
+    async def write(self, pool, rows):
+        await _write(pool, (self.sql, [r[:4] for r in rows if r[4]]),
+                     (self.sql_no_lidar, [r[:3] for r in rows if not r[4]]))
+
+
+class NullSink(Sink):
+    """
+    DB 없이 받기만 하는 싱크 (부하/확장 테스트용).
+    행당 cost_us만큼 기록 시간을 흉내 내고, 방별 "seq"가 줄어들면 순서 위반으로 센다.
+    counter / violations 에 multiprocessing.Value를 주면 프로세스 밖에서 볼 수 있다.
+    written(multiprocessing.Array) 과 slot(방 → 칸 번호)을 주면 기록 시점에 프로세스 사이 순서까지 본다
+    (없으면 이 프로세스가 받은 순서만).
+    """
+    name = "null"
+    interval = 0.05
+
+    def __init__(self, cost_us=NULL_SINK_US, counter=None, violations=None, report=None,
+                 written=None, slot=None):
+        super().__init__()
+        self.cost_us = cost_us
+        self.counter = counter
+        self.violations = violations
+        self.report = report       # 종료 때 (pid, 받은 방 목록)을 넣을 큐
+        self.written_seq = written # 방 칸별 마지막으로 기록된 seq (프로세스 공용)
+        self.slot = slot
+        self.rows = []             # (방, seq)
+        self.last_seq = {}         # 방 → 마지막 seq
+
+    def _violation(self):
+        if self.violations is not None:
+            with self.violations.get_lock():
+                self.violations.value += 1
+
+    def offer(self, msg: Message):
+        room = f"{msg.nursinghome_id}/{msg.room_id}"
+        seq = _as_int((msg.d or {}).get("seq"))
+        if seq is not None:
+            if self.written_seq is None and seq <= self.last_seq.get(room, -1):
+                self._violation()
+            self.last_seq[room] = seq
+        self.rows.append((room, seq))
+        self.accepted += 1
+
+    def take(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def restore(self, rows):
+        self.rows[:0] = rows
+
+    def pending(self):
+        return len(self.rows)
+
+    async def write(self, pool, rows):
+        if self.cost_us:
+            time.sleep(self.cost_us * len(rows) / 1e6)   # 동기 DB 호출처럼 루프를 막음
+        if self.written_seq is not None:
+            w = self.written_seq
+            with w.get_lock():
+                for room, seq in rows:
+                    if seq is None:
+                        continue
+                    i = self.slot(room)
+                    if seq <= w[i]:
+                        self._violation()
+                    else:
+                        w[i] = seq
+        if self.counter is not None:
+            with self.counter.get_lock():
+                self.counter.value += len(rows)
+
+    def close(self):
+        if self.report is not None:
+            self.report.put((os.getpid(), sorted(self.last_seq)))
+
+
+SINK_TYPES = {"sensor_data": SensorDataSink, "ultrasonic": UltrasonicSink, "null": NullSink}
+
+
+def make_sinks(names: str = None):
+    return [SINK_TYPES[n.strip()]() for n in (names or SINKS).split(",") if n.strip()]
+
+
+# ================== DB (aiomysql 풀) ==================
+def _async_db_cfg():
+    c = db.DB_CFG
+    cfg = dict(host=c["host"], port=c["port"], user=c["user"], password=c["password"],
+               db=c["database"], connect_timeout=c["connection_timeout"], autocommit=False)
+    if db.DB_TIME_ZONE:       # db.Database 연결들(partitions 포함)과 같은 세션 시간대
+        cfg["init_command"] = f"SET time_zone = '{db.DB_TIME_ZONE}'"
+    return cfg
+
+
+async def _make_pool(sinks):
+    """DB를 쓰는 싱크가 있을 때만 풀 생성 (minsize=0: DB가 늦게 떠도 수집은 시작)"""
+    if not any(s.sql for s in sinks):
+        return None
+    import aiomysql
+    return await aiomysql.create_pool(minsize=0, maxsize=max(2, len(sinks)), **_async_db_cfg())
+
+
+async def _write(pool, *stmts):
+    """(sql, rows) 묶음들을 한 트랜잭션으로 executemany"""
+    async with pool.acquire() as conn:
+        try:
+            async with conn.cursor() as cur:
+                for sql, rows in stmts:
+                    if rows:
+                        await cur.executemany(sql, rows)
+            await conn.commit()
+        except Exception:
+            try:
+                await conn.rollback()
+            except Exception:
+                pass
+            raise
+
+
+async def _sink_loop(sink: Sink, pool, stop: asyncio.Event):
+    """싱크 하나의 기록 태스크 (싱크마다 따로 돌아서 서로 기다리지 않음)"""
+    backoff = sink.interval
+    failed = False
+    while True:
+        try:
+            if failed:
+                # 실패 후에는 버퍼가 차 있어도 백오프를 다 채움 (종료 신호만 끊음)
+                await asyncio.wait_for(stop.wait(), timeout=backoff)
+            else:
+                await asyncio.wait_for(sink.wake.wait(), timeout=sink.interval)
+        except asyncio.TimeoutError:
+            pass
+        sink.wake.clear()
+        failed = False
+        while sink.pending():
+            rows = sink.take()
+            try:
+                await sink.write(pool, rows)
+            except Exception as e:
+                sink.restore(rows)
+                failed = True
+                backoff = min(max(backoff * 2, 1.0), db.DB_MAX_BACKOFF)
+                logging.warning(f"{sink.name}: {len(rows)}행 기록 실패 ({e!r}) – {backoff:.0f}초 후 재시도")
+                break
+            sink.written += len(rows)
+            backoff = sink.interval
+        # 종료 중이면 마지막 시도까지만 (DB가 끊겨 있으면 남은 행은 포기)
+        if stop.is_set() and (failed or not sink.pending()):
+            return
+
+
+# ================== 실행 ==================
+def _tls_context():
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ctx.load_verify_locations(CA_FILE)
+    ctx.load_cert_chain(CERT_FILE, KEY_FILE)
+    return ctx
+
+
+def _topics():
+    filters = [MQTT_TOPIC, MQTT_TOPIC_BIN]
+    if SHARE_GROUP:
+        filters = [f"$share/{SHARE_GROUP}/{f}" for f in filters]
+    return filters
+
+
+async def _consume(handle, stop: asyncio.Event):
+    """MQTT 수신 루프. handle(topic, payload)는 이벤트 루프에서 바로 돌아와야 함"""
+    import aiomqtt
+
+    backoff = 1.0
+    tls = _tls_context() if MQTT_PORT == 8883 else None
+    protocol = aiomqtt.ProtocolVersion.V5 if MQTT_PROTOCOL == "5" else aiomqtt.ProtocolVersion.V311
+    topics = _topics()
+    while not stop.is_set():
+        try:
+            async with aiomqtt.Client(MQTT_HOST, MQTT_PORT, keepalive=60, tls_context=tls, protocol=protocol,
+                                      identifier=f"collector-async-{os.getpid()}") as client:
+                await client.subscribe([(t, 1) for t in topics])
+                logging.info(f"MQTT CONNECTED {MQTT_HOST}:{MQTT_PORT} SUBSCRIBE {' '.join(topics)}")
+                backoff = 1.0
+                async for m in client.messages:
+                    handle(m.topic.value, m.payload)
+        except aiomqtt.MqttError as e:
+            logging.warning(f"MQTT 연결 끊김 ({e}) – {backoff:.0f}초 후 재연결")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+
+def _offer_all(sinks, topic, payload, received=None):
+    try:
+        msg = parse(topic, payload, received)
+    except Exception as e:
+        logging.warning(f"PARSE_ERR topic={topic}: {e}")
+        return
+    for s in sinks:
+        s.offer(msg)
+
+
+async def _stats(sinks, stop: asyncio.Event, prefix=""):
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=STATS_SEC)
+        except asyncio.TimeoutError:
+            logging.info(prefix + " | ".join(s.summary() for s in sinks))
+
+
+async def _run_sinks(sinks, stop: asyncio.Event, feed, prefix=""):
+    """싱크 기록 태스크 + feed(수신) 태스크를 돌리고, stop 후 남은 행을 기록하고 정리"""
+    pool = await _make_pool(sinks)
+    writers = [asyncio.create_task(_sink_loop(s, pool, stop)) for s in sinks]
+    feeder = asyncio.create_task(feed)
+    stats = asyncio.create_task(_stats(sinks, stop, prefix)) if STATS_SEC > 0 else None
+
+    await stop.wait()
+    feeder.cancel()
+    for s in sinks:
+        s.wake.set()
+    await asyncio.wait(writers, timeout=10)
+    if stats:
+        stats.cancel()
+    for s in sinks:
+        s.close()
+    logging.info(prefix + " | ".join(s.summary() for s in sinks))
+    if pool is not None:
+        pool.close()
+        await pool.wait_closed()
+
+
+def _stop_on_signals(stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+
+# ---------- 단일 프로세스 ----------
+async def _single_main(sink_factory):
+    stop = asyncio.Event()
+    _stop_on_signals(stop)
+    sinks = sink_factory()
+    await _run_sinks(sinks, stop, _consume(lambda t, p: _offer_all(sinks, t, p), stop))
+
+
+def _start_partitions():
+    """sensor_data 싱크를 쓸 때만 (수집기가 여러 개여도 GET_LOCK 으로 한 곳에서만 작업)"""
+    if not PART_MANAGE or "sensor_data" not in SINKS.split(","):
+        return None
+    return partitions.PartitionManager(db.Database("partitions", pool_size=2).connect)
+
+
+def run_single(sink_factory=make_sinks):
+    parts = _start_partitions()
+    try:
+        asyncio.run(_single_main(sink_factory))
+    finally:
+        if parts is not None:
+            parts.close()
+
+
+# ---------- 분배 프로세스 + 워커 N개 ----------
+async def _worker_main(idx: int, q, sink_factory):
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    sinks = sink_factory()
+
+    def deliver(items):
+        for topic, payload, received in items:
+            if topic is None:
+                stop.set()
+            else:
+                _offer_all(sinks, topic, payload, received)
+
+    def reader():
+        # 큐에서 여러 개씩 꺼내 이벤트 루프로 넘김 (호출 1번에 최대 1000개)
+        while True:
+            items = [q.get()]
+            while len(items) < 1000:
+                try:
+                    items.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            loop.call_soon_threadsafe(deliver, items)
+            if items[-1][0] is None:
+                return
+
+    async def feed():
+        threading.Thread(target=reader, name=f"worker-{idx}-reader", daemon=True).start()
+        await stop.wait()
+
+    await _run_sinks(sinks, stop, feed(), prefix=f"[worker {idx}] ")
+
+
+def _worker_proc(idx: int, q, sink_factory):
+    # 종료는 분배 프로세스가 큐로 알려줌 (Ctrl-C는 무시)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    asyncio.run(_worker_main(idx, q, sink_factory))
+
+
+async def _dispatch_main(queues):
+    stop = asyncio.Event()
+    _stop_on_signals(stop)
+    ring = HashRing(range(len(queues)))
+    sent = [0] * len(queues)
+    dropped = [0]
+
+    def handle(topic, payload):
+        w = ring.node_for(room_key(topic))
+        try:
+            queues[w].put_nowait((topic, payload, db.now()))   # 받은 시각은 여기서 찍음
+            sent[w] += 1
+        except queue.Full:
+            dropped[0] += 1
+            if dropped[0] % 1000 == 1:
+                logging.warning(f"워커 {w} 큐 가득 참 – 누적 {dropped[0]}개 버림")
+
+    consumer = asyncio.create_task(_consume(handle, stop))
+    await stop.wait()
+    consumer.cancel()
+    logging.info(f"분배: 워커별 {sent} 버림 {dropped[0]}")
+
+
+def run_dispatch(sink_factory=make_sinks, workers: int = WORKERS):
+    """워커 프로세스를 먼저 띄운 뒤(fork) 분배 루프 실행, 종료 시 워커가 남은 행을 기록할 때까지 대기"""
+    ctx = mp.get_context("fork")
+    queues = [ctx.Queue(WORKER_QUEUE) for _ in range(workers)]
+    procs = [ctx.Process(target=_worker_proc, args=(i, queues[i], sink_factory), name=f"collector-worker-{i}")
+             for i in range(workers)]
+    for p in procs:
+        p.start()
+    logging.info(f"워커 {workers}개 시작 (방 단위 일관 해싱)")
+    parts = _start_partitions()    # 스레드는 fork 이후에 띄움
+    try:
+        asyncio.run(_dispatch_main(queues))
+    finally:
+        if parts is not None:
+            parts.close()
+        for q in queues:
+            q.put((None, None, None))
+        for p in procs:
+            p.join(15)
+
+
+def main():
+    if WORKERS > 1:
+        run_dispatch()
+    else:
+        run_single()
+
+
+# ================== 벤치마크 (DB 없이) ==================
+def _bench(n: int):
+    """
+    기존: 메시지마다 세 데몬이 각자 json.loads + 검사 + execute 1회 (형식 안 맞으면 예외 로그)
+    통합: parse 1회 + 싱크 offer, 기록은 묶음 executemany
+    """
+    import random
+
+    rnd = random.Random(0)
+    msgs = []
+    for i in range(n):
+        bed = f"B{i % 40:03d}"
+        if i % 5 == 0:   # 게이트웨이 상태
+            p = {"bed_id": bed, "call_button": i % 2, "fall_event": i % 3}
+        else:            # 센서 원시값
+            p = {"sensor_id": f"ESP32-{i % 4 + 1}", "bed_id": bed, "ultrasonic": rnd.randint(10, 14)}
+        msgs.append(("pi/NH-001/301A/data", json.dumps(p).encode("utf-8")))
+
+    def trio(topic, payload):
+        stmts = 0
+        # collector.py
+        d = json.loads(payload.decode("utf-8"))
+        str(d.get("bed_id", "")).strip()
+        _as_int(d.get("call_button", 0), 0)
+        _as_int(d.get("fall_event", 0), 0)
+        stmts += 1
+        # collector_sensor.py / collector_ultrasonic.py
+        for need_bed in (False, True):
+            d = json.loads(payload.decode("utf-8"))
+            try:
+                sid = str(d.get("sensor_id", "")).strip()
+                if not sid or (need_bed and not str(d.get("bed_id", "")).strip()):
+                    raise ValueError
+                int(d.get("ultrasonic"))
+                stmts += 1
+            except Exception:
+                pass
+        return stmts
+
+    t0 = time.perf_counter()
+    trio_stmts = sum(trio(t, p) for t, p in msgs)
+    t_trio = time.perf_counter() - t0
+
+    sinks = [SensorDataSink(), UltrasonicSink(flush_sec=1.0)]
+    stmts = 0
+    t0 = time.perf_counter()
+    for i, (t, p) in enumerate(msgs):
+        m = parse(t, p)
+        for s in sinks:
+            s.offer(m)
+        # 실시간 기준 5Hz × 160센서 ≈ 초당 1000메시지 → 1000개마다 1초 경과로 보고 flush
+        if i % 1000 == 999:
+            for s in sinks:
+                while s.pending():
+                    s.take()
+                    stmts += 1
+    for s in sinks:
+        while s.pending():
+            s.take()
+            stmts += 1
+    t_uni = time.perf_counter() - t0
+
+    print(f"메시지 {n}개 (상태 20% / 센서 80%, 침대 40개)")
+    print(f"  기존 3개 데몬: {n / t_trio:,.0f} msg/s, json.loads {3 * n}회, DB 문장 {trio_stmts}개 (각 1회 왕복+커밋)")
+    print(f"  통합 수집기  : {n / t_uni:,.0f} msg/s, json.loads {n}회, DB 문장 {stmts}개 (executemany 묶음)")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        _bench(int(sys.argv[2]) if len(sys.argv) > 2 else 200000)
+    else:
+        main()
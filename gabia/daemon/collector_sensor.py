@@ -1,8 +1,10 @@
 # /srv/iot/collector.py
 import os, ssl, json, logging
-import mysql.connector as mc
 from paho.mqtt import client as mqtt
 
+import db
+from last_value import LastValueCache
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
 # MQTT
@@ -10,40 +12,22 @@ MQTT_HOST = os.getenv("MQTT_HOST", "127.0.0.1")
 MQTT_PORT = int(os.getenv("MQTT_PORT", "8883"))
 MQTT_TOPIC = os.getenv("MQTT_TOPIC", "pi/+/+/data")   # 랒파→서버 토픽
 
-# MySQL
-DB_CFG = dict(
-    host=os.getenv("DB_HOST", "127.0.0.1"),
-    port=int(os.getenv("DB_PORT", "3306")),
-    user=os.getenv("DB_USER", "kbu1"),
-    password=os.getenv("DB_PASSWORD", "kbu1"),
-    database=os.getenv("DB_NAME", "kbuproject_db"),
-    autocommit=True,
-)
+# MySQL (접속 정보/풀/재연결은 db.py)
 
+# VALUES 는 자리표시자만 (그래야 executemany 가 여러 행 INSERT 한 문장으로 합침)
 SQL_UPSERT = """
 INSERT INTO ultrasonic (bed_id, sensor_id, ultrasonic)
-VALUES ("A", %s, %s)
+VALUES (%s, %s, %s)
 ON DUPLICATE KEY UPDATE ultrasonic = VALUES(ultrasonic)
 """
 
-conn = cur = None
+# 연결 풀 + 백그라운드 상태 점검 (세션 시간대는 db.DB_TIME_ZONE)
+database = db.Database("collector_sensor")
 
-def ensure_conn():
-    global conn, cur
-    if conn is None:
-        conn = mc.connect(**DB_CFG)
-        cur = conn.cursor()
-        cur.execute("SET time_zone = '+09:00'")
-        return
-    try:
-        if not conn.is_connected():
-            conn.reconnect(attempts=3, delay=2)
-            cur = conn.cursor()
-            cur.execute("SET time_zone = '+09:00'")
-    except Exception:
-        conn = mc.connect(**DB_CFG)
-        cur = conn.cursor()
-        cur.execute("SET time_zone = '+09:00'")
+# 키별 최신값만 모아 ULTRA_FLUSH_SEC마다 바뀐 것만 한 번에 UPSERT
+# (대시보드 값 지연 상한 = ULTRA_FLUSH_SEC)
+ULTRA_FLUSH_SEC = float(os.getenv("ULTRA_FLUSH_SEC", "1.0"))
+cache = LastValueCache(database.connect, SQL_UPSERT, flush_sec=ULTRA_FLUSH_SEC, name="collector_sensor")
 
 def parse_payload(payload: bytes):
     d = json.loads(payload.decode("utf-8"))
@@ -63,14 +47,12 @@ def on_connect(client, userdata, flags, rc, properties=None):
 def on_message(client, userdata, msg):
     try:
         sensor_id, ultrasonic = parse_payload(msg.payload)
-        ensure_conn()
-        cur.execute(SQL_UPSERT, (sensor_id, ultrasonic))
-        logging.info(f"UPSERT_OK topic={msg.topic} sensor_id={sensor_id} ultrasonic={ultrasonic}")
+        cache.update(sensor_id, ("A", sensor_id, ultrasonic))
+        logging.debug(f"UPSERT_QUEUE topic={msg.topic} sensor_id={sensor_id} ultrasonic={ultrasonic}")
     except Exception as e:
         logging.exception(f"UPSERT_ERR topic={msg.topic}: {e}")
 
 def main():
-    ensure_conn()
     client = mqtt.Client(protocol=mqtt.MQTTv311,
                          callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
     client.enable_logger()
@@ -84,7 +66,11 @@ def main():
     client.on_connect = on_connect
     client.on_message = on_message
     client.connect(MQTT_HOST, MQTT_PORT, keepalive=60)
-    client.loop_forever()
+    try:
+        client.loop_forever()
+    finally:
+        cache.close()
+        logging.info(cache.summary())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,141 @@
+# /srv/iot/db.py
+"""
+수집 데몬 공용 MySQL 계층 (collector.py / collector_sensor.py / collector_ultrasonic.py)
+
+  - mysql.connector 연결 풀 (DB_POOL_SIZE)
+  - 메시지 경로에서는 ping / reconnect를 하지 않음
+    상태 점검 스레드가 DB_HEALTH_SEC마다 ping 하고, 끊기면 지수 백오프로 다시 붙는다.
+    끊긴 동안 connect()는 기다리지 않고 바로 DBUnavailable을 던진다. (MQTT 루프가 안 막힘)
+  - connect()는 BatchWriter / LastValueCache 같은 묶음 기록기에 넘길 연결 함수
+    (executemany multi-VALUES 재작성을 쓰도록 일반 커서 사용, 실패 처리/재시도는 기록기 쪽)
+
+세션 시간대는 모든 연결에 DB_TIME_ZONE 하나로 맞춘다 (기본 +09:00, 빈 값이면 서버 기본값).
+수집기가 직접 찍는 시각(now())도 같은 시간대라서 파티션 경계/롤업과 어긋나지 않는다.
+
+사용 예
+    import db
+    database = db.Database("collector_sensor")
+    cache = LastValueCache(database.connect, SQL_UPSERT)
+"""
+
+import datetime as dt
+import logging, os, threading, time
+from mysql.connector import pooling
+from mysql.connector.errors import PoolError
+
+DB_CFG = dict(
+    host=os.getenv("DB_HOST", "127.0.0.1"),
+    port=int(os.getenv("DB_PORT", "3306")),
+    user=os.getenv("DB_USER", "kbu1"),
+    password=os.getenv("DB_PASSWORD", "kbu1"),
+    database=os.getenv("DB_NAME", "kbuproject_db"),
+    connection_timeout=int(os.getenv("DB_CONNECT_TIMEOUT", "5")),
+)
+
+# 세션 시간대 ("+09:00" 형식, 빈 값 = 서버 기본값이고 이 프로세스의 로컬 시각과 같다고 봄)
+DB_TIME_ZONE = os.getenv("DB_TIME_ZONE", "+09:00")
+
+DB_POOL_SIZE  = int(os.getenv("DB_POOL_SIZE", "4"))
+DB_HEALTH_SEC = float(os.getenv("DB_HEALTH_SEC", "5"))
+DB_MAX_BACKOFF = float(os.getenv("DB_MAX_BACKOFF", "30"))
+
+
+def _tz(name: str):
+    if not name:
+        return None
+    sign = -1 if name[0] == "-" else 1
+    h, m = name.lstrip("+-").split(":")
+    return dt.timezone(sign * dt.timedelta(hours=int(h), minutes=int(m)))
+
+
+_TZ = _tz(DB_TIME_ZONE)
+
+
+def now() -> dt.datetime:
+    """세션 시간대 기준 현재 시각 (naive, DATETIME 열에 그대로 넣는 값)"""
+    if _TZ is None:
+        return dt.datetime.now()
+    return dt.datetime.now(_TZ).replace(tzinfo=None)
+
+
+class DBUnavailable(Exception):
+    """DB가 끊겨 있어 바로 포기한 경우 (상태 점검 스레드가 재연결 중)"""
+
+
+class Database:
+    def __init__(self, name: str = "collector", time_zone: str | None = DB_TIME_ZONE,
+                 autocommit: bool = True, pool_size: int = DB_POOL_SIZE,
+                 health_sec: float = DB_HEALTH_SEC, max_backoff: float = DB_MAX_BACKOFF):
+        self.name = name
+        self.health_sec = health_sec
+        self.max_backoff = max_backoff
+        self.cfg = dict(DB_CFG, autocommit=autocommit)
+        if time_zone:
+            self.cfg["time_zone"] = time_zone
+        self.pool_size = pool_size
+
+        self.healthy = False
+        self.reconnects = 0        # 상태 점검 스레드가 다시 붙은 횟수
+        self._pool = None
+        self._lock = threading.Lock()
+
+        self._check()   # 시작할 때 한 번은 바로 연결 시도
+        threading.Thread(target=self._health_loop, name=f"{name}-db-health", daemon=True).start()
+
+    # ---------- 풀 ----------
+    def _make_pool(self):
+        return pooling.MySQLConnectionPool(pool_name=f"{self.name}-{os.getpid()}",
+                                           pool_size=self.pool_size, pool_reset_session=False,
+                                           **self.cfg)
+
+    def connect(self):
+        """풀에서 연결 하나 (close() 하면 풀로 돌아감)"""
+        if not self.healthy or self._pool is None:
+            raise DBUnavailable(self.name)
+        return self._pool.get_connection()
+
+    # ---------- 상태 점검 ----------
+    def _check(self) -> bool:
+        try:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = self._make_pool()
+                conn = self._pool.get_connection()
+        except PoolError:
+            # 연결을 모두 빌려 쓰는 중 – 상태는 그대로 두고 다음 주기에 다시 점검
+            return self.healthy
+        except Exception as e:
+            return self._check_failed(e)
+        try:
+            try:
+                conn.ping(reconnect=False)
+            finally:
+                conn.close()
+        except Exception as e:
+            return self._check_failed(e)
+        if not self.healthy:
+            logging.info(f"[{self.name}] DB 연결 정상 {self.cfg['host']}:{self.cfg['port']}")
+        self.healthy = True
+        return True
+
+    def _check_failed(self, e) -> bool:
+        if self.healthy:
+            logging.warning(f"[{self.name}] DB 상태 점검 실패: {e!r}")
+        self.healthy = False
+        return False
+
+    def _health_loop(self):
+        backoff = 1.0
+        while True:
+            if self.healthy:
+                time.sleep(self.health_sec)
+                if self._check():
+                    continue
+            # 끊김: 지수 백오프로 재시도
+            if self._check():
+                self.reconnects += 1
+                backoff = 1.0
+                continue
+            logging.warning(f"[{self.name}] DB 재연결 실패 – {backoff:.0f}초 후 다시 시도")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
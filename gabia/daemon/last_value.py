@@ -0,0 +1,128 @@
+# /srv/iot/last_value.py
+"""
+최신값 캐시 (UPSERT 합치기)
+
+ultrasonic 테이블은 키마다 최신값 하나만 남는데, 센서마다 5Hz로 UPSERT 하던 것을
+메모리에서 키별로 덮어쓰고 flush_sec마다 바뀐 키만 executemany 한 번으로 UPSERT 한다.
+  - update(key, row): MQTT 스레드, dict 갱신만 (DB 대기 없음)
+  - 마지막으로 DB에 쓴 값과 같은 row는 다시 쓰지 않음
+  - 기록 실패 시 그 묶음을 다시 dirty로 돌려놓고(그 사이 들어온 더 새 값이 우선) 다음 주기에 재시도
+
+대시보드가 보는 값의 지연 상한 = flush_sec + DB 기록 시간 (ULTRA_FLUSH_SEC로 조절).
+DB가 끊겨 있으면 그동안은 마지막 성공 값에 머문다. (stale_sec 로 확인)
+"""
+
+import logging, threading, time
+
+
+class LastValueCache:
+    def __init__(self, connect, sql: str, flush_sec: float = 1.0,
+                 max_backoff: float = 30.0, log_sec: float = 60.0, name: str = "last-value"):
+        """
+        connect   : 새 DB-API 연결을 돌려주는 함수 (db.Database.connect)
+        sql       : 행 하나에 대한 UPSERT 문 (executemany로 실행)
+        flush_sec : 바뀐 키를 기록하는 주기(초) = 지연 상한
+        log_sec   : summary() 로그 주기 (0 = 안 남김)
+        """
+        self.connect = connect
+        self.sql = sql
+        self.flush_sec = flush_sec
+        self.max_backoff = max_backoff
+        self.log_sec = log_sec
+        self.name = name
+
+        self.updates = 0      # update() 호출 수
+        self.written = 0      # DB에 쓴 행 수
+        self.flushes = 0      # 성공한 기록 횟수
+        self.last_ok = time.monotonic()
+
+        self._dirty = {}      # key → row (아직 안 쓴 최신값, 갱신 순서 유지)
+        self._flushed = {}    # key → 마지막으로 DB에 쓴 row
+        self._writing = {}    # key → 지금 기록 중인 row
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stop = threading.Event()
+        self._t = threading.Thread(target=self._run, name=name, daemon=True)
+        self._t.start()
+
+    # ---------- MQTT 스레드 ----------
+    def update(self, key, row):
+        with self._lock:
+            self.updates += 1
+            self._dirty.pop(key, None)          # 끝으로 옮김 (같은 DB 키면 나중 값이 이김)
+            # 기록 중인 값이 있으면 그것과 비교 (기록 후 DB에 남을 값)
+            if self._writing.get(key, self._flushed.get(key)) != row:
+                self._dirty[key] = row
+
+    def stale_sec(self) -> float:
+        """마지막 성공 기록 이후 지난 시간"""
+        return time.monotonic() - self.last_ok
+
+    def summary(self) -> str:
+        ratio = self.updates / self.written if self.written else 0.0
+        return (f"{self.name}: 갱신 {self.updates} → 기록 {self.written}행 ({ratio:.1f}배 감소), "
+                f"대기 {len(self._dirty)}키, 마지막 기록 {self.stale_sec():.1f}초 전")
+
+    def close(self, timeout: float = 10.0):
+        """남은 값을 한 번 더 쓰고 종료"""
+        self._stop.set()
+        self._t.join(timeout)
+
+    # ---------- 기록 스레드 ----------
+    def _flush(self) -> bool:
+        with self._lock:
+            batch, self._dirty = self._dirty, {}
+            self._writing = batch
+        if not batch:
+            self.last_ok = time.monotonic()
+            return True
+        try:
+            if self._conn is None:
+                self._conn = self.connect()
+            cur = self._conn.cursor()
+            try:
+                cur.executemany(self.sql, list(batch.values()))
+                self._conn.commit()
+            finally:
+                cur.close()
+        except Exception as e:
+            logging.warning(f"{self.name}: {len(batch)}키 기록 실패 ({e!r})")
+            try:
+                if self._conn is not None:
+                    self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+            with self._lock:
+                self._writing = {}
+                # 실패한 묶음을 되돌림 (그 사이 들어온 값이 더 새것이므로 우선)
+                newer, self._dirty = self._dirty, batch
+                for k, row in newer.items():
+                    self._dirty.pop(k, None)
+                    self._dirty[k] = row
+            return False
+        with self._lock:
+            self._flushed.update(batch)
+            self._writing = {}
+        self.written += len(batch)
+        self.flushes += 1
+        self.last_ok = time.monotonic()
+        return True
+
+    def _run(self):
+        wait = self.flush_sec
+        last_log = time.monotonic()
+        while not self._stop.wait(wait):
+            if self._flush():
+                wait = self.flush_sec
+            else:
+                wait = min(max(wait * 2, self.flush_sec), self.max_backoff)
+            if self.log_sec > 0 and time.monotonic() - last_log >= self.log_sec:
+                last_log = time.monotonic()
+                logging.info(self.summary())
+        self._flush()
+        try:
+            if self._conn is not None:
+                self._conn.close()
+        except Exception:
+            pass
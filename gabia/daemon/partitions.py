@@ -0,0 +1,382 @@
+# /srv/iot/partitions.py
+"""
+sensor_data 시간 파티션 + 시간별 롤업 관리
+
+sensor_data 를 timestamp 기준 RANGE 파티션(일 또는 월 단위)으로 나누고,
+  - 미래 파티션을 PART_AHEAD개 미리 만들어 둠 (p_future 를 REORGANIZE – 비어 있어서 금방 끝남)
+  - PART_KEEP개보다 오래된 파티션은 DROP PARTITION (행 단위 DELETE 없이 바로 반환)
+  - 침대별/시간별 호출·낙상 횟수를 sensor_rollup_hourly 에 미리 집계
+    (이력 화면은 원본 행을 보지 않고 롤업만 읽음)
+
+파티션 이름은 그 구간의 시작 날짜: p20261018 = [2026-10-18, 2026-10-19), p202610 = 10월 한 달.
+오래된 파티션을 지우기 전에 그 구간 롤업이 끝났는지 먼저 확인한다.
+수집기가 여러 개 떠 있어도 GET_LOCK 으로 한 곳에서만 관리 작업을 한다.
+
+롤업 열
+  call_count      : call_button=1 행 수 (게이트웨이는 0→1 바뀔 때 보냄 = 호출 횟수)
+  fall_warn_count : fall_event=1 행 수
+  fall_count      : fall_event=2 행 수 (값이 바뀔 때만 보냄 = 낙상 위험 진입 횟수)
+  row_count       : 그 시간 원본 행 수
+
+이력 화면 예
+    SELECT hour, call_count, fall_count FROM sensor_rollup_hourly
+    WHERE nursinghome_id=%s AND room_id=%s AND bed_id=%s AND hour >= %s AND hour < %s
+    ORDER BY hour
+
+명령
+    python partitions.py ddl                  # 새로 만들 때 쓸 CREATE 문 출력 (DB 없이)
+    python partitions.py migrate              # 기존 sensor_data 를 파티션 테이블로 변환 (테이블 재작성)
+    python partitions.py maintain [--dry-run] # 미래 파티션 생성 + 만료 파티션 삭제
+    python partitions.py rollup [시작 [끝]]     # 롤업 다시 계산 (예: 2026-10-01 2026-10-18)
+    python partitions.py status
+"""
+
+import argparse, datetime as dt, logging, os, threading, time
+
+PART_TABLE  = os.getenv("PART_TABLE", "sensor_data")
+ROLLUP_TABLE = os.getenv("ROLLUP_TABLE", "sensor_rollup_hourly")
+PART_UNIT   = os.getenv("PART_UNIT", "day")             # day | month
+PART_AHEAD  = int(os.getenv("PART_AHEAD", "7"))         # 미리 만들어 둘 미래 파티션 수
+PART_KEEP   = int(os.getenv("PART_KEEP", "90"))         # 보관할 파티션 수 (오늘/이번 달 포함)
+PART_MAINT_SEC = float(os.getenv("PART_MAINT_SEC", "3600"))
+ROLLUP_SEC  = float(os.getenv("ROLLUP_SEC", "300"))
+ROLLUP_LATE_SEC = float(os.getenv("ROLLUP_LATE_SEC", "3600"))   # 늦게 들어온 행을 다시 집계할 구간
+MAINT_LOCK  = "sensor_data_maint"
+
+FUTURE = "p_future"
+
+SQL_ROLLUP_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+    nursinghome_id  VARCHAR(32) NOT NULL,
+    room_id         VARCHAR(32) NOT NULL,
+    bed_id          VARCHAR(16) NOT NULL,
+    hour            DATETIME    NOT NULL,
+    call_count      INT UNSIGNED NOT NULL DEFAULT 0,
+    fall_warn_count INT UNSIGNED NOT NULL DEFAULT 0,
+    fall_count      INT UNSIGNED NOT NULL DEFAULT 0,
+    row_count       INT UNSIGNED NOT NULL DEFAULT 0,
+    PRIMARY KEY (nursinghome_id, room_id, bed_id, hour),
+    KEY idx_hour (hour)
+)
+"""
+
+# [시작, 끝) 구간을 시간 단위로 다시 집계 (같은 시간은 덮어씀 → 여러 번 돌려도 같은 결과)
+SQL_ROLLUP = f"""
+INSERT INTO {ROLLUP_TABLE}
+    (nursinghome_id, room_id, bed_id, hour, call_count, fall_warn_count, fall_count, row_count)
+SELECT nursinghome_id, room_id, bed_id,
+       DATE(timestamp) + INTERVAL HOUR(timestamp) HOUR AS h,
+       SUM(call_button = 1), SUM(fall_event = 1), SUM(fall_event = 2), COUNT(*)
+FROM {PART_TABLE}
+WHERE timestamp >= %s AND timestamp < %s
+GROUP BY nursinghome_id, room_id, bed_id, h
+ON DUPLICATE KEY UPDATE
+    call_count = VALUES(call_count), fall_warn_count = VALUES(fall_warn_count),
+    fall_count = VALUES(fall_count), row_count = VALUES(row_count)
+"""
+
+SQL_PARTITIONS = """
+SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+FROM information_schema.PARTITIONS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+ORDER BY PARTITION_ORDINAL_POSITION
+"""
+
+
+# ================== 구간 계산 (DB 없이) ==================
+def floor_unit(d: dt.date, unit: str = PART_UNIT) -> dt.date:
+    return d.replace(day=1) if unit == "month" else d
+
+
+def next_start(d: dt.date, unit: str = PART_UNIT) -> dt.date:
+    if unit == "month":
+        return (d.replace(day=1) + dt.timedelta(days=32)).replace(day=1)
+    return d + dt.timedelta(days=1)
+
+
+def prev_start(d: dt.date, unit: str = PART_UNIT) -> dt.date:
+    if unit == "month":
+        return (d.replace(day=1) - dt.timedelta(days=1)).replace(day=1)
+    return d - dt.timedelta(days=1)
+
+
+def part_name(start: dt.date, unit: str = PART_UNIT) -> str:
+    return start.strftime("p%Y%m" if unit == "month" else "p%Y%m%d")
+
+
+def part_def(start: dt.date, unit: str = PART_UNIT) -> str:
+    return f"PARTITION {part_name(start, unit)} VALUES LESS THAN (TO_DAYS('{next_start(start, unit)}'))"
+
+
+def plan(existing, today: dt.date, unit: str = PART_UNIT, ahead: int = PART_AHEAD, keep: int = PART_KEEP):
+    """
+    existing: [(파티션 이름, 상한 TO_DAYS 값 또는 "MAXVALUE"), ...] (정의 순서)
+    반환: (새로 만들 구간 시작 날짜 리스트, 지울 파티션 이름 리스트, 보관 시작 날짜)
+    """
+    bounds = [int(b) for n, b in existing if n != FUTURE and b != "MAXVALUE"]
+    last = max(bounds) if bounds else None         # 지금 있는 파티션의 최대 상한 (TO_DAYS)
+
+    want_end = floor_unit(today, unit)
+    for _ in range(ahead + 1):                      # 이번 구간 + 미래 ahead개
+        want_end = next_start(want_end, unit)
+    start = floor_unit(today, unit)
+    if last is not None:
+        start = max(start, from_days(last))
+    create = []
+    while start < want_end:
+        create.append(start)
+        start = next_start(start, unit)
+
+    keep_from = floor_unit(today, unit)
+    for _ in range(keep - 1):
+        keep_from = prev_start(keep_from, unit)
+    drop = [n for n, b in existing
+            if n != FUTURE and b != "MAXVALUE" and int(b) <= to_days(keep_from)]
+    return create, drop, keep_from
+
+
+def to_days(d: dt.date) -> int:
+    """MySQL TO_DAYS() 와 같은 값"""
+    return d.toordinal() + 365
+
+
+def from_days(n: int) -> dt.date:
+    return dt.date.fromordinal(n - 365)
+
+
+def create_sql(unit: str = PART_UNIT, today: dt.date = None, ahead: int = PART_AHEAD) -> str:
+    """새로 설치할 때 쓸 파티션 sensor_data (PK에 timestamp 포함이 파티션 조건)"""
+    today = today or dt.date.today()
+    create, _, _ = plan([], today, unit, ahead)
+    parts = ",\n    ".join([part_def(s, unit) for s in create] +
+                           [f"PARTITION {FUTURE} VALUES LESS THAN MAXVALUE"])
+    return f"""
+CREATE TABLE IF NOT EXISTS {PART_TABLE} (
+    id             BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    nursinghome_id VARCHAR(32) NOT NULL,
+    room_id        VARCHAR(32) NOT NULL,
+    bed_id         VARCHAR(16) NOT NULL,
+    call_button    TINYINT NOT NULL DEFAULT 0,
+    fall_event     TINYINT NOT NULL DEFAULT 0,
+    timestamp      DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, timestamp),
+    KEY idx_bed_time (nursinghome_id, room_id, bed_id, timestamp)
+)
+PARTITION BY RANGE (TO_DAYS(timestamp)) (
+    {parts}
+)
+"""
+
+
+# ================== 관리 작업 (DB) ==================
+def _query(conn, sql, params=()):
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        return cur.fetchall() if cur.with_rows else cur.rowcount
+    finally:
+        cur.close()
+
+
+def db_today(conn) -> dt.datetime:
+    """DB 시계 기준 현재 시각 (세션 시간대 = db.DB_TIME_ZONE, 수집기가 찍는 timestamp 와 같음)"""
+    return _query(conn, "SELECT NOW()")[0][0]
+
+
+def list_partitions(conn):
+    return [(n, d) for n, d, _ in _query(conn, SQL_PARTITIONS, (PART_TABLE,))]
+
+
+def ensure_rollup_table(conn):
+    _query(conn, SQL_ROLLUP_TABLE)
+
+
+def rollup(conn, start: dt.datetime, end: dt.datetime, chunk=dt.timedelta(days=1)) -> int:
+    """[start, end) 를 하루씩 나눠 집계 (시간 경계로 내림해서 시작)"""
+    start = start.replace(minute=0, second=0, microsecond=0)
+    n = 0
+    while start < end:
+        stop = min(start + chunk, end)
+        n += _query(conn, SQL_ROLLUP, (start, stop))
+        conn.commit()
+        start = stop
+    return n
+
+
+def rollup_mark(conn) -> dt.datetime | None:
+    """롤업이 어디까지 되어 있는지 (마지막 시간 버킷 시작)"""
+    return _query(conn, f"SELECT MAX(hour) FROM {ROLLUP_TABLE}")[0][0]
+
+
+def maintain(conn, unit: str = PART_UNIT, ahead: int = PART_AHEAD, keep: int = PART_KEEP,
+             dry_run: bool = False, now: dt.datetime = None):
+    """미래 파티션 생성 + 만료 파티션 삭제. 반환: (만든 이름들, 지운 이름들)"""
+    now = now or db_today(conn)
+    existing = list_partitions(conn)
+    if not existing:
+        raise RuntimeError(f"{PART_TABLE} 는 파티션 테이블이 아님 – 먼저 'partitions.py migrate'")
+    create, drop, keep_from = plan(existing, now.date(), unit, ahead, keep)
+    sqls = []
+    if create:
+        parts = ", ".join([part_def(s, unit) for s in create] +
+                          [f"PARTITION {FUTURE} VALUES LESS THAN MAXVALUE"])
+        sqls.append(f"ALTER TABLE {PART_TABLE} REORGANIZE PARTITION {FUTURE} INTO ({parts})")
+    if drop:
+        # 지우기 전에 그 구간 롤업이 끝났는지 확인 (밀려 있으면 먼저 집계)
+        mark = rollup_mark(conn)
+        keep_dt = dt.datetime.combine(keep_from, dt.time())
+        if not dry_run and (mark is None or mark < keep_dt):
+            first = _query(conn, f"SELECT MIN(timestamp) FROM {PART_TABLE}")[0][0]
+            if first is not None and first < keep_dt:
+                start = max(first, mark) if mark else first
+                logging.info(f"[partitions] 삭제 전 롤업 {start} ~ {keep_dt}")
+                rollup(conn, start, keep_dt)
+        sqls.append(f"ALTER TABLE {PART_TABLE} DROP PARTITION {', '.join(drop)}")
+    for sql in sqls:
+        if dry_run:
+            print(sql + ";")
+        else:
+            _query(conn, sql)
+    names = [part_name(s, unit) for s in create]
+    if names or drop:
+        logging.info(f"[partitions] 생성 {names} 삭제 {drop}{' (dry-run)' if dry_run else ''}")
+    return names, drop
+
+
+def migrate(conn, unit: str = PART_UNIT, ahead: int = PART_AHEAD, keep: int = PART_KEEP):
+    """
+    기존(파티션 없는) sensor_data 를 파티션 테이블로 변환.
+    PK를 (id, timestamp)로 바꾸고 가장 오래된 행부터 파티션을 잡는다 – 테이블 전체를 다시 쓰므로
+    수집기를 멈추고 한가한 시간에 실행. 보관 기간 밖 파티션은 다음 maintain 에서 삭제된다.
+    """
+    if list_partitions(conn):
+        logging.info(f"[partitions] {PART_TABLE} 는 이미 파티션 테이블")
+        return
+    now = db_today(conn)
+    first = _query(conn, f"SELECT MIN(timestamp) FROM {PART_TABLE}")[0][0] or now
+    create, _, _ = plan([], now.date(), unit, ahead, keep)
+    start = floor_unit(first.date(), unit)
+    older = []
+    while start < create[0]:
+        older.append(start)
+        start = next_start(start, unit)
+    parts = ", ".join([part_def(s, unit) for s in older + create] +
+                      [f"PARTITION {FUTURE} VALUES LESS THAN MAXVALUE"])
+    logging.info(f"[partitions] {PART_TABLE} 변환 시작 ({len(older) + len(create) + 1}개 파티션)")
+    _query(conn, f"ALTER TABLE {PART_TABLE} MODIFY timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+                 f"DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)")
+    _query(conn, f"ALTER TABLE {PART_TABLE} PARTITION BY RANGE (TO_DAYS(timestamp)) ({parts})")
+    logging.info(f"[partitions] {PART_TABLE} 변환 완료")
+
+
+def _lock(conn) -> bool:
+    return _query(conn, "SELECT GET_LOCK(%s, 0)", (MAINT_LOCK,))[0][0] == 1
+
+
+def _unlock(conn):
+    _query(conn, "SELECT RELEASE_LOCK(%s)", (MAINT_LOCK,))
+
+
+# ================== 수집기 안에서 도는 관리 스레드 ==================
+class PartitionManager:
+    def __init__(self, connect, maint_sec: float = PART_MAINT_SEC, rollup_sec: float = ROLLUP_SEC,
+                 late_sec: float = ROLLUP_LATE_SEC, name: str = "partitions"):
+        """
+        connect    : 새 DB-API 연결을 돌려주는 함수 (db.Database.connect)
+        maint_sec  : 파티션 생성/삭제 주기(초)
+        rollup_sec : 롤업 주기(초) – 이력 화면 지연 상한
+        late_sec   : 매번 이만큼 앞에서부터 다시 집계 (늦게 들어온 행 반영)
+        """
+        self.connect = connect
+        self.maint_sec = maint_sec
+        self.rollup_sec = rollup_sec
+        self.late = dt.timedelta(seconds=late_sec)
+        self.name = name
+
+        self.created = 0
+        self.dropped = 0
+        self.rollups = 0
+        self._mark = None      # 마지막 롤업 때의 DB 시각
+        self._next_maint = 0.0
+        self._stop = threading.Event()
+        self._t = threading.Thread(target=self._run, name=name, daemon=True)
+        self._t.start()
+
+    def close(self, timeout: float = 10.0):
+        self._stop.set()
+        self._t.join(timeout)
+
+    def _once(self, conn):
+        if not _lock(conn):
+            return             # 다른 수집기가 관리 중
+        try:
+            now = db_today(conn)
+            if time.monotonic() >= self._next_maint:
+                ensure_rollup_table(conn)
+                made, gone = maintain(conn, now=now)
+                self.created += len(made)
+                self.dropped += len(gone)
+                self._next_maint = time.monotonic() + self.maint_sec
+            if self._mark is None:
+                self._mark = rollup_mark(conn)
+                if self._mark is None:
+                    self._mark = _query(conn, f"SELECT MIN(timestamp) FROM {PART_TABLE}")[0][0] or now
+            rollup(conn, self._mark - self.late, now + dt.timedelta(seconds=1))
+            self._mark = now
+            self.rollups += 1
+        finally:
+            _unlock(conn)
+
+    def _run(self):
+        wait = 0.0
+        while not self._stop.wait(wait):
+            wait = self.rollup_sec
+            conn = None
+            try:
+                conn = self.connect()
+                self._once(conn)
+            except Exception as e:
+                logging.warning(f"[{self.name}] 관리 작업 실패 ({e!r}) – {wait:.0f}초 후 다시")
+            finally:
+                try:
+                    if conn is not None:
+                        conn.close()
+                except Exception:
+                    pass
+
+
+def _parse_dt(s: str) -> dt.datetime:
+    return dt.datetime.fromisoformat(s)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    ap = argparse.ArgumentParser(description="sensor_data 파티션/롤업 관리")
+    ap.add_argument("cmd", choices=["ddl", "migrate", "maintain", "rollup", "status"])
+    ap.add_argument("args", nargs="*")
+    ap.add_argument("--dry-run", action="store_true")
+    a = ap.parse_args()
+
+    if a.cmd == "ddl":
+        print(create_sql().strip() + ";\n")
+        print(SQL_ROLLUP_TABLE.strip() + ";")
+        raise SystemExit(0)
+
+    import db
+    conn = db.Database("partitions", pool_size=2).connect()
+    ensure_rollup_table(conn)
+    if a.cmd == "migrate":
+        migrate(conn)
+        maintain(conn)
+    elif a.cmd == "maintain":
+        maintain(conn, dry_run=a.dry_run)
+    elif a.cmd == "rollup":
+        now = db_today(conn)
+        start = _parse_dt(a.args[0]) if a.args else (rollup_mark(conn) or now - dt.timedelta(days=1))
+        end = _parse_dt(a.args[1]) if len(a.args) > 1 else now + dt.timedelta(seconds=1)
+        print(f"롤업 {start} ~ {end}: {rollup(conn, start, end)}행")
+    else:
+        for n, d, rows in _query(conn, SQL_PARTITIONS, (PART_TABLE,)):
+            print(f"{n:12} < {d if d == 'MAXVALUE' else from_days(int(d))}  약 {rows}행")
+        print(f"롤업 마지막 시간: {rollup_mark(conn)}")
+    conn.close()
@@ -0,0 +1,135 @@
+# /srv/iot/scale_bench.py
+"""
+수집기 수평 확장 테스트 (로컬 브로커)
+
+raspberry_pi/mini_broker.py를 띄우고, 방 여러 개에 방별 seq를 붙인 메시지를 발행한 뒤
+collector_async를 워커 수를 바꿔가며 돌려서 처리량과 방 단위 순서를 잰다.
+  hash  : 분배 프로세스 1개 + 워커 N개 (WORKERS=N, 방 일관 해싱)
+  shared: 독립 수집기 N개가 $share/<그룹>/... 공유 구독 (SHARE_GROUP)
+싱크는 null 싱크(DB 없음)이고 --cost-us로 행당 DB 기록 시간을 흉내 낸다.
+순서 위반 = 프로세스와 상관없이 같은 방의 seq가 기록 시점에 뒤로 간 횟수.
+배율 = 워커 1개 대비 처리량, 효율 = 배율 / 워커 수 (1.00 이면 선형).
+
+    python scale_bench.py --workers 1 2 4 --msgs 20000 --rooms 64 --cost-us 200
+"""
+
+import argparse, functools, json, os, random, sys, time
+import multiprocessing as mp
+
+os.environ.setdefault("MQTT_PROTOCOL", "3.1.1")   # mini_broker는 MQTT 3.1.1만 지원
+os.environ.setdefault("STATS_SEC", "0")
+os.environ.setdefault("PART_MANAGE", "0")      # DB 없이
+
+import collector_async as ca
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "raspberry_pi"))
+from mini_broker import MiniBroker
+from loadgen import _new_client
+
+
+def _room_slot(room: str) -> int:
+    """"NH-000/R03" → 방 번호 (_publish 와 같은 규칙)"""
+    nh, r = room.split("/")
+    return int(nh[3:]) * 16 + int(r[1:])
+
+
+def _bench_sinks(counter, violations, report, written, cost_us):
+    return [ca.NullSink(cost_us=cost_us, counter=counter, violations=violations, report=report,
+                        written=written, slot=_room_slot)]
+
+
+def _publish(port, msgs, rooms):
+    c = _new_client(f"scale-bench-{os.getpid()}")
+    c.max_queued_messages_set(0)
+    c.connect("127.0.0.1", port, keepalive=60)
+    c.loop_start()
+    seq = [0] * rooms
+    # 방은 무작위로 고름 (i % rooms 면 방 수가 워커 수로 나눠떨어질 때 공유 구독의
+    # 돌아가며 배달이 방을 절대 쪼개지 않아 순서 위반이 0으로 나올 수밖에 없음)
+    rnd = random.Random(1)
+    t0 = time.perf_counter()
+    for i in range(msgs):
+        r = rnd.randrange(rooms)
+        seq[r] += 1
+        p = json.dumps({"bed_id": "A", "call_button": 0, "fall_event": 0, "seq": seq[r]})
+        c.publish(f"pi/NH-{r // 16:03d}/R{r % 16:02d}/data", p, qos=0)
+    return c, t0
+
+
+def run_case(mode, n, args, broker):
+    ctx = mp.get_context("fork")
+    counter = ctx.Value("q", 0)
+    violations = ctx.Value("q", 0)
+    report = ctx.Queue()
+    written = ctx.Array("q", [0] * args.rooms)   # 방별 마지막 기록 seq (모든 프로세스 공용)
+    factory = functools.partial(_bench_sinks, counter, violations, report, written, args.cost_us)
+
+    if mode == "hash":
+        ca.SHARE_GROUP = ""
+        procs = [ctx.Process(target=ca.run_dispatch, args=(factory, n))]
+    else:
+        ca.SHARE_GROUP = "bench"
+        procs = [ctx.Process(target=ca.run_single, args=(factory,)) for _ in range(n)]
+    for p in procs:
+        p.start()
+
+    # 구독이 다 붙을 때까지 대기 (발행자 제외 세션 수)
+    want = len(procs)
+    deadline = time.time() + 10
+    while len(broker.sessions) < want and time.time() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.5)
+
+    client, t0 = _publish(args.port, args.msgs, args.rooms)
+    deadline = time.time() + args.timeout
+    while counter.value < args.msgs and time.time() < deadline:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - t0
+    done = counter.value
+    client.loop_stop()
+    client.disconnect()
+
+    for p in procs:
+        p.terminate()   # SIGTERM → 남은 행 기록 후 종료
+    for p in procs:
+        p.join(20)
+
+    # 한 방이 몇 개 프로세스로 나뉘었는지
+    owners = {}
+    while not report.empty():
+        pid, rooms = report.get()
+        for r in rooms:
+            owners.setdefault(r, set()).add(pid)
+    split = sum(1 for v in owners.values() if len(v) > 1)
+    return done, elapsed, violations.value, split, len(owners)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="collector_async 수평 확장 테스트")
+    ap.add_argument("--port", type=int, default=18850)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--modes", nargs="+", default=["hash", "shared"], choices=["hash", "shared"])
+    ap.add_argument("--msgs", type=int, default=20000)
+    ap.add_argument("--rooms", type=int, default=64)
+    ap.add_argument("--cost-us", type=float, default=200.0, help="행당 모의 DB 기록 시간(us)")
+    ap.add_argument("--timeout", type=float, default=120.0)
+    args = ap.parse_args()
+
+    ca.MQTT_HOST, ca.MQTT_PORT = "127.0.0.1", args.port
+    broker = MiniBroker("127.0.0.1", args.port).start()
+    print(f"메시지 {args.msgs}개, 방 {args.rooms}개, 행당 {args.cost_us:.0f}us, CPU {os.cpu_count()}개")
+    print(f"{'모드':6} {'워커':>4} {'처리':>7} {'초':>6} {'msg/s':>8} {'배율':>5} {'효율':>5} "
+          f"{'순서위반':>6} {'쪼개진 방':>8}")
+    for mode in args.modes:
+        base = None
+        for n in args.workers:
+            done, elapsed, viol, split, rooms = run_case(mode, n, args, broker)
+            rate = done / elapsed if elapsed > 0 else 0.0
+            base = base or rate
+            print(f"{mode:6} {n:>4} {done:>7} {elapsed:>6.2f} {rate:>8,.0f} {rate / base:>5.2f} "
+                  f"{rate / base / n:>5.2f} {viol:>6} {split:>4}/{rooms}")
+    broker.stop()
+
+
+if __name__ == "__main__":
+    main()
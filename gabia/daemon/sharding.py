@@ -0,0 +1,40 @@
+# /srv/iot/sharding.py
+"""
+방(room) → 워커 고정 배정 (일관 해싱)
+
+nursinghome_id/room_id 를 해시 링에 올려서 워커 번호를 고른다.
+같은 방의 메시지는 항상 같은 워커 큐로 가므로 방 단위 순서가 유지되고,
+워커 수가 바뀌어도 다시 배정되는 방은 약 1/N 뿐이다.
+"""
+
+import bisect, hashlib
+
+
+def room_key(topic: str) -> str:
+    """pi/<NH_ID>/<ROOM_ID>/... → "<NH_ID>/<ROOM_ID>" """
+    parts = topic.split("/", 3)
+    if len(parts) < 3:
+        return topic
+    return f"{parts[1]}/{parts[2]}"
+
+
+def _hash(s: str) -> int:
+    return int.from_bytes(hashlib.md5(s.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, nodes, vnodes: int = 100):
+        """nodes: 워커 식별자 리스트, vnodes: 워커당 가상 노드 수 (많을수록 고르게)"""
+        self.nodes = list(nodes)
+        points = sorted((_hash(f"{n}#{v}"), n) for n in self.nodes for v in range(vnodes))
+        self._keys = [h for h, _ in points]
+        self._owners = [n for _, n in points]
+        self._cache = {}     # 방 수만큼만 커짐
+
+    def node_for(self, key: str):
+        n = self._cache.get(key)
+        if n is None:
+            i = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+            n = self._owners[i]
+            self._cache[key] = n
+        return n
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+게이트웨이 → 서버 압축 바이너리 형식 (침대 여러 개를 한 프레임에)
+
+JSON 토픽  : pi/{NH}/{ROOM}/data  {"bed_id": "A", "call_button": 0, "fall_event": 2}  (침대 1개)
+바이너리 토픽: pi/{NH}/{ROOM}/bin   아래 프레임 (침대 여러 개)
+
+프레임 v1 (바이트 단위)
+  [0]  버전 (0x01)
+  [1]  레코드 수 n (1..255)
+  레코드 × n
+       [0]    bed_id 길이 L (1..255)
+       [1..L] bed_id (UTF-8)
+       [L+1]  상태 비트: bit0 = call_button, bit1-2 = fall_event(0..2)
+
+형식이 바뀌면 버전 바이트를 올리고, 수신 쪽은 모르는 버전을 거부한다.
+이 파일은 raspberry_pi/wire_format.py 와 gabia/daemon/wire_format.py 에 같은 내용으로 둔다.
+
+크기/파싱 시간 비교:
+    python wire_format.py bench [침대 수] [반복 수]
+"""
+
+import json
+
+VERSION = 1
+MAX_RECORDS = 255
+
+_bed_prefix = {}   # bed_id → 길이 + UTF-8 bytes (인코딩 캐시)
+_bed_names = {}    # bytes → bed_id (디코딩 캐시)
+
+
+def _prefix(bed_id: str) -> bytes:
+    p = _bed_prefix.get(bed_id)
+    if p is None:
+        b = bed_id.encode("utf-8")
+        if not 0 < len(b) <= 255:
+            raise ValueError(f"BAD bed_id: {bed_id!r}")
+        p = bytes((len(b),)) + b
+        _bed_prefix[bed_id] = p
+    return p
+
+
+def encode_frames(records) -> list:
+    """records: [(bed_id, call_button, fall_event), ...] → 프레임(bytes) 리스트 (255개씩)"""
+    frames = []
+    for i in range(0, len(records), MAX_RECORDS):
+        chunk = records[i:i + MAX_RECORDS]
+        out = bytearray((VERSION, len(chunk)))
+        for bed_id, call_button, fall_event in chunk:
+            out += _prefix(bed_id)
+            out.append((1 if call_button else 0) | (min(max(int(fall_event), 0), 2) << 1))
+        frames.append(bytes(out))
+    return frames
+
+
+def decode_frame(payload: bytes) -> list:
+    """프레임 → [(bed_id, call_button, fall_event), ...]"""
+    if len(payload) < 2:
+        raise ValueError("SHORT_FRAME")
+    if payload[0] != VERSION:
+        raise ValueError(f"BAD_VERSION: {payload[0]}")
+    n = payload[1]
+    out = []
+    i = 2
+    end = len(payload)
+    for _ in range(n):
+        if i >= end:
+            raise ValueError("TRUNCATED_FRAME")
+        L = payload[i]
+        j = i + 1 + L
+        if j >= end:
+            raise ValueError("TRUNCATED_FRAME")
+        raw = payload[i + 1:j]
+        bed_id = _bed_names.get(raw)
+        if bed_id is None:
+            bed_id = raw.decode("utf-8").strip() or "UNKNOWN"
+            if len(_bed_names) < 10000:
+                _bed_names[raw] = bed_id
+        flags = payload[j]
+        out.append((bed_id, flags & 1, min((flags >> 1) & 3, 2)))
+        i = j + 1
+    if i != end:
+        raise ValueError("TRAILING_BYTES")
+    return out
+
+
+# ========= 벤치마크 =========
+def _bench(n_beds: int, reps: int):
+    import time
+
+    beds = [f"B{i:03d}" for i in range(n_beds)]
+    records = [(b, i % 2, i % 3) for i, b in enumerate(beds)]
+    js = [json.dumps({"bed_id": b, "call_button": c, "fall_event": f}).encode("utf-8") for b, c, f in records]
+    frames = encode_frames(records)
+    assert [r for fr in frames for r in decode_frame(fr)] == records
+
+    def _json_parse(p):
+        d = json.loads(p.decode("utf-8"))
+        return (str(d.get("bed_id", "")).strip(), int(d.get("call_button", 0)), int(d.get("fall_event", 0)))
+
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        for p in js:
+            _json_parse(p)
+    t_json = (time.perf_counter() - t0) / (reps * n_beds) * 1e6
+
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        for fr in frames:
+            decode_frame(fr)
+    t_bin = (time.perf_counter() - t0) / (reps * n_beds) * 1e6
+
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        encode_frames(records)
+    t_enc = (time.perf_counter() - t0) / (reps * n_beds) * 1e6
+
+    b_json = sum(len(p) for p in js) / n_beds
+    b_bin = sum(len(f) for f in frames) / n_beds
+    print(f"침대 {n_beds}개, 반복 {reps}")
+    print(f"  JSON  : {b_json:5.1f} bytes/침대, MQTT 메시지 {len(js)}개, 파싱 {t_json:.2f} us/침대")
+    print(f"  bin v1: {b_bin:5.1f} bytes/침대, MQTT 메시지 {len(frames)}개, 파싱 {t_bin:.2f} us/침대, "
+          f"인코딩 {t_enc:.2f} us/침대")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        _bench(int(sys.argv[2]) if len(sys.argv) > 2 else 40,
+               int(sys.argv[3]) if len(sys.argv) > 3 else 2000)
+    else:
+        print(__doc__)
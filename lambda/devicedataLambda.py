@@ -0,0 +1,307 @@
+# lambda_function.py – /devicedata?entityKey=&start=&end=&bucket= → 기간 조회 + 서버 측 다운샘플
+#
+# devicedata (PK = entityKey, SK = timestamp) 를 KeyConditionExpression 범위 조회로 읽고
+# LastEvaluatedKey 를 따라 끝까지 넘기면서 바로 버킷에 합친다 (원본 행을 메모리에 모으지 않음).
+# 버킷마다 숫자 속성별 [min, max, last] 만 돌려주므로 5Hz 일주일(약 300만 행)도
+# 점 천여 개(수백 KB) 로 끝난다.
+#
+#   ?entityKey=inst001#101#p001        (필수)
+#   &start=2026-10-11&end=2026-10-18   (YYYY / YYYY-MM / YYYY-MM-DD / 날짜+시각,
+#                                       end 가 연/월/날짜면 그 기간 끝까지, start > end 는 400)
+#   &bucket=600                        (초, 없으면 MAX_POINTS 이하가 되게 자동, 0 = 원본 그대로)
+#   &fields=ultrasonic,fall_event      (다운샘플할 속성만 읽기, 없으면 숫자 속성 전부)
+#   &nextToken=...                     (시간/행 한도에 걸려 잘린 경우 이어서)
+
+import base64, binascii, calendar, json, os, re, time, boto3
+from botocore.config import Config
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+# ────────────────────────────────────────────────────────────────────────────────
+# DynamoDB 초기화
+# ────────────────────────────────────────────────────────────────────────────────
+DDB_ENDPOINT = os.getenv("DDB_ENDPOINT") or None      # 로컬 테스트용 (DynamoDB Local)
+TABLE_NAME   = os.getenv("DEVDATA_TABLE", "devicedata")
+SORT_KEY     = os.getenv("DEVDATA_SORT_KEY", "timestamp")
+# 정렬 키의 날짜/시각 구분자 – pi_publisher.get_timestamp() 는 "2026-10-18 12:00:00.123" (공백)
+# 범위 값도 같은 구분자로 맞춰야 문자열 비교가 맞는다 (' ' < 'T' 라서 섞이면 범위가 어긋남)
+SORT_KEY_SEP = os.getenv("DEVDATA_SORT_KEY_SEP", " ")
+
+# 값 변환을 직접 하므로(Decimal 안 거침) 저수준 client 사용
+ddb_client = boto3.client("dynamodb", endpoint_url=DDB_ENDPOINT,
+                          config=Config(retries={"max_attempts": 5, "mode": "adaptive"}))
+
+MAX_POINTS    = int(os.getenv("MAX_POINTS", "2000"))        # 자동 버킷일 때 점 개수 상한
+RAW_MAX_ITEMS = int(os.getenv("RAW_MAX_ITEMS", "5000"))     # bucket=0 일 때 한 응답 최대 행
+SCAN_MAX_ITEMS = int(os.getenv("SCAN_MAX_ITEMS", "5000000"))  # 한 호출에서 읽을 최대 행
+TIME_BUDGET_MS = int(os.getenv("TIME_BUDGET_MS", "2000"))   # 남은 실행 시간이 이보다 적으면 끊고 nextToken
+DEFAULT_RANGE_H = float(os.getenv("DEFAULT_RANGE_H", "24")) # start 가 없을 때 최근 몇 시간
+
+# 자동 버킷 크기 후보 (초)
+NICE_BUCKETS = [1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 10800, 21600, 43200, 86400]
+
+KST = timezone(timedelta(hours=9))
+KST_OFFSET = 9 * 3600
+DAY_END = "\uffff"     # "2026-10-18" + DAY_END ≥ 그날의 모든 시각 (문자열 비교)
+# 정렬 키와 같은 대시 형식만 (20261018 같은 압축형은 문자열 비교가 어긋나므로 거부)
+# 시각 앞 구분자는 'T' 나 공백 둘 다 받고 SORT_KEY_SEP 로 바꿔서 비교
+RANGE_RE = re.compile(r"(\d{4})(?:-(\d{2})(?:-(\d{2})(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d{1,6})?)?)?)?)?")
+KEY_FMT = f"%Y-%m-%d{SORT_KEY_SEP}%H:%M:%S"
+
+# ────────────────────────────────────────────────────────────────────────────────
+# 공통 유틸
+# ────────────────────────────────────────────────────────────────────────────────
+CORS_HEADERS: Dict[str, str] = {
+    "Access-Control-Allow-Origin" : "*",
+    "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
+    "Access-Control-Allow-Methods": "GET,OPTIONS",
+    "Content-Type"                : "application/json",
+}
+
+def _resp(code: int, body: Any):
+    return {
+        "statusCode": code,
+        "headers"    : CORS_HEADERS,
+        "body"       : json.dumps(body, ensure_ascii=False, separators=(",", ":")),
+    }
+
+def _encode_token(lek: Dict[str, Any]) -> str:
+    raw = json.dumps(lek, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _decode_token(token: str) -> Dict[str, Any]:
+    lek = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    if not isinstance(lek, dict):
+        raise ValueError(token)
+    return lek
+
+def _num(av: Dict[str, Any]):
+    """DynamoDB 속성값 → float (숫자/불리언만, 나머지 None)"""
+    if "N" in av:
+        return float(av["N"])
+    if "BOOL" in av:
+        return 1.0 if av["BOOL"] else 0.0
+    return None
+
+def _epoch(av: Dict[str, Any]) -> float | None:
+    """정렬 키 값 → epoch 초 (ISO 문자열은 시간대 없으면 KST, 숫자는 초 또는 ms)"""
+    if "N" in av:
+        v = float(av["N"])
+        return v / 1000.0 if v > 1e11 else v
+    try:
+        dt = datetime.fromisoformat(av["S"].replace("Z", "+00:00"))
+    except (KeyError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=KST)
+    return dt.timestamp()
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, KST).strftime("%Y-%m-%dT%H:%M:%S")
+
+def _bound(v: str, is_end: bool) -> str:
+    """YYYY / YYYY-MM 은 기간 첫날(start) 또는 마지막 날(end) 로 (형식이 틀리면 ValueError)"""
+    m = RANGE_RE.fullmatch(v)
+    if not m:
+        raise ValueError(v)
+    year, month, day = m.groups()
+    if day is not None:
+        datetime.fromisoformat(v)                     # 날짜/시각 값 확인 (2026-02-30 등)
+        return v[:10] + SORT_KEY_SEP + v[11:] if len(v) > 10 else v
+    y = int(year)
+    mo = int(month) if month is not None else (12 if is_end else 1)
+    first = datetime(y, mo, 1)                        # 연/월 범위 확인 (2026-13 등)
+    d = calendar.monthrange(y, mo)[1] if is_end else 1
+    return first.replace(day=d).strftime("%Y-%m-%d")
+
+def _range(start: str | None, end: str | None) -> Tuple[str, str]:
+    """start/end 쿼리 값 → 정렬 키 BETWEEN 범위 (문자열 정렬 키 기준, start > end 도 그대로 돌려줌)"""
+    now = datetime.now(KST)
+    if not end:
+        end = now.strftime(KEY_FMT)
+    if not start:
+        start = (now - timedelta(hours=DEFAULT_RANGE_H)).strftime(KEY_FMT)
+    start = _bound(start, False)
+    end = _bound(end, True)              # 형식 확인 (ValueError → 400)
+    if len(end) == 10:                   # 날짜만 → 그날 끝까지 ("2026-10-18 ..." 전부 포함)
+        end += DAY_END
+    return start, end
+
+def _auto_bucket(start: str, end: str) -> int:
+    t0 = _epoch({"S": start})
+    t1 = _epoch({"S": end[:10] + " 23:59:59" if end.endswith(DAY_END) else end})
+    want = max(1.0, (t1 - t0) / MAX_POINTS)
+    for b in NICE_BUCKETS:
+        if b >= want:
+            return b
+    return NICE_BUCKETS[-1]
+
+# ────────────────────────────────────────────────────────────────────────────────
+# 다운샘플
+# ────────────────────────────────────────────────────────────────────────────────
+class Downsampler:
+    """버킷(bucket 초, epoch 기준 정렬) 마다 속성별 [min, max, last] + 행 수"""
+
+    def __init__(self, bucket: int, fields: List[str] | None, skip: set):
+        self.bucket = bucket
+        self.fields = fields            # None 이면 처음 보는 숫자 속성 전부
+        self.skip = skip
+        self.points: List[Dict[str, Any]] = []
+        self._cur = None                # 현재 버킷 시작 epoch
+        self._agg: Dict[str, List[float]] = {}
+        self._n = 0
+
+    def add(self, item: Dict[str, Any]):
+        ts = _epoch(item.get(SORT_KEY, {}))
+        if ts is None:
+            return
+        b = ts - (ts + KST_OFFSET) % self.bucket      # 하루/시간 버킷이 KST 자정/정시에 맞게
+        if b != self._cur:
+            self._emit()
+            self._cur = b
+        self._n += 1
+        names = self.fields if self.fields is not None else item.keys()
+        agg = self._agg
+        for k in names:
+            if k in self.skip:
+                continue
+            av = item.get(k)
+            v = _num(av) if av is not None else None
+            if v is None:
+                continue
+            a = agg.get(k)
+            if a is None:
+                agg[k] = [v, v, v]
+            else:
+                if v < a[0]:
+                    a[0] = v
+                if v > a[1]:
+                    a[1] = v
+                a[2] = v
+
+    def _emit(self):
+        if self._cur is None or not self._n:
+            return
+        p: Dict[str, Any] = {"t": _iso(self._cur), "n": self._n}
+        for k, (lo, hi, last) in self._agg.items():
+            p[k] = [_compact(lo), _compact(hi), _compact(last)]
+        self.points.append(p)
+        self._agg = {}
+        self._n = 0
+
+    def finish(self) -> List[Dict[str, Any]]:
+        self._emit()
+        return self.points
+
+def _compact(v: float):
+    return int(v) if v.is_integer() else round(v, 3)
+
+def _plain(item: Dict[str, Any]) -> Dict[str, Any]:
+    """bucket=0 (원본) 응답용 – 숫자는 float/int, 문자열은 그대로"""
+    out = {}
+    for k, av in item.items():
+        v = _num(av)
+        out[k] = _compact(v) if v is not None else av.get("S", next(iter(av.values())))
+    return out
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Lambda 핸들러
+# ────────────────────────────────────────────────────────────────────────────────
+
+def lambda_handler(event, context):
+    # CORS pre‑flight
+    if event.get("httpMethod") == "OPTIONS":
+        return _resp(200, {"message": "CORS preflight OK"})
+
+    qs = event.get("queryStringParameters") or {}
+    entity_key = qs.get("entityKey")
+    if not entity_key:
+        return _resp(400, {"message": "entityKey 쿼리 파라미터 필요"})
+
+    try:
+        start, end = _range(qs.get("start"), qs.get("end"))
+        bucket = int(qs["bucket"]) if qs.get("bucket") not in (None, "") else _auto_bucket(start, end)
+        if bucket < 0:
+            raise ValueError(bucket)
+    except ValueError:
+        return _resp(400, {"message": "start/end 는 YYYY, YYYY-MM, YYYY-MM-DD 또는 날짜+시각, bucket 은 0 이상 정수(초)"})
+    if start > end:
+        # BETWEEN 에 거꾸로 넘기면 DynamoDB 가 ValidationException (→ 500)
+        return _resp(400, {"message": "start 가 end 보다 늦습니다."})
+
+    fields = [f.strip() for f in (qs.get("fields") or "").split(",") if f.strip()] or None
+    args: Dict[str, Any] = {
+        "TableName": TABLE_NAME,
+        "KeyConditionExpression": "#pk = :pk AND #sk BETWEEN :s AND :e",
+        "ExpressionAttributeNames": {"#pk": "entityKey", "#sk": SORT_KEY},
+        "ExpressionAttributeValues": {":pk": {"S": entity_key}, ":s": {"S": start}, ":e": {"S": end}},
+    }
+    if fields:
+        # 정렬 키 + 요청한 속성만 읽음 (RCU 는 같지만 전송량/파싱이 줄어듦)
+        names = [SORT_KEY] + fields
+        args["ProjectionExpression"] = ",".join(f"#f{i}" for i in range(len(names)))
+        args["ExpressionAttributeNames"].update({f"#f{i}": n for i, n in enumerate(names)})
+
+    token = qs.get("nextToken")
+    if token:
+        try:
+            lek = _decode_token(token)
+        except (ValueError, binascii.Error):
+            return _resp(400, {"message": "잘못된 nextToken"})
+        ek = lek.get("entityKey")
+        if not isinstance(ek, dict) or not isinstance(lek.get(SORT_KEY), dict):
+            return _resp(400, {"message": "잘못된 nextToken"})
+        if ek.get("S") != entity_key:
+            return _resp(400, {"message": "nextToken 이 다른 entityKey 의 것입니다."})
+        args["ExclusiveStartKey"] = lek
+
+    ds = Downsampler(bucket, fields, {"entityKey", SORT_KEY}) if bucket > 0 else None
+    raw: List[Dict[str, Any]] = []
+    read, pages = 0, 0
+    next_token = None
+    t0 = time.perf_counter()
+
+    # ① 범위 조회 – 1MB 페이지를 따라가면서 바로 버킷에 합침
+    try:
+        while True:
+            if ds is None:
+                args["Limit"] = RAW_MAX_ITEMS - len(raw)
+            d_resp = ddb_client.query(**args)
+            pages += 1
+            items = d_resp.get("Items", [])
+            read += len(items)
+            if ds is None:
+                raw.extend(_plain(it) for it in items)
+            else:
+                for it in items:
+                    ds.add(it)
+            lek = d_resp.get("LastEvaluatedKey")
+            if not lek:
+                break
+            args["ExclusiveStartKey"] = lek
+            # 원본 한도 / 읽기 한도 / 남은 실행 시간 → 여기서 끊고 이어받을 토큰
+            low_time = context is not None and context.get_remaining_time_in_millis() < TIME_BUDGET_MS
+            if (ds is None and len(raw) >= RAW_MAX_ITEMS) or read >= SCAN_MAX_ITEMS or low_time:
+                next_token = _encode_token(lek)
+                break
+    except Exception as e:
+        return _resp(500, {"message": f"devicedata 조회 실패: {e}"})
+
+    body: Dict[str, Any] = {
+        "entityKey": entity_key,
+        "start"    : start,
+        "end"      : end.rstrip(DAY_END),
+        "bucketSec": bucket,
+        "read"     : read,
+        "pages"    : pages,
+        "queryMs"  : round((time.perf_counter() - t0) * 1000.0, 1),
+        "nextToken": next_token,
+    }
+    if ds is None:
+        body["count"] = len(raw)
+        body["items"] = raw
+    else:
+        # 점마다 {"t", "n", 속성: [min, max, last]} (잘린 경우 마지막 버킷은 다음 응답에 이어짐)
+        body["points"] = ds.finish()
+        body["count"] = len(body["points"])
+    return _resp(200, body)
@@ -1,17 +1,47 @@
 # lambda_function.py – institution → 환자 + 최신 devicedata
 
-import json, boto3
+import base64, binascii, json, os, threading, time, boto3
+from botocore.config import Config
 from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 from typing import Any, Dict, List
 
 # ────────────────────────────────────────────────────────────────────────────────
 # DynamoDB 초기화
 # ────────────────────────────────────────────────────────────────────────────────
-dynamodb      = boto3.resource("dynamodb")
+# 최신 devicedata 를 환자마다 병렬로 조회할 스레드 수 (1 = 예전처럼 순차)
+DEVDATA_WORKERS = int(os.getenv("DEVDATA_WORKERS", "16"))
+# 로컬 테스트용 (DynamoDB Local: http://localhost:8000), 비워두면 AWS
+DDB_ENDPOINT    = os.getenv("DDB_ENDPOINT") or None
+
+# 풀 연결 수 ≥ 워커 수 (기본 10이면 그 이상은 연결을 기다림)
+dynamodb      = boto3.resource("dynamodb", endpoint_url=DDB_ENDPOINT,
+                               config=Config(max_pool_connections=max(10, DEVDATA_WORKERS)))
 tbl_patient   = dynamodb.Table("patient")
 tbl_devdata   = dynamodb.Table("devicedata")
 
+# resource/Table 은 스레드 간 공유 불가 → 워커는 스레드 안전한 저수준 client 를 같이 씀
+ddb_client    = dynamodb.meta.client
+_deser        = TypeDeserializer()
+
+# 페이지 크기 (?limit=, 최대 PAGE_LIMIT_MAX) – 한 번 호출에 읽는 환자 수/RCU 상한
+PAGE_LIMIT     = int(os.getenv("PAGE_LIMIT", "50"))
+PAGE_LIMIT_MAX = int(os.getenv("PAGE_LIMIT_MAX", "200"))
+# 읽을 속성만 지정 (기본 = 비움 = 전체, 줄일 때는 entityKey 에 필요한 roomNo/patientId 포함)
+PATIENT_FIELDS = os.getenv("PATIENT_FIELDS", "")
+DEVDATA_FIELDS = os.getenv("DEVDATA_FIELDS", "")
+
+# 웜 스타트 사이에 재사용 (호출마다 스레드를 새로 만들지 않음)
+_pool = ThreadPoolExecutor(max_workers=DEVDATA_WORKERS) if DEVDATA_WORKERS > 1 else None
+
+# 웜 컨테이너 캐시 (키 종류별 최대 나이, 초) – 0 이면 그 종류는 캐시 안 함
+PATIENT_TTL_SEC = float(os.getenv("PATIENT_TTL_SEC", "300"))   # 환자 목록은 거의 안 바뀜
+LATEST_TTL_SEC  = float(os.getenv("LATEST_TTL_SEC", "5"))      # 최신 devicedata (대시보드 폴링 주기 정도)
+CACHE_MAX_ITEMS = int(os.getenv("CACHE_MAX_ITEMS", "5000"))
+
 # ────────────────────────────────────────────────────────────────────────────────
 # 공통 유틸
 # ────────────────────────────────────────────────────────────────────────────────
@@ -19,19 +49,124 @@ CORS_HEADERS: Dict[str, str] = {
     "Access-Control-Allow-Origin" : "*",
     "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
     "Access-Control-Allow-Methods": "GET,OPTIONS",
+    "Access-Control-Expose-Headers": "X-Cache-Hits,X-Cache-Misses,X-Cache-Size",
     "Content-Type"                : "application/json",
 }
 
+class _TTLCache:
+    """
+    모듈 전역 TTL + LRU 캐시 (웜 호출 사이에 유지, 컨테이너마다 따로).
+    값마다 넣을 때 정한 TTL 로 만료되고, 가득 차면 가장 오래 안 쓴 것부터 버린다.
+    최신 devicedata 는 풀 스레드에서도 읽으므로 락으로 보호.
+    """
+    _MISS = object()
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._d: "OrderedDict[Any, tuple]" = OrderedDict()   # key → (저장 시각, 만료 시각, 값)
+        self._lock = threading.Lock()
+
+    def get(self, key, max_age: float | None = None):
+        """없거나 만료됐거나 max_age 보다 오래됐으면 _MISS"""
+        now = time.monotonic()
+        with self._lock:
+            hit = self._d.get(key)
+            if hit is not None and now < hit[1] and (max_age is None or now - hit[0] <= max_age):
+                self._d.move_to_end(key)
+                self.hits += 1
+                return hit[2]
+            if hit is not None and now >= hit[1]:
+                del self._d[key]
+            self.misses += 1
+            return self._MISS
+
+    def put(self, key, value, ttl: float):
+        if ttl <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._d[key] = (now, now + ttl, value)
+            self._d.move_to_end(key)
+            while len(self._d) > self.max_items:
+                self._d.popitem(last=False)
+
+    def invalidate(self, pred) -> int:
+        """pred(key) 가 참인 항목 삭제, 지운 개수"""
+        with self._lock:
+            keys = [k for k in self._d if pred(k)]
+            for k in keys:
+                del self._d[k]
+        return len(keys)
+
+    def __len__(self):
+        return len(self._d)
+
+_cache = _TTLCache(CACHE_MAX_ITEMS)
+
+# ── 무효화 훅 (환자 등록/수정, devicedata 기록 쪽에서 같은 컨테이너 안이면 직접 호출) ──
+def invalidate_institution(inst_id: str) -> int:
+    """기관의 환자 목록 페이지 전부"""
+    return _cache.invalidate(lambda k: k[0] == "patient" and k[1] == inst_id)
+
+def invalidate_entity(entity_key: str) -> int:
+    """entityKey 하나의 최신 devicedata"""
+    return _cache.invalidate(lambda k: k == ("latest", entity_key))
+
+def invalidate_all() -> int:
+    return _cache.invalidate(lambda k: True)
+
 def _decimal(o: Any):
     """DynamoDB Decimal → int/float (JSON 직렬화용)"""
     if isinstance(o, Decimal):
         return int(o) if o % 1 == 0 else float(o)
     raise TypeError
 
-def _resp(code: int, body: Any):
+def _projection(fields: str) -> Dict[str, Any]:
+    """"a,b,name" → ProjectionExpression 인자 (name 같은 예약어 때문에 전부 #이름으로)"""
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    if not names:
+        return {}
+    return {
+        "ProjectionExpression"    : ",".join(f"#f{i}" for i in range(len(names))),
+        "ExpressionAttributeNames": {f"#f{i}": n for i, n in enumerate(names)},
+    }
+
+PATIENT_PROJ = _projection(PATIENT_FIELDS)
+DEVDATA_PROJ = _projection(DEVDATA_FIELDS)
+
+def _encode_token(lek: Dict[str, Any]) -> str:
+    """LastEvaluatedKey → nextToken (URL 에 그대로 넣을 수 있는 base64)"""
+    raw = json.dumps(lek, default=_decimal, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _decode_token(token: str) -> Dict[str, Any]:
+    raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    lek = json.loads(raw)
+    if not isinstance(lek, dict):
+        raise ValueError(token)
+    return lek
+
+def _latest(entity_key: str) -> Dict[str, Any]:
+    """entityKey 의 가장 최근 devicedata 1건 (없으면 {}) – 읽은 값은 LATEST_TTL_SEC 동안 캐시"""
+    d_resp = ddb_client.query(
+        TableName="devicedata",
+        KeyConditionExpression="entityKey = :ek",
+        ExpressionAttributeValues={":ek": {"S": entity_key}},
+        ScanIndexForward=False,
+        Limit=1,
+        **DEVDATA_PROJ,
+    )
+    items = d_resp.get("Items") or [{}]
+    latest = {k: _deser.deserialize(v) for k, v in items[0].items()}
+    _cache.put(("latest", entity_key), latest, LATEST_TTL_SEC)
+    return latest
+
+def _resp(code: int, body: Any, headers: Dict[str, str] | None = None):
     return {
         "statusCode": code,
-        "headers"    : CORS_HEADERS,
+        "headers"    : dict(CORS_HEADERS, **headers) if headers else CORS_HEADERS,
         "body"       : json.dumps(body, default=_decimal),
     }
 
@@ -49,32 +184,85 @@ def lambda_handler(event, context):
     if not inst_id:
         return _resp(400, {"message": "institutionId 쿼리 파라미터 필요"})
 
-    # ① 환자 목록 조회 (PK = institutionId, SK = patientId)
+    # 페이지: ?limit=50&nextToken=<이전 응답의 nextToken>
     try:
-        p_resp = tbl_patient.query(
-            KeyConditionExpression=Key("institutionId").eq(inst_id)
-        )
-    except Exception as e:
-        return _resp(500, {"message": f"patient 조회 실패: {e}"})
+        limit = int(qs.get("limit") or PAGE_LIMIT)
+    except ValueError:
+        return _resp(400, {"message": "limit 은 숫자여야 합니다."})
+    limit = max(1, min(limit, PAGE_LIMIT_MAX))
 
-    patients: List[Dict[str, Any]] = p_resp.get("Items", [])
-    if not patients:
+    # 캐시 허용 나이: ?maxAge=<초> 로 줄이거나, ?refresh=1 / Cache-Control: no-cache 면 새로 읽음
+    headers = {k.lower(): v for k, v in (event.get("headers") or {}).items()}
+    max_age: float | None = None
+    try:
+        if qs.get("maxAge") is not None:
+            max_age = max(0.0, float(qs["maxAge"]))
+    except ValueError:
+        return _resp(400, {"message": "maxAge 는 숫자(초)여야 합니다."})
+    if qs.get("refresh") == "1" or "no-cache" in headers.get("cache-control", ""):
+        max_age = 0.0
+    hits0, misses0 = _cache.hits, _cache.misses
+
+    page_args: Dict[str, Any] = {}
+    token = qs.get("nextToken")
+    if token:
+        try:
+            start_key = _decode_token(token)
+        except (ValueError, binascii.Error):
+            return _resp(400, {"message": "잘못된 nextToken"})
+        if start_key.get("institutionId") != inst_id:
+            return _resp(400, {"message": "nextToken 이 다른 기관의 것입니다."})
+        page_args["ExclusiveStartKey"] = start_key
+
+    # ① 환자 목록 한 페이지 조회 (PK = institutionId, SK = patientId), 페이지 단위로 캐시
+    page_key = ("patient", inst_id, limit, token or "")
+    page = _cache.get(page_key, max_age)
+    if page is _TTLCache._MISS:
+        try:
+            p_resp = tbl_patient.query(
+                KeyConditionExpression=Key("institutionId").eq(inst_id),
+                Limit=limit,
+                **PATIENT_PROJ,
+                **page_args,
+            )
+        except Exception as e:
+            return _resp(500, {"message": f"patient 조회 실패: {e}"})
+        page = (p_resp.get("Items", []), p_resp.get("LastEvaluatedKey"))
+        _cache.put(page_key, page, PATIENT_TTL_SEC)
+
+    patients: List[Dict[str, Any]]
+    patients, lek = page
+    next_token = _encode_token(lek) if lek else None
+    if not patients and not token:
         return _resp(404, {"message": "해당 기관에 등록된 환자가 없습니다."})
 
-    # ② 각 환자별 최신 devicedata 조회 (순차 방식)
+    # ② 각 환자별 최신 devicedata 조회
+    #    환자마다 query 1번(N+1)이라 순차로 돌면 응답 시간이 환자 수에 비례 →
+    #    DEVDATA_WORKERS 개씩 동시에 보내서 왕복 몇 번 안에 끝냄 (결과는 환자 순서 그대로)
+    # entityKey = inst001#101#p001
+    #    캐시에 있는 건 바로 쓰고, 없는 것만 DynamoDB 로
+    keys = [f"{inst_id}#{p['roomNo']}#{p['patientId']}" for p in patients]
+    latest_all = [_cache.get(("latest", k), max_age) for k in keys]
+    todo = [i for i, v in enumerate(latest_all) if v is _TTLCache._MISS]
+    try:
+        if _pool is not None and len(todo) > 1:
+            fetched = list(_pool.map(_latest, [keys[i] for i in todo]))
+        else:
+            fetched = [_latest(keys[i]) for i in todo]
+    except Exception as e:
+        return _resp(500, {"message": f"devicedata 조회 실패: {e}"})
+    for i, latest in zip(todo, fetched):
+        latest_all[i] = latest
+
     items: List[Dict[str, Any]] = []
-    for p in patients:
-        # entityKey = inst001#101#p001
-        entity_key = f"{inst_id}#{p['roomNo']}#{p['patientId']}"
-        d_resp = tbl_devdata.query(
-            KeyConditionExpression=Key("entityKey").eq(entity_key),
-            ScanIndexForward=False,
-            Limit=1,
-        )
-        latest = d_resp.get("Items", [{}])[0]
+    for p, latest in zip(patients, latest_all):
         items.append({
             "patient"    : p,
             "latestData" : latest,
         })
 
-    return _resp(200, {"count": len(items), "items": items})
+    return _resp(200, {"count": len(items), "items": items, "nextToken": next_token}, {
+        "X-Cache-Hits"  : str(_cache.hits - hits0),
+        "X-Cache-Misses": str(_cache.misses - misses0),
+        "X-Cache-Size"  : str(len(_cache)),
+    })
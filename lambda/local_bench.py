@@ -0,0 +1,321 @@
+# local_bench.py – Lambda 로컬 실행/시간 측정 (moto 또는 DynamoDB Local)
+#
+#   pip install boto3 "moto[dynamodb]"
+#   python local_bench.py institution --patients 200 --rtt-ms 10
+#   python local_bench.py pages --patients 1000 --limit 50
+#   python local_bench.py cache --patients 200 --polls 20
+#   python local_bench.py devicedata --hours 6 --hz 5
+#   python local_bench.py auth --repeat 50
+#   DDB_ENDPOINT=http://localhost:8000 python local_bench.py institution --patients 200
+#
+# DDB_ENDPOINT 가 없으면 moto 로 메모리 안에서 돌리고, --rtt-ms 만큼 DynamoDB 호출마다
+# 잠깐 쉬게 해서 실제 왕복 지연을 흉내 낸다. (DynamoDB Local 은 실제 HTTP 라 --rtt-ms 0 권장)
+
+import argparse, importlib, json, os, statistics, subprocess, sys, time
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-northeast-2")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "local")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "local")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# 테이블/데이터 준비
+# ────────────────────────────────────────────────────────────────────────────────
+def _create(ddb, name, pk, sk=None):
+    keys = [{"AttributeName": pk, "KeyType": "HASH"}]
+    attrs = [{"AttributeName": pk, "AttributeType": "S"}]
+    if sk:
+        keys.append({"AttributeName": sk, "KeyType": "RANGE"})
+        attrs.append({"AttributeName": sk, "AttributeType": "S"})
+    try:
+        ddb.create_table(TableName=name, KeySchema=keys, AttributeDefinitions=attrs,
+                         BillingMode="PAY_PER_REQUEST")
+    except ddb.exceptions.ResourceInUseException:
+        pass
+
+
+def seed_institution(ddb, inst_id="inst001", patients=200, readings=5):
+    """patient(institutionId, patientId) + devicedata(entityKey, timestamp)"""
+    import boto3
+    _create(ddb, "patient", "institutionId", "patientId")
+    _create(ddb, "devicedata", "entityKey", "timestamp")
+    res = boto3.resource("dynamodb", endpoint_url=os.getenv("DDB_ENDPOINT") or None)
+    with res.Table("patient").batch_writer() as bw:
+        for i in range(patients):
+            bw.put_item(Item={"institutionId": inst_id, "patientId": f"p{i:04d}",
+                              "roomNo": str(100 + i // 4), "name": f"환자{i}", "bedId": "ABCD"[i % 4]})
+    with res.Table("devicedata").batch_writer() as bw:
+        for i in range(patients):
+            ek = f"{inst_id}#{100 + i // 4}#p{i:04d}"
+            for r in range(readings):
+                bw.put_item(Item={"entityKey": ek, "timestamp": f"2026-10-18T10:00:{r:02d}",
+                                  "call_button": r % 2, "fall_event": 0})
+
+
+def _add_rtt(client, rtt_ms):
+    """moto 에서 DynamoDB 호출마다 rtt_ms 쉬기 (실제 왕복 지연 흉내)"""
+    if rtt_ms <= 0:
+        return
+    client.meta.events.register("before-call.dynamodb.*", lambda **kw: time.sleep(rtt_ms / 1000.0))
+
+
+def _timeit(fn, repeat):
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        r = fn()
+        out.append((time.perf_counter() - t0) * 1000.0)
+    return out, r
+
+
+def _ms(xs):
+    return f"중앙값 {statistics.median(xs):7.1f}ms  최대 {max(xs):7.1f}ms"
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# 시나리오
+# ────────────────────────────────────────────────────────────────────────────────
+def bench_institution(args):
+    import boto3
+    seed_institution(boto3.client("dynamodb", endpoint_url=os.getenv("DDB_ENDPOINT") or None),
+                     patients=args.patients)
+    mod = importlib.import_module("dynamoDB_v250610")
+    _add_rtt(mod.ddb_client, args.rtt_ms)
+    event = {"httpMethod": "GET", "queryStringParameters": {"institutionId": "inst001"}}
+
+    pool = mod._pool
+    results = {}
+    for label, p in (("순차", None), (f"병렬 x{mod.DEVDATA_WORKERS}", pool)):
+        mod._pool = p
+        # 캐시 없이 DynamoDB 조회 시간만 비교
+        times, resp = _timeit(lambda: (mod.invalidate_all(), mod.lambda_handler(event, None))[1], args.repeat)
+        body = json.loads(resp["body"])
+        results[label] = body
+        print(f"{label:10} 환자 {body.get('count')}명  {_ms(times)}")
+    mod._pool = pool
+    a, b = results.values()
+    print("결과 동일" if a == b else "결과 다름!")
+
+
+def bench_pages(args):
+    """nextToken 으로 끝까지 넘겨보면서 빠짐/중복 없는지, 페이지당 시간/크기"""
+    import boto3
+    seed_institution(boto3.client("dynamodb", endpoint_url=os.getenv("DDB_ENDPOINT") or None),
+                     patients=args.patients)
+    mod = importlib.import_module("dynamoDB_v250610")
+    _add_rtt(mod.ddb_client, args.rtt_ms)
+
+    seen, times, sizes, token = [], [], [], None
+    while True:
+        qs = {"institutionId": "inst001", "limit": str(args.limit)}
+        if token:
+            qs["nextToken"] = token
+        t0 = time.perf_counter()
+        resp = mod.lambda_handler({"httpMethod": "GET", "queryStringParameters": qs}, None)
+        times.append((time.perf_counter() - t0) * 1000.0)
+        sizes.append(len(resp["body"]))
+        body = json.loads(resp["body"])
+        seen += [it["patient"]["patientId"] for it in body["items"]]
+        token = body.get("nextToken")
+        if not token:
+            break
+    ok = len(seen) == len(set(seen)) == args.patients
+    print(f"페이지 {len(times)}개 (limit {args.limit}), 환자 {len(seen)}명 {'빠짐/중복 없음' if ok else '불일치!'}")
+    print(f"페이지당 {_ms(times)}, 응답 최대 {max(sizes) / 1024:.1f}KB")
+    print(f"patient 속성: {sorted(json.loads(resp['body'])['items'][0]['patient']) if seen else '-'}")
+
+
+def bench_cache(args):
+    """대시보드 폴링 흉내: 같은 요청을 --interval 초마다 --polls 번, DynamoDB 호출 수/지연/캐시 헤더"""
+    import boto3
+    seed_institution(boto3.client("dynamodb", endpoint_url=os.getenv("DDB_ENDPOINT") or None),
+                     patients=args.patients)
+    mod = importlib.import_module("dynamoDB_v250610")
+    _add_rtt(mod.ddb_client, args.rtt_ms)
+    calls = [0]
+
+    def count(**kw):
+        calls[0] += 1
+    mod.ddb_client.meta.events.register("before-call.dynamodb.*", count)
+
+    event = {"httpMethod": "GET",
+             "queryStringParameters": {"institutionId": "inst001", "limit": str(args.limit)}}
+    rows = []
+    for i in range(args.polls):
+        c0, t0 = calls[0], time.perf_counter()
+        resp = mod.lambda_handler(event, None)
+        ms = (time.perf_counter() - t0) * 1000.0
+        h = resp["headers"]
+        rows.append((ms, calls[0] - c0))
+        print(f"  #{i:02d} {ms:8.1f}ms  DynamoDB {calls[0] - c0:4d}회  "
+              f"hit {h.get('X-Cache-Hits')} miss {h.get('X-Cache-Misses')}")
+        time.sleep(args.interval)
+    warm = [ms for ms, _ in rows[1:]]
+    print(f"첫 호출 {rows[0][0]:.1f}ms, 이후 {_ms(warm)}, DynamoDB 총 {sum(c for _, c in rows)}회 "
+          f"(캐시 없으면 {rows[0][1] * len(rows)}회)")
+
+
+def seed_devicedata(ddb, entity_key, hours, hz, start="2026-10-18T00:00:00"):
+    """5Hz 같은 연속 측정값 (timestamp 정렬 키는 pi_publisher 와 같은 "YYYY-MM-DD HH:MM:SS.mmm")"""
+    import boto3, datetime as dt, math, random
+    from decimal import Decimal
+    _create(ddb, "devicedata", "entityKey", "timestamp")
+    res = boto3.resource("dynamodb", endpoint_url=os.getenv("DDB_ENDPOINT") or None)
+    t0 = dt.datetime.fromisoformat(start)
+    step = dt.timedelta(seconds=1.0 / hz)
+    rnd = random.Random(1)
+    n = int(hours * 3600 * hz)
+    with res.Table("devicedata").batch_writer() as bw:
+        for i in range(n):
+            ts = t0 + step * i
+            bw.put_item(Item={
+                "entityKey": entity_key,
+                "timestamp": ts.isoformat(sep=" ", timespec="milliseconds"),
+                "ultrasonic": Decimal(str(round(80 + 30 * math.sin(i / 500) + rnd.gauss(0, 2), 1))),
+                "call_button": int(rnd.random() < 0.001),
+                "fall_event": int(rnd.random() < 0.0005) * 2,
+            })
+    return n
+
+
+def bench_devicedata(args):
+    """원본 그대로(bucket=0) vs 서버 측 다운샘플 – 응답 크기/시간"""
+    import boto3
+    ek = "inst001#101#p0001"
+    t0 = time.perf_counter()
+    n = seed_devicedata(boto3.client("dynamodb", endpoint_url=os.getenv("DDB_ENDPOINT") or None),
+                        ek, args.hours, args.hz)
+    print(f"devicedata {n}행 ({args.hours:g}시간 x {args.hz:g}Hz) 준비 {time.perf_counter() - t0:.1f}초")
+    os.environ.setdefault("RAW_MAX_ITEMS", str(n + 1))
+    mod = importlib.import_module("devicedataLambda")
+    _add_rtt(mod.ddb_client, args.rtt_ms)
+
+    end = f"2026-10-18T{min(23, int(args.hours)):02d}:59:59"
+    for label, bucket in (("원본", "0"), ("자동 버킷", ""), ("버킷 60초", "60")):
+        qs = {"entityKey": ek, "start": "2026-10-18", "end": end, "bucket": bucket}
+        times, resp = _timeit(lambda: mod.lambda_handler({"httpMethod": "GET", "queryStringParameters": qs}, None),
+                              args.repeat)
+        body = json.loads(resp["body"])
+        print(f"{label:8} 점 {body['count']:>7} 버킷 {body['bucketSec']:>4}초  읽음 {body['read']}행/{body['pages']}페이지  "
+              f"응답 {len(resp['body']) / 1024:8.1f}KB  {_ms(times)}")
+
+
+_COLD = r"""
+import json, os, sys, time
+sys.path.insert(0, {here!r})
+t0 = time.perf_counter()
+import {mod} as m
+t1 = time.perf_counter()
+
+# 여기부터 시간 밖: moto 연결 + User 테이블/로그인용 사용자 준비
+# (moto 가 boto3 를 먼저 import 하면 위 import 시간이 줄어 보이므로 Lambda import 뒤에 붙임)
+if not os.getenv("DDB_ENDPOINT"):
+    from moto import mock_aws
+    from moto.core.models import botocore_stubber
+    m.ddb_client.meta.events.register("before-send", botocore_stubber)
+    mock_aws().start()
+if {rtt_ms}:
+    m.ddb_client.meta.events.register("before-call.dynamodb.*", lambda **kw: time.sleep({rtt_ms} / 1000.0))
+import boto3
+ddb = boto3.client("dynamodb", endpoint_url=os.getenv("DDB_ENDPOINT") or None)
+try:
+    ddb.create_table(TableName="User", KeySchema=[{{"AttributeName": "email", "KeyType": "HASH"}}],
+                     AttributeDefinitions=[{{"AttributeName": "email", "AttributeType": "S"}}],
+                     BillingMode="PAY_PER_REQUEST")
+except ddb.exceptions.ResourceInUseException:
+    pass
+ddb.put_item(TableName="User", Item={{"email": {{"S": "cold@x.kr"}}, "password": {{"S": "pw"}},
+                                      "role": {{"S": "staff"}}}})
+email = "cold@x.kr" if "{mod}" == "loginLambda" else f"cold{{time.time_ns()}}@x.kr"
+event = {{"httpMethod": "POST", "body": json.dumps({{"username": "u", "email": email, "password": "pw"}})}}
+
+t2 = time.perf_counter()
+resp = m.lambda_handler(event, None)
+t3 = time.perf_counter()
+assert resp["statusCode"] == 200, resp
+print(json.dumps([(t1 - t0) * 1000, (t3 - t2) * 1000]))
+"""
+
+
+def bench_auth(args):
+    """콜드 스타트(새 프로세스: import + 첫 DynamoDB 호출) + moto 에서 호출당 지연/DynamoDB 호출 수"""
+    import boto3
+    for name in ("loginLambda", "signupLambda"):
+        imp, first = [], []
+        for _ in range(args.cold):
+            out = subprocess.run([sys.executable, "-c", _COLD.format(here=HERE, mod=name, rtt_ms=args.rtt_ms)],
+                                 capture_output=True, text=True, check=True, env=os.environ)
+            a, b = json.loads(out.stdout)
+            imp.append(a)
+            first.append(b)
+        print(f"{name:12} 콜드 import {_ms(imp)} | 첫 DynamoDB 호출 {_ms(first)} | "
+              f"합 {_ms([a + b for a, b in zip(imp, first)])}")
+
+    # 모든 client 의 DynamoDB 호출 수 (lambda 가 client 를 만들기 전에 세션에 등록)
+    calls = [0]
+
+    def count(**kw):
+        calls[0] += 1
+    boto3.setup_default_session()
+    boto3.DEFAULT_SESSION.events.register("before-call.dynamodb.*", count)
+    ddb = boto3.client("dynamodb", endpoint_url=os.getenv("DDB_ENDPOINT") or None)
+    _create(ddb, "User", "email")
+    login = importlib.import_module("loginLambda")
+    signup = importlib.import_module("signupLambda")
+    for mod in (login, signup):
+        _add_rtt(mod.ddb_client, args.rtt_ms)
+
+    seq = [0]
+
+    def new_user():
+        seq[0] += 1
+        return {"httpMethod": "POST", "body": json.dumps(
+            {"username": "u", "email": f"u{seq[0]}@x.kr", "password": "pw"})}
+    cases = [
+        ("signup 신규", signup, new_user),
+        ("signup 중복", signup, lambda: {"httpMethod": "POST", "body": json.dumps(
+            {"username": "u", "email": "u1@x.kr", "password": "pw"})}),
+        ("login 성공", login, lambda: {"httpMethod": "POST", "body": json.dumps(
+            {"email": "u1@x.kr", "password": "pw"})}),
+        ("login 실패", login, lambda: {"httpMethod": "POST", "body": json.dumps(
+            {"email": "u1@x.kr", "password": "no"})}),
+    ]
+    for label, mod, make in cases:
+        c0 = calls[0]
+        times, resp = _timeit(lambda: mod.lambda_handler(make(), None), args.repeat)
+        print(f"{label:10} HTTP {resp['statusCode']}  DynamoDB {(calls[0] - c0) / args.repeat:.0f}회/호출  {_ms(times)}")
+
+
+SCENARIOS = {"institution": bench_institution, "pages": bench_pages, "cache": bench_cache,
+             "devicedata": bench_devicedata, "auth": bench_auth}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Lambda 로컬 실행/시간 측정")
+    ap.add_argument("scenario", choices=list(SCENARIOS))
+    ap.add_argument("--patients", type=int, default=200)
+    ap.add_argument("--rtt-ms", type=float, default=10.0, help="moto 에서 흉내 낼 DynamoDB 왕복 지연")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--limit", type=int, default=50, help="pages/cache: 페이지 크기")
+    ap.add_argument("--polls", type=int, default=20, help="cache: 폴링 횟수")
+    ap.add_argument("--interval", type=float, default=1.0, help="cache: 폴링 간격(초)")
+    ap.add_argument("--hours", type=float, default=2.0, help="devicedata: 만들 데이터 길이(시간)")
+    ap.add_argument("--hz", type=float, default=5.0, help="devicedata: 측정 주기(Hz)")
+    ap.add_argument("--cold", type=int, default=5, help="auth: 콜드 스타트 측정 프로세스 수")
+    args = ap.parse_args()
+
+    if os.getenv("DDB_ENDPOINT"):
+        print(f"DynamoDB Local: {os.environ['DDB_ENDPOINT']}")
+        SCENARIOS[args.scenario](args)
+        return
+    from moto import mock_aws
+    print(f"moto (왕복 지연 {args.rtt_ms:g}ms 흉내)")
+    with mock_aws():
+        SCENARIOS[args.scenario](args)
+
+
+if __name__ == "__main__":
+    main()
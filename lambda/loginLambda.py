@@ -1,33 +1,62 @@
 import json
+import os
 import boto3
 
-# DynamoDB 리소스 생성
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('User')
+# DynamoDB 저수준 client 는 모듈 로드(init 단계) 때 한 번만 만들고 웜 호출에서 재사용
+# (처음 요청으로 미루면 첫 DynamoDB 호출이 boto3 import + client 생성을 그대로 떠안음)
+TABLE_NAME = os.getenv('USER_TABLE', 'User')
+DDB_ENDPOINT = os.getenv('DDB_ENDPOINT') or None   # 로컬 테스트용 (DynamoDB Local)
+ddb_client = boto3.client('dynamodb', endpoint_url=DDB_ENDPOINT)
 
-def lambda_handler(event, context):
-    # 모든 응답에 CORS 헤더 포함
-    headers = {
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-        'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS',
-        'Content-Type': 'application/json'
+
+# 모든 응답에 CORS 헤더 포함 (요청마다 새로 만들지 않음)
+HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+    'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS',
+    'Content-Type': 'application/json'
+}
+
+
+def _resp(code, body):
+    return {
+        'statusCode': code,
+        'headers': HEADERS,
+        'body': body if isinstance(body, str) else json.dumps(body)
     }
-    
+
+
+# 내용이 고정된 응답은 import 때 한 번만 인코딩
+RESP_PREFLIGHT = _resp(200, {'message': 'CORS preflight'})
+RESP_MISSING = _resp(400, {'message': '이메일과 비밀번호는 필수 항목입니다.'})
+RESP_NO_USER = _resp(401, {'message': '존재하지 않는 사용자입니다.'})
+RESP_BAD_PASSWORD = _resp(401, {'message': '비밀번호가 틀렸습니다.'})
+_ok_by_role = {}   # role → 로그인 성공 응답
+
+
+def _login_ok(role):
+    r = _ok_by_role.get(role)
+    if r is None:
+        r = _ok_by_role[role] = _resp(200, {
+            'message': '로그인 성공',
+            'role': role,
+            'hospitalId': 'H001',
+            'hospitalName': '서울대병원'
+        })
+    return r
+
+
+def lambda_handler(event, context):
     # OPTIONS 요청 처리 (CORS preflight)
     if event.get('httpMethod') == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({'message': 'CORS preflight'})
-        }
-    
+        return RESP_PREFLIGHT
+
     try:
         # API Gateway를 통해 전달된 JSON 문자열 파싱
         if isinstance(event.get('body'), str):
             body = json.loads(event['body'])
         else:
-            body = event.get('body', {})
+            body = event.get('body') or {}
 
         # 클라이언트로부터 전달받은 값 추출
         email = body.get('email')
@@ -35,49 +64,27 @@ def lambda_handler(event, context):
 
         # 필수값 확인
         if not email or not password:
-            return {
-                'statusCode': 400,
-                'headers': headers,
-                'body': json.dumps({'message': '이메일과 비밀번호는 필수 항목입니다.'})
-            }
-
-        # DynamoDB에서 사용자 정보 조회
-        response = table.get_item(Key={'email': email})
-        
+            return RESP_MISSING
+
+        # DynamoDB에서 사용자 정보 조회 (비밀번호/역할만 읽음, role 은 예약어)
+        response = ddb_client.get_item(
+            TableName=TABLE_NAME,
+            Key={'email': {'S': email}},
+            ProjectionExpression='password, #r',
+            ExpressionAttributeNames={'#r': 'role'}
+        )
+
         if 'Item' not in response:
-            return {
-                'statusCode': 401,
-                'headers': headers,
-                'body': json.dumps({'message': '존재하지 않는 사용자입니다.'})
-            }
-        
+            return RESP_NO_USER
+
         user = response['Item']
-        
+
         # 비밀번호 검증
-        if user['password'] != password:
-            return {
-                'statusCode': 401,
-                'headers': headers,
-                'body': json.dumps({'message': '비밀번호가 틀렸습니다.'})
-            }
-        
+        if user.get('password', {}).get('S') != password:
+            return RESP_BAD_PASSWORD
+
         # 로그인 성공
-        user_role = user.get('role', 'staff')
-        
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({
-                'message': '로그인 성공',
-                'role': user_role,
-                'hospitalId': 'H001',
-                'hospitalName': '서울대병원'
-            })
-        }
+        return _login_ok(user.get('role', {}).get('S', 'staff'))
 
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': headers,
-            'body': json.dumps({'message': f'오류 발생: {str(e)}'})
-        }
\ No newline at end of file
+        return _resp(500, {'message': f'오류 발생: {str(e)}'})
@@ -1,34 +1,49 @@
 import json
+import os
 import boto3
 
+# DynamoDB 저수준 client 는 모듈 로드(init 단계) 때 한 번만 만들고 웜 호출에서 재사용
+# (처음 요청으로 미루면 첫 DynamoDB 호출이 boto3 import + client 생성을 그대로 떠안음)
+TABLE_NAME = os.getenv('USER_TABLE', 'User')
+DDB_ENDPOINT = os.getenv('DDB_ENDPOINT') or None   # 로컬 테스트용 (DynamoDB Local)
+ddb_client = boto3.client('dynamodb', endpoint_url=DDB_ENDPOINT)
 
-# DynamoDB 리소스 생성
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('User')
 
-def lambda_handler(event, context):
-    # 모든 응답에 CORS 헤더 포함
-    headers = {
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-        'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS',
-        'Content-Type': 'application/json'
+# 모든 응답에 CORS 헤더 포함 (요청마다 새로 만들지 않음)
+HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+    'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS',
+    'Content-Type': 'application/json'
+}
+
+
+def _resp(code, body):
+    return {
+        'statusCode': code,
+        'headers': HEADERS,
+        'body': body if isinstance(body, str) else json.dumps(body)
     }
-    
+
+
+# 내용이 고정된 응답은 import 때 한 번만 인코딩
+RESP_PREFLIGHT = _resp(200, {'message': 'CORS preflight'})
+RESP_MISSING = _resp(400, {'message': '사용자명, 이메일, 비밀번호는 필수 항목입니다.'})
+RESP_DUPLICATE = _resp(409, {'message': '이미 등록된 이메일입니다.'})
+RESP_OK = _resp(200, {'message': '회원가입이 완료되었습니다.'})
+
+
+def lambda_handler(event, context):
     # OPTIONS 요청 처리 (CORS preflight)
     if event.get('httpMethod') == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({'message': 'CORS preflight'})
-        }
-    
+        return RESP_PREFLIGHT
+
     try:
         # API Gateway를 통해 전달된 JSON 문자열 파싱
         if isinstance(event.get('body'), str):
             body = json.loads(event['body'])
         else:
-            body = event.get('body', {})
+            body = event.get('body') or {}
 
         # 클라이언트로부터 전달받은 값 추출
         username = body.get('username')
@@ -38,39 +53,27 @@ def lambda_handler(event, context):
 
         # 필수값 확인
         if not username or not email or not password:
-            return {
-                'statusCode': 400,
-                'headers': headers,
-                'body': json.dumps({'message': '사용자명, 이메일, 비밀번호는 필수 항목입니다.'})
-            }
+            return RESP_MISSING
 
-        # 중복 이메일 확인
-        existing_user = table.get_item(Key={'email': email})
-        if 'Item' in existing_user:
-            return {
-                'statusCode': 409,
-                'headers': headers,
-                'body': json.dumps({'message': '이미 등록된 이메일입니다.'})
-            }
+        # 새 사용자 등록 – 같은 이메일이 없을 때만 (중복 확인 + 저장을 왕복 1번으로, 동시 가입도 안전)
+        try:
+            ddb_client.put_item(
+                TableName=TABLE_NAME,
+                Item={
+                    'email': {'S': email},
+                    'username': {'S': username},
+                    'password': {'S': password},  # 임시로 평문 저장 (나중에 해시화 필요)
+                    'role': {'S': str(role)}
+                },
+                ConditionExpression='attribute_not_exists(email)'
+            )
+        except Exception as e:
+            code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+            if code == 'ConditionalCheckFailedException':
+                return RESP_DUPLICATE
+            raise
 
-        # 새 사용자 등록
-        table.put_item(Item={
-            'email': email,
-            'username': username,
-            'password': password,  # 임시로 평문 저장 (나중에 해시화 필요)
-            'role': role
-        })
-
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({'message': '회원가입이 완료되었습니다.'})
-        }
+        return RESP_OK
 
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': headers,
-            'body': json.dumps({'message': f'오류 발생: {str(e)}'})
-        }
-
+        return _resp(500, {'message': f'오류 발생: {str(e)}'})
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+침대 상태 저장소 (고정 크기 배열)
+
+bed_id 문자열을 정수 슬롯으로 한 번만 바꿔두고(intern),
+센서 최신값 / 호출벨 / fall_event / 발행 기록 / 예측 히스토리를
+미리 잡아둔 NumPy 배열에 슬롯 단위로 둔다.
+침대 하나당 메모리가 고정이고, 샘플마다 dict나 문자열을 새로 만들지 않는다.
+
+스레드 규칙 (pi_publisher 파이프라인 기준)
+  - 슬롯 등록(intern)과 센서/호출벨 갱신, 발행 기록: 틱 스레드
+  - 윈도우 / step / fall 상태머신(예측 히스토리, fall_event): 그 침대를 맡은 추론 워커
+배열은 다시 할당하지 않으므로(최대 침대 수 고정) 다른 스레드가 참조를 들고 있어도 안전하다.
+"""
+
+import numpy as np
+
+from window_features import BedWindow
+from fall_state import FallStateMachine
+
+
+class BedStateStore:
+    def __init__(self, cols, window_size: int, fall: FallStateMachine, max_beds: int = 64):
+        self.cols = list(cols)
+        self.max_beds = max_beds
+        self.window_size = window_size
+
+        self.ids = {}                       # bed_id → 슬롯
+        self.bed_ids = [None] * max_beds    # 슬롯 → bed_id
+        self.n = 0                          # 사용 중인 슬롯 수
+        self.rejected = 0                   # 슬롯이 모자라 무시한 샘플 수
+
+        nc = len(self.cols)
+        # 센서 최신값 (NaN = 아직 없음)
+        self.ultra = np.full((max_beds, nc), np.nan, dtype=np.float64)
+
+        # 예측 히스토리 링 + fall_event 상태머신 (행 = 슬롯)
+        self.fall = fall
+
+        # 서버 발행 상태 (fall_event는 상태머신 배열을 그대로 봄)
+        self.call_button = np.zeros(max_beds, dtype=np.int8)
+        self.fall_event  = fall.state
+        self.last_pub    = np.zeros(max_beds, dtype=np.float64)
+        self.sent_call   = np.full(max_beds, -1, dtype=np.int8)   # -1 = 아직 전송 안 함
+        self.sent_fall   = np.full(max_beds, -1, dtype=np.int8)
+
+        # 윈도우 (증분 통계) + stride 카운터
+        self.windows = [BedWindow(window_size, self.cols) for _ in range(max_beds)]
+        self.step = np.zeros(max_beds, dtype=np.int64)
+
+    def slot(self, bed_id: str):
+        """bed_id의 슬롯. 처음 보면 등록, 자리가 없으면 None"""
+        s = self.ids.get(bed_id)
+        if s is not None:
+            return s
+        if self.n >= self.max_beds:
+            self.rejected += 1
+            if self.rejected == 1:
+                print(f"[경고] 침대 수가 MAX_BEDS({self.max_beds})를 넘어 {bed_id!r} 무시")
+            return None
+        s = self.n
+        self.ids[bed_id] = s
+        self.bed_ids[s] = bed_id
+        self.n += 1
+        return s
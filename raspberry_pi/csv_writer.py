@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+백그라운드 CSV 기록기 (버퍼링 + 회전)
+
+MQTT 콜백 스레드는 write()로 큐에 행만 넣고 바로 돌아간다.
+기록 스레드가 큐를 모아서 한 번에 쓰고, 일정 간격으로만 fsync 한다.
+파일은 크기/날짜 기준으로 회전하고, 닫힌 파일은 gzip/zstd로 압축할 수 있다.
+(SD 카드에서 틱마다 exists + open/close 하던 것을 없애기 위함)
+"""
+
+import os, csv, gzip, queue, shutil, threading, time
+from datetime import datetime
+
+from sampler import Histogram, LATE_BOUNDS_MS
+
+_STOP = object()
+
+
+class RotatingCsvWriter:
+    def __init__(self, path: str, header: list,
+                 queue_size: int = 10000,
+                 batch_size: int = 500,
+                 fsync_interval: float = 5.0,
+                 max_bytes: int = 0,
+                 rotate_daily: bool = False,
+                 compress: str = ""):
+        """
+        path           : 현재 기록 중인 CSV 경로
+        header         : 새 파일을 열 때 쓰는 헤더
+        queue_size     : 큐 최대 길이 (가득 차면 행을 버리고 dropped 증가)
+        batch_size     : 한 번에 꺼내 쓰는 최대 행 수
+        fsync_interval : fsync 최소 간격(초). 0이면 배치마다 fsync
+        max_bytes      : 이 크기를 넘으면 회전 (0 = 크기 회전 안 함)
+        rotate_daily   : 날짜가 바뀌면 회전
+        compress       : 닫힌 파일 압축 방식 "" / "gzip" / "zstd"
+        """
+        self.path = path
+        self.header = list(header)
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.compress = compress
+
+        self.q = queue.Queue(maxsize=queue_size)
+        self.written = 0    # 기록한 행 수
+        self.dropped = 0    # 큐가 가득 차서 버린 행 수
+        self.batch_ms = Histogram(LATE_BOUNDS_MS)   # 배치 기록(+fsync) 시간
+
+        self._f = None
+        self._w = None
+        self._day = None
+        self._last_fsync = 0.0
+
+        self._t = threading.Thread(target=self._run, name="csv-writer", daemon=True)
+        self._t.start()
+
+    # ---------- 호출 스레드 쪽 (절대 블록하지 않음) ----------
+    def write(self, row) -> bool:
+        try:
+            self.q.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def qsize(self) -> int:
+        return self.q.qsize()
+
+    def close(self, timeout: float = 5.0):
+        """남은 행을 모두 쓰고 파일을 닫는다"""
+        try:
+            self.q.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._t.join(timeout)
+
+    # ---------- 기록 스레드 ----------
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                item = self.q.get(timeout=1.0)
+            except queue.Empty:
+                self._maybe_fsync()
+                continue
+
+            batch = []
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.q.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    print(f"[CSV] 기록 실패: {e}")
+                    self._close_file()
+
+        self._close_file()
+
+    def _write_batch(self, batch):
+        t0 = time.perf_counter()
+        self._maybe_rotate()
+        if self._f is None:
+            self._open()
+        self._w.writerows(batch)
+        self._f.flush()
+        self.written += len(batch)
+        self._maybe_fsync()
+        self.batch_ms.observe((time.perf_counter() - t0) * 1000.0)
+
+    def _maybe_fsync(self):
+        if self._f is None:
+            return
+        now = time.monotonic()
+        if now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._f.fileno())
+            self._last_fsync = now
+
+    def _open(self):
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        if not new_file and self.rotate_daily:
+            # 재시작했는데 기존 파일이 이전 날짜 것이면 먼저 회전
+            mday = datetime.fromtimestamp(os.path.getmtime(self.path)).date()
+            if mday != datetime.now().date():
+                self._rotate_closed_file(mday)
+                new_file = True
+
+        self._f = open(self.path, "a", newline="")
+        self._w = csv.writer(self._f)
+        self._day = datetime.now().date()
+        if new_file:
+            self._w.writerow(self.header)
+
+    def _close_file(self):
+        if self._f is None:
+            return
+        try:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._f.close()
+        except Exception:
+            pass
+        self._f = self._w = None
+
+    def _maybe_rotate(self):
+        if self._f is None:
+            return
+        due = False
+        if self.rotate_daily and datetime.now().date() != self._day:
+            due = True
+        if self.max_bytes and self._f.tell() >= self.max_bytes:
+            due = True
+        if due:
+            day = self._day
+            self._close_file()
+            self._rotate_closed_file(day)
+
+    def _rotate_closed_file(self, day):
+        base, ext = os.path.splitext(self.path)
+        stamp = datetime.now().strftime("%H%M%S")
+        dst = f"{base}_{day:%Y%m%d}-{stamp}{ext}"
+        n = 1
+        while any(os.path.exists(dst + s) for s in ("", ".gz", ".zst")):
+            dst = f"{base}_{day:%Y%m%d}-{stamp}_{n}{ext}"
+            n += 1
+        os.replace(self.path, dst)
+        print(f"[CSV] 파일 회전: {dst}")
+        if self.compress:
+            try:
+                self._compress(dst)
+            except Exception as e:
+                print(f"[CSV] 압축 실패({self.compress}): {e}")
+
+    def _compress(self, src):
+        if self.compress == "gzip":
+            dst = src + ".gz"
+            with open(src, "rb") as fi, gzip.open(dst, "wb") as fo:
+                shutil.copyfileobj(fi, fo)
+        elif self.compress == "zstd":
+            import zstandard   # 선택 의존성 (pip install zstandard)
+            dst = src + ".zst"
+            with open(src, "rb") as fi, open(dst, "wb") as fo:
+                zstandard.ZstdCompressor().copy_stream(fi, fo)
+        else:
+            raise ValueError(f"지원하지 않는 압축 방식: {self.compress}")
+        os.remove(src)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+fall_event 상태머신 (증분 방식, 침대 전체 동시 평가 가능)
+
+예측 히스토리 링(행 = 침대 슬롯)과 함께
+  - run2 : 끝에서부터 연속된 2의 개수
+  - cnt2 : 창(FALL_WINDOW_STEPS) 안의 2의 개수
+를 들고 있어서, 예측 1개마다 O(1)로 상태를 갱신한다.
+(기존: reversed(hist)로 연속 길이, sum(...)으로 개수를 매번 다시 셈)
+
+전이 규칙은 기존 _maybe_run_model_for_bed와 같다.
+  직전 2 → 이번 0 이고 cnt2 >= sum_steps  → 2 (위험)
+  run2 >= warn_steps                        → 1 (경고)
+  cnt2 == 0                                 → 0 (정상)
+  그 외                                     → 상태 유지
+
+기록된 예측 시퀀스로 기존 로직과 전이가 같은지 확인:
+    python fall_state.py [예측 로그 ...]      (없으면 무작위 시퀀스)
+"""
+
+from collections import deque
+
+import numpy as np
+
+
+class FallStateMachine:
+    def __init__(self, max_beds: int, window_steps: int, warn_steps: int, sum_steps: int):
+        self.window_steps = window_steps
+        self.warn_steps = warn_steps
+        self.sum_steps = sum_steps
+
+        self.ring     = np.zeros((max_beds, window_steps), dtype=np.int8)
+        self.pos      = np.zeros(max_beds, dtype=np.int64)   # 다음에 쓸 위치
+        self.length   = np.zeros(max_beds, dtype=np.int64)   # 채워진 개수
+        self.run2     = np.zeros(max_beds, dtype=np.int64)
+        self.cnt2     = np.zeros(max_beds, dtype=np.int64)
+        self.last_raw = np.zeros(max_beds, dtype=np.int8)    # 직전 원시 예측
+        self.state    = np.zeros(max_beds, dtype=np.int8)    # fall_event
+
+    def step(self, s: int, y: int) -> int:
+        """침대 s에 예측 y 하나 반영, 새 fall_event 반환"""
+        W = self.window_steps
+        prev = self.last_raw[s]
+
+        p = self.pos[s]
+        if self.length[s] == W:
+            if self.ring[s, p] == 2:
+                self.cnt2[s] -= 1
+        else:
+            self.length[s] += 1
+        self.ring[s, p] = y
+        self.pos[s] = (p + 1) % W
+        self.last_raw[s] = y
+
+        if y == 2:
+            self.cnt2[s] += 1
+            self.run2[s] = min(self.run2[s] + 1, W)
+        else:
+            self.run2[s] = 0
+
+        cnt2 = self.cnt2[s]
+        if prev == 2 and y == 0 and cnt2 >= self.sum_steps:
+            self.state[s] = 2
+        elif self.run2[s] >= self.warn_steps:
+            self.state[s] = 1
+        elif cnt2 == 0:
+            self.state[s] = 0
+        return int(self.state[s])
+
+    def step_all(self, slots, ys):
+        """
+        여러 침대를 한 번에 (slots는 중복 없는 슬롯 배열, ys는 각 예측).
+        반환: 새 fall_event 배열
+        """
+        sl = np.asarray(slots, dtype=np.int64)
+        ys = np.asarray(ys, dtype=np.int8)
+        W = self.window_steps
+
+        prev = self.last_raw[sl]
+        pos = self.pos[sl]
+        full = self.length[sl] == W
+        old = self.ring[sl, pos]
+
+        self.cnt2[sl] -= (full & (old == 2))
+        self.ring[sl, pos] = ys
+        self.pos[sl] = (pos + 1) % W
+        self.length[sl] = np.minimum(self.length[sl] + 1, W)
+        self.last_raw[sl] = ys
+
+        is2 = ys == 2
+        self.cnt2[sl] += is2
+        self.run2[sl] = np.where(is2, np.minimum(self.run2[sl] + 1, W), 0)
+
+        cnt2 = self.cnt2[sl]
+        new = self.state[sl]
+        new = np.where(cnt2 == 0, 0, new)
+        new = np.where(self.run2[sl] >= self.warn_steps, 1, new)
+        new = np.where((prev == 2) & (ys == 0) & (cnt2 >= self.sum_steps), 2, new)
+        self.state[sl] = new
+        return self.state[sl]
+
+    def history(self, s: int) -> list:
+        """오래된 것부터 순서대로"""
+        n = int(self.length[s])
+        if n < self.window_steps:
+            return self.ring[s, :n].tolist()
+        p = int(self.pos[s])
+        return self.ring[s, p:].tolist() + self.ring[s, :p].tolist()
+
+
+# ========= 재생 검증 (기존 로직 vs 증분 로직) =========
+class _ReferenceFall:
+    """기존 pi_publisher의 deque + reversed/sum 방식 그대로"""
+
+    def __init__(self, window_steps, warn_steps, sum_steps):
+        self.hist = deque(maxlen=window_steps)
+        self.last_raw = 0
+        self.state = 0
+        self.warn_steps = warn_steps
+        self.sum_steps = sum_steps
+
+    def step(self, y_hat):
+        hist = self.hist
+        prev_raw = self.last_raw
+        hist.append(y_hat)
+        self.last_raw = y_hat
+
+        run_2 = 0
+        for v in reversed(hist):
+            if v == 2:
+                run_2 += 1
+            else:
+                break
+        cnt_2 = sum(1 for v in hist if v == 2)
+
+        new_state = self.state
+        if prev_raw == 2 and y_hat == 0 and cnt_2 >= self.sum_steps:
+            new_state = 2
+        elif run_2 >= self.warn_steps:
+            new_state = 1
+        elif cnt_2 == 0:
+            new_state = 0
+        self.state = new_state
+        return new_state
+
+
+def load_predictions(path):
+    """예측 로그 읽기: 줄마다 0/1/2 숫자, 또는 pi_publisher 출력('모델왈=2 ...')"""
+    seq = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("모델왈="):
+                seq.append(int(line.split()[0].split("=", 1)[1]))
+            elif line in ("0", "1", "2"):
+                seq.append(int(line))
+    return seq
+
+
+def replay(seqs, window_steps, warn_steps, sum_steps):
+    """
+    seqs: 침대별 예측 시퀀스 리스트.
+    기존 로직 / step() / step_all() 세 가지를 나란히 돌려
+    (비교 스텝 수, 불일치 수, 전이 횟수 dict) 반환
+    """
+    n = len(seqs)
+    refs = [_ReferenceFall(window_steps, warn_steps, sum_steps) for _ in range(n)]
+    one = FallStateMachine(n, window_steps, warn_steps, sum_steps)
+    vec = FallStateMachine(n, window_steps, warn_steps, sum_steps)
+
+    checked = mismatched = 0
+    transitions = {}
+    prev_state = [0] * n
+    for t in range(max((len(q) for q in seqs), default=0)):
+        slots = [i for i in range(n) if t < len(seqs[i])]
+        ys = [seqs[i][t] for i in slots]
+        got_vec = vec.step_all(slots, ys).tolist()
+        for k, i in enumerate(slots):
+            want = refs[i].step(ys[k])
+            got_one = one.step(i, ys[k])
+            checked += 1
+            if not (want == got_one == got_vec[k]):
+                mismatched += 1
+            if want != prev_state[i]:
+                key = f"{prev_state[i]}->{want}"
+                transitions[key] = transitions.get(key, 0) + 1
+                prev_state[i] = want
+    return checked, mismatched, transitions
+
+
+if __name__ == "__main__":
+    import sys, random
+
+    # pi_publisher와 같은 계산 (0.4초 예측 간격)
+    PRED_INTERVAL_SEC = 0.2 * 2
+    WARN_STEPS   = int(1.0 / PRED_INTERVAL_SEC + 0.5)
+    WINDOW_STEPS = int(5.2 / PRED_INTERVAL_SEC + 0.5)
+    SUM_STEPS    = int(0.6 / PRED_INTERVAL_SEC + 0.5)
+
+    if len(sys.argv) > 1:
+        seqs = [load_predictions(p) for p in sys.argv[1:]]
+    else:
+        rnd = random.Random(0)
+        seqs = []
+        for _ in range(40):
+            # 2가 몰려 나오는 구간이 있도록 마르코프 비슷하게 생성
+            y, q = 0, []
+            for _ in range(5000):
+                if rnd.random() < 0.15:
+                    y = rnd.choice([0, 0, 1, 2, 2])
+                q.append(y)
+            seqs.append(q)
+
+    checked, mismatched, transitions = replay(seqs, WINDOW_STEPS, WARN_STEPS, SUM_STEPS)
+    print(f"침대 {len(seqs)}개, 스텝 {checked}개 비교, 불일치 {mismatched}개")
+    print(f"전이: {transitions}")
+    sys.exit(1 if mismatched else 0)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+낙상 모델 경량 추론 경로 (pandas 없이)
+
+scaler.pkl / feature_order.json / xgb_model.pkl을 시작할 때 한 번만 읽고,
+  - StandardScaler는 x * (1/scale) + (-mean/scale) 형태의 NumPy 연산으로 접어두고
+  - XGBoost는 Booster.inplace_predict (없으면 DMatrix)로 바로 호출한다.
+예측마다 DataFrame을 만들 필요가 없고, 게이트웨이 시작 시 pandas import도 빠진다.
+
+기존 경로(DataFrame + scaler.transform + predict_proba)와 지연시간 비교:
+    python inference.py bench [모델 폴더] [반복 횟수]
+"""
+
+import os, json, time
+import numpy as np
+import joblib
+
+# 작은 배치(침대 수십 개)에서는 스레드 분배 비용이 연산보다 크다
+INFER_NTHREAD = int(os.getenv("INFER_NTHREAD", "1"))
+
+
+class FallModel:
+    """스케일러를 접어 넣은 XGBoost 추론기. 입력/출력은 모두 NumPy."""
+
+    def __init__(self, xgb_path: str, scaler_path: str, feat_path: str):
+        with open(feat_path, "r") as f:
+            feature_order = json.load(f)
+
+        scaler = joblib.load(scaler_path)
+
+        # 스케일러가 학습 때 본 컬럼 순서가 있으면 그것을 기준으로 한다
+        # (feature_order.json이 모델과 어긋난 채 저장된 경우가 있음)
+        names = getattr(scaler, "feature_names_in_", None)
+        if names is not None and list(names) != list(feature_order):
+            print(f"[경고] feature_order.json({len(feature_order)}개)이 스케일러 컬럼({len(names)}개)과 달라 스케일러 순서를 사용")
+            feature_order = [str(n) for n in names]
+        self.feature_order = list(feature_order)
+
+        # (x - mean) / scale  →  x * inv + offset
+        n = len(self.feature_order)
+        mean  = scaler.mean_  if getattr(scaler, "with_mean", True) and scaler.mean_  is not None else np.zeros(n)
+        scale = scaler.scale_ if getattr(scaler, "with_std",  True) and scaler.scale_ is not None else np.ones(n)
+        inv = 1.0 / np.asarray(scale, dtype=np.float64)
+        self._inv    = inv.astype(np.float32)
+        self._offset = (-np.asarray(mean, dtype=np.float64) * inv).astype(np.float32)
+
+        model = joblib.load(xgb_path)
+        self._booster = model.get_booster() if hasattr(model, "get_booster") else model
+        try:
+            self._booster.set_param({"nthread": INFER_NTHREAD})
+        except Exception:
+            pass
+
+        # early stopping으로 학습된 모델이면 predict_proba와 같은 트리 범위만 사용
+        try:
+            best = int(model.best_iteration)
+            self._iter_range = (0, best + 1)
+        except Exception:
+            self._iter_range = (0, 0)
+
+        self.n_classes = int(getattr(model, "n_classes_", 0)) or None
+        self._has_inplace = hasattr(self._booster, "inplace_predict")
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_order)
+
+    def transform(self, X):
+        """X: (n, n_features) → 스케일된 float32 행렬 (X가 float32면 제자리 연산)"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        np.multiply(X, self._inv, out=X)
+        np.add(X, self._offset, out=X)
+        return X
+
+    def predict_proba(self, X):
+        """X: 스케일 전 원시 특징 (n, n_features) → 클래스 확률 (n, n_classes)"""
+        Xs = self.transform(X)
+        if self._has_inplace:
+            out = self._booster.inplace_predict(
+                Xs, iteration_range=self._iter_range, validate_features=False,
+            )
+        else:
+            import xgboost as xgb
+            out = self._booster.predict(xgb.DMatrix(Xs), iteration_range=self._iter_range)
+
+        out = np.asarray(out)
+        if out.ndim == 1:
+            # binary:logistic → [P(0), P(1)]
+            out = np.column_stack([1.0 - out, out])
+        return out
+
+
+def load_model(model_dir: str) -> FallModel:
+    return FallModel(
+        os.path.join(model_dir, "xgb_model.pkl"),
+        os.path.join(model_dir, "scaler.pkl"),
+        os.path.join(model_dir, "feature_order.json"),
+    )
+
+
+# ========= 마이크로벤치마크 (기존 경로 vs 경량 경로) =========
+def _bench(model_dir: str, n_iter: int):
+    import pandas as pd   # 비교용 기존 경로에서만 사용
+
+    fm = load_model(model_dir)
+    xgb_model = joblib.load(os.path.join(model_dir, "xgb_model.pkl"))
+    scaler    = joblib.load(os.path.join(model_dir, "scaler.pkl"))
+    cols = fm.feature_order
+
+    rng = np.random.default_rng(0)
+    x_raw = rng.uniform(0, 200, size=len(cols))
+
+    def old_path():
+        x_df = pd.DataFrame([x_raw], columns=cols)
+        return xgb_model.predict_proba(scaler.transform(x_df))[0]
+
+    def new_path():
+        return fm.predict_proba(x_raw.astype(np.float32))[0]
+
+    p_old, p_new = old_path(), new_path()
+    print(f"확률 최대 차이: {np.max(np.abs(p_old - p_new)):.2e}")
+
+    for name, fn in (("기존(DataFrame+transform+predict_proba)", old_path),
+                     ("경량(NumPy+inplace_predict)", new_path)):
+        for _ in range(50):
+            fn()
+        lat = np.empty(n_iter)
+        for i in range(n_iter):
+            t0 = time.perf_counter()
+            fn()
+            lat[i] = time.perf_counter() - t0
+        lat *= 1e6
+        print(f"{name:40s} p50={np.percentile(lat, 50):8.1f}us  p99={np.percentile(lat, 99):8.1f}us")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) >= 2 and sys.argv[1] == "bench":
+        here = os.path.dirname(os.path.abspath(__file__))
+        model_dir = sys.argv[2] if len(sys.argv) >= 3 else os.path.join(here, "models", "251127")
+        n_iter = int(sys.argv[3]) if len(sys.argv) >= 4 else 2000
+        _bench(model_dir, n_iter)
+    else:
+        print("사용법: python inference.py bench [모델 폴더] [반복 횟수]")
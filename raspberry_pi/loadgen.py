@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+ESP32 다침대 부하 생성기 (pi_publisher 한계 측정용)
+
+침대 N개 × 센서 4개가 esp/{bed}/{sensor}/data 로 정해진 속도로 발행하고,
+esp/{bed}/{sensor}/ack 를 받아서 왕복(ACK) 지연 / 유실 / 게이트웨이 CPU·RSS를 잰다.
+
+브로커
+  - 기본: 로컬 mosquitto (localhost:1883)
+  - --embedded-broker: mini_broker.py를 같은 프로세스에서 띄움 (mosquitto 없는 PC)
+    이 경우 pi_publisher는 LOCAL_PORT를 맞춰서 따로 실행한다.
+
+사용 예
+    python loadgen.py --embedded-broker --beds 40 --rate 5 --duration 60 --gateway-pid $(pgrep -f pi_publisher.py)
+"""
+
+import os, json, time, random, argparse, threading
+from collections import defaultdict, deque
+
+import numpy as np
+from paho.mqtt import client as mqtt
+
+from mini_broker import MiniBroker
+
+SENSORS = [f"ESP32-{i}" for i in range(1, 5)]
+
+
+def _new_client(client_id=""):
+    # paho 1.x / 2.x 모두 (게이트웨이 코드와 같은 1.x 콜백 형식 사용)
+    if hasattr(mqtt, "CallbackAPIVersion"):
+        return mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id=client_id)
+    return mqtt.Client(client_id=client_id)
+
+
+def make_payload(shape: str, bed: str, sensor: str, seq: int, call_rate: float, rnd: random.Random) -> bytes:
+    u = rnd.randint(10, 180)
+    call = 1 if rnd.random() < call_rate else 0
+    if shape == "legacy":
+        d = {"sensor_id": sensor, "ultrasonic": u}
+    elif shape == "full":
+        d = {"sensor_id": sensor, "bed_id": bed, "ultrasonic_cm": u,
+             "lidar": rnd.randint(10, 400), "call_button": call}
+    else:  # ultrasonic
+        d = {"ultrasonic_cm": u, "call_button": call}
+    d["seq"] = seq
+    return json.dumps(d).encode("utf-8")
+
+
+# ========= 게이트웨이 프로세스 CPU / RSS (/proc) =========
+class ProcSampler:
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.tick = os.sysconf("SC_CLK_TCK")
+        self.cpu_pct = []
+        self.rss_mb = []
+        self._last = None
+
+    def _cpu_sec(self):
+        with open(f"/proc/{self.pid}/stat") as f:
+            parts = f.read().rsplit(")", 1)[1].split()
+        return (int(parts[11]) + int(parts[12])) / self.tick   # utime + stime
+
+    def _rss_mb(self):
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+        return 0.0
+
+    def sample(self):
+        try:
+            now, cpu = time.monotonic(), self._cpu_sec()
+            if self._last:
+                dt = now - self._last[0]
+                if dt > 0:
+                    self.cpu_pct.append((cpu - self._last[1]) / dt * 100.0)
+            self._last = (now, cpu)
+            self.rss_mb.append(self._rss_mb())
+        except FileNotFoundError:
+            pass
+
+
+# ========= 부하 생성 =========
+class LoadGen:
+    def __init__(self, args):
+        self.args = args
+        self.beds = [f"{args.bed_prefix}{i:03d}" for i in range(args.beds)]
+        self.sensors = SENSORS[:args.sensors]
+        self.rnd = random.Random(args.seed)
+
+        self.sent = 0
+        self.acked = 0          # ACK로 확인된 데이터 메시지 수
+        self.ack_msgs = 0       # 받은 ACK 메시지 수 (coalesce면 acked보다 적음)
+        self.unmatched = 0
+        self.latency_ms = []
+        self._pending = defaultdict(deque)   # ack 토픽 → 보낸 시각들 (FIFO 매칭)
+        self._lock = threading.Lock()
+        self.gateway_online = threading.Event()
+
+        self.client = _new_client(f"loadgen-{os.getpid()}")
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+        self.client.max_inflight_messages_set(1000)
+        self.client.max_queued_messages_set(0)
+
+    def _on_connect(self, client, userdata, flags, rc):
+        client.subscribe("esp/+/+/ack", qos=1)
+        client.subscribe(f"gateway/{self.args.room}/status", qos=1)
+
+    def _on_message(self, client, userdata, msg):
+        now = time.perf_counter()
+        if msg.topic.startswith("gateway/"):
+            if msg.payload == b"online":
+                self.gateway_online.set()
+            return
+        # 게이트웨이가 ACK를 묶어 보내면(ACK_MODE=coalesce) "n"개를 한 번에 확인
+        n = 1
+        try:
+            n = int(json.loads(msg.payload).get("n", 1))
+        except Exception:
+            pass
+        with self._lock:
+            self.ack_msgs += 1
+            q = self._pending.get(msg.topic)
+            if not q:
+                self.unmatched += 1
+                return
+            for _ in range(min(n, len(q))):
+                t0 = q.popleft()
+                self.acked += 1
+                self.latency_ms.append((now - t0) * 1000.0)
+
+    def run(self):
+        a = self.args
+        self.client.connect(a.host, a.port, keepalive=60)
+        self.client.loop_start()
+
+        if a.wait_gateway:
+            print(f"게이트웨이 online 대기 (gateway/{a.room}/status)...")
+            if not self.gateway_online.wait(a.wait_gateway):
+                print("게이트웨이 응답 없음 – 그대로 진행")
+
+        proc = ProcSampler(a.gateway_pid) if a.gateway_pid else None
+        period = 1.0 / a.rate
+        topics = [(b, s, f"esp/{b}/{s}/data", f"esp/{b}/{s}/ack") for b in self.beds for s in self.sensors]
+        seq = 0
+
+        print(f"발행 시작: 침대 {len(self.beds)} × 센서 {len(self.sensors)} × {a.rate}Hz"
+              f" = {len(topics) * a.rate:.0f} msg/s, {a.duration}초, payload={a.payload}")
+        start = time.perf_counter()
+        next_t = start
+        next_proc = start
+        while time.perf_counter() - start < a.duration:
+            next_t += period
+            seq += 1
+            for bed, sensor, data_topic, ack_topic in topics:
+                payload = make_payload(a.payload, bed, sensor, seq, a.call_rate, self.rnd)
+                with self._lock:
+                    self._pending[ack_topic].append(time.perf_counter())
+                self.client.publish(data_topic, payload, qos=a.qos)
+                self.sent += 1
+            now = time.perf_counter()
+            if proc and now >= next_proc:
+                proc.sample()
+                next_proc = now + 1.0
+            time.sleep(max(0.0, next_t - time.perf_counter()))
+        elapsed = time.perf_counter() - start
+
+        # 남은 ACK 대기
+        deadline = time.perf_counter() + a.drain
+        while time.perf_counter() < deadline and self.acked < self.sent:
+            time.sleep(0.05)
+        self.client.loop_stop()
+        self.client.disconnect()
+        return elapsed, proc
+
+
+def main():
+    ap = argparse.ArgumentParser(description="ESP32 다침대 부하 생성기")
+    ap.add_argument("--host", default="localhost")
+    ap.add_argument("--port", type=int, default=1883)
+    ap.add_argument("--embedded-broker", action="store_true", help="mini_broker를 이 프로세스에서 실행")
+    ap.add_argument("--beds", type=int, default=10)
+    ap.add_argument("--sensors", type=int, default=4, choices=range(1, 5))
+    ap.add_argument("--rate", type=float, default=5.0, help="센서당 초당 발행 수")
+    ap.add_argument("--duration", type=float, default=30.0)
+    ap.add_argument("--payload", default="ultrasonic", choices=["ultrasonic", "full", "legacy"])
+    ap.add_argument("--call-rate", type=float, default=0.0, help="call_button=1 확률")
+    ap.add_argument("--qos", type=int, default=1, choices=[0, 1])
+    ap.add_argument("--room", default="301A")
+    ap.add_argument("--bed-prefix", default="B")
+    ap.add_argument("--wait-gateway", type=float, default=0.0, help="게이트웨이 online 대기 초 (0 = 안 기다림)")
+    ap.add_argument("--gateway-pid", type=int, default=0, help="CPU/RSS를 잴 pi_publisher PID")
+    ap.add_argument("--drain", type=float, default=3.0, help="종료 후 ACK 대기 초")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    broker = None
+    if args.embedded_broker:
+        broker = MiniBroker("127.0.0.1", args.port).start()
+        args.host = "127.0.0.1"
+        print(f"내장 브로커 실행: 127.0.0.1:{args.port}")
+
+    g = LoadGen(args)
+    elapsed, proc = g.run()
+
+    lost = g.sent - g.acked
+    print("=" * 60)
+    print(f"발행 {g.sent}개 ({g.sent / elapsed:,.0f} msg/s), ACK 메시지 {g.ack_msgs}개가 {g.acked}개 확인, "
+          f"유실 {lost}개 ({lost / max(1, g.sent) * 100:.2f}%), 매칭 안 된 ACK {g.unmatched}개")
+    if g.latency_ms:
+        lat = np.asarray(g.latency_ms)
+        print(f"ACK 지연: p50={np.percentile(lat, 50):.1f}ms p90={np.percentile(lat, 90):.1f}ms "
+              f"p99={np.percentile(lat, 99):.1f}ms max={lat.max():.1f}ms")
+    if proc and proc.rss_mb:
+        cpu = np.asarray(proc.cpu_pct) if proc.cpu_pct else np.zeros(1)
+        print(f"게이트웨이 PID {proc.pid}: CPU 평균 {cpu.mean():.1f}% 최대 {cpu.max():.1f}%, "
+              f"RSS 최대 {max(proc.rss_mb):.1f}MB")
+    if broker:
+        st = broker.stats.snapshot()
+        print(f"브로커: pub_in={st['pub_in']} pub_out={st['pub_out']} "
+              f"puback_out={st['puback_out']} 토픽별={st['by_topic_suffix']}")
+        broker.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+게이트웨이 지표 (카운터 / 게이지 / 로그 버킷 히스토그램)
+
+핫패스에서는 정수 더하기나 Histogram.observe() 한 번만 하고(락 없음),
+문자열 조립은 읽을 때만 한다.
+  - Counter.inc()      : 단조 증가 값 (메시지 수, 실패 수)
+  - Gauge.set() / fn   : 현재 값 (큐 깊이 등, fn을 주면 읽을 때 호출)
+  - sampler.Histogram  : 지연(ms) 분포. 이미 있는 히스토그램(tick_clock.late_ms 등)도 그대로 등록
+
+읽는 쪽
+  - serve(port)   : 127.0.0.1:<port>/metrics (Prometheus 텍스트 형식)
+  - snapshot()    : dict (주기적으로 MQTT 지표 토픽에 JSON으로 발행)
+
+한 지표를 여러 스레드가 올리면 드물게 1씩 빠질 수 있다 (GIL 아래 += 는 원자적이지 않음).
+정확한 회계용이 아니라 추세 확인용이라서 락 비용을 들이지 않는다.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sampler import Histogram, LATE_BOUNDS_MS
+
+# 지연(ms) 기본 버킷 – 0.1ms ~ 1s 로그 간격 (sampler와 같음)
+LATENCY_BOUNDS_MS = LATE_BOUNDS_MS
+
+
+class Counter:
+    __slots__ = ("value", "fn")
+
+    def __init__(self, fn=None):
+        self.value = 0
+        self.fn = fn          # 다른 객체가 이미 세는 값이면 읽을 때 가져옴 (Stage.dropped 등)
+
+    def inc(self, n: int = 1):
+        self.value += n
+
+    def get(self) -> int:
+        return self.fn() if self.fn is not None else self.value
+
+
+class Gauge:
+    __slots__ = ("value", "fn")
+
+    def __init__(self, fn=None):
+        self.value = 0.0
+        self.fn = fn          # 읽을 때 값을 계산하는 함수 (없으면 set() 값)
+
+    def set(self, v: float):
+        self.value = v
+
+    def get(self) -> float:
+        return self.fn() if self.fn is not None else self.value
+
+
+class Registry:
+    def __init__(self, prefix: str = "gw", labels: dict = None):
+        """
+        prefix : 지표 이름 앞에 붙임 (gw_messages_received_total)
+        labels : 모든 지표에 붙는 고정 라벨 (요양원/방 ID)
+        """
+        self.prefix = prefix
+        self.labels = dict(labels or {})
+        self._metrics = {}    # 이름 → (종류, 도움말, 객체) (등록 순서 유지)
+        self._lock = threading.Lock()
+
+    def _add(self, kind: str, name: str, help: str, obj):
+        with self._lock:
+            full = f"{self.prefix}_{name}" if self.prefix else name
+            self._metrics[full] = (kind, help, obj)
+        return obj
+
+    def counter(self, name: str, help: str = "", fn=None) -> Counter:
+        return self._add("counter", name, help, Counter(fn))
+
+    def gauge(self, name: str, help: str = "", fn=None) -> Gauge:
+        return self._add("gauge", name, help, Gauge(fn))
+
+    def histogram(self, name: str, help: str = "", bounds=LATENCY_BOUNDS_MS, hist: Histogram = None) -> Histogram:
+        """hist를 주면 이미 있는 Histogram을 그대로 등록"""
+        return self._add("histogram", name, help, hist if hist is not None else Histogram(bounds))
+
+    # ---------- 읽기 ----------
+    def _label_str(self, extra: str = "") -> str:
+        parts = [f'{k}="{v}"' for k, v in self.labels.items()]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> str:
+        """Prometheus 텍스트 형식 (version 0.0.4)"""
+        with self._lock:
+            items = list(self._metrics.items())
+        lab = self._label_str()
+        out = []
+        for name, (kind, help, m) in items:
+            if help:
+                out.append(f"# HELP {name} {help}")
+            out.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                out.append(f"{name}{lab} {m.get()}")
+            elif kind == "gauge":
+                out.append(f"{name}{lab} {_num(m.get())}")
+            else:
+                counts = list(m.counts)     # 읽는 동안 바뀌어도 버킷끼리는 맞게 한 번 복사
+                acc = 0
+                for b, c in zip(m.bounds, counts):
+                    acc += c
+                    le = self._label_str('le="%g"' % b)
+                    out.append(f"{name}_bucket{le} {acc}")
+                acc += counts[-1]
+                le = self._label_str('le="+Inf"')
+                out.append(f"{name}_bucket{le} {acc}")
+                out.append(f"{name}_sum{lab} {_num(m.sum)}")
+                out.append(f"{name}_count{lab} {acc}")
+        return "\n".join(out) + "\n"
+
+    def snapshot(self) -> dict:
+        """MQTT 발행용 요약 (히스토그램은 개수/평균/p50/p99/최대)"""
+        with self._lock:
+            items = list(self._metrics.items())
+        snap = dict(self.labels)
+        for name, (kind, _, m) in items:
+            if kind == "counter":
+                snap[name] = m.get()
+            elif kind == "gauge":
+                snap[name] = _num(m.get())
+            else:
+                snap[name] = {"n": m.count, "mean": round(m.mean(), 3), "p50": m.percentile(50),
+                              "p99": m.percentile(99), "max": round(m.max, 3)}
+        return snap
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        """GET /metrics 를 답하는 HTTP 서버를 데몬 스레드로 띄움"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass      # 스크레이프마다 로그 남기지 않음
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+def _num(v):
+    v = float(v)
+    return int(v) if v.is_integer() else round(v, 6)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+테스트용 최소 MQTT 3.1.1 브로커 (mosquitto가 없는 PC에서 부하 테스트용)
+
+지원: CONNECT / PUBLISH(QoS 0,1) / PUBACK / SUBSCRIBE / UNSUBSCRIBE /
+      PINGREQ / DISCONNECT, retain, LWT(will), 와일드카드 + #,
+      공유 구독 $share/<그룹>/<필터> (그룹 안에서 메시지마다 돌아가며 1명에게)
+미지원: QoS 2, 세션 유지(clean_session=0), 재전송, 인증
+운영용이 아니라 loadgen.py / pi_publisher를 한 PC에서 돌려보기 위한 대역이다.
+
+단독 실행:
+    python mini_broker.py [--port 1883]
+"""
+
+import asyncio, struct, threading, time
+
+
+def topic_matches(filt: str, topic: str) -> bool:
+    fp = filt.split("/")
+    tp = topic.split("/")
+    for i, f in enumerate(fp):
+        if f == "#":
+            return True
+        if i >= len(tp):
+            return False
+        if f != "+" and f != tp[i]:
+            return False
+    return len(fp) == len(tp)
+
+
+def _enc_len(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n % 128
+        n //= 128
+        if n:
+            b |= 0x80
+        out.append(b)
+        if not n:
+            return bytes(out)
+
+
+def _enc_str(s) -> bytes:
+    b = s.encode("utf-8") if isinstance(s, str) else s
+    return struct.pack("!H", len(b)) + b
+
+
+class BrokerStats:
+    """브로커 메시지 카운터 (초당 속도 계산용)"""
+
+    def __init__(self):
+        self.pub_in = 0        # 클라이언트 → 브로커 PUBLISH
+        self.pub_out = 0       # 브로커 → 구독자 PUBLISH
+        self.puback_in = 0
+        self.puback_out = 0
+        self.bytes_in = 0
+        self.by_topic_suffix = {}   # 마지막 토픽 단계별 PUBLISH 수 (data/ack/...)
+
+    def snapshot(self) -> dict:
+        return {
+            "pub_in": self.pub_in, "pub_out": self.pub_out,
+            "puback_in": self.puback_in, "puback_out": self.puback_out,
+            "bytes_in": self.bytes_in, "by_topic_suffix": dict(self.by_topic_suffix),
+        }
+
+
+class _Session:
+    def __init__(self, broker, reader, writer):
+        self.broker = broker
+        self.reader = reader
+        self.writer = writer
+        self.client_id = ""
+        self.subs = {}          # filter → qos
+        self.will = None        # (topic, payload, qos, retain)
+        self.next_pid = 1
+
+    def send(self, data: bytes):
+        self.writer.write(data)
+
+    def deliver(self, topic: str, payload: bytes, qos: int, retain: bool = False):
+        flags = (qos << 1) | (1 if retain else 0)
+        body = _enc_str(topic)
+        if qos:
+            pid = self.next_pid
+            self.next_pid = pid % 65535 + 1
+            body += struct.pack("!H", pid)
+        body += payload
+        self.send(bytes([0x30 | flags]) + _enc_len(len(body)) + body)
+        self.broker.stats.pub_out += 1
+
+    async def _read_packet(self):
+        h = await self.reader.readexactly(1)
+        mult, n = 1, 0
+        while True:
+            b = (await self.reader.readexactly(1))[0]
+            n += (b & 0x7F) * mult
+            if not b & 0x80:
+                break
+            mult *= 128
+        body = await self.reader.readexactly(n) if n else b""
+        self.broker.stats.bytes_in += 2 + n
+        return h[0], body
+
+    async def run(self):
+        clean = False
+        try:
+            while True:
+                h, body = await self._read_packet()
+                ptype = h >> 4
+                if ptype == 1:
+                    self._on_connect(body)
+                elif ptype == 3:
+                    self._on_publish(h, body)
+                elif ptype == 4:
+                    self.broker.stats.puback_in += 1
+                elif ptype == 8:
+                    self._on_subscribe(body)
+                elif ptype == 10:
+                    self._on_unsubscribe(body)
+                elif ptype == 12:
+                    self.send(b"\xd0\x00")
+                elif ptype == 14:
+                    clean = True
+                    break
+                await self.writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.broker.sessions.discard(self)
+            if not clean and self.will:
+                self.broker.route(*self.will)
+            try:
+                self.writer.close()
+            except Exception:
+                pass
+
+    def _on_connect(self, body):
+        i = 2 + struct.unpack("!H", body[:2])[0]   # 프로토콜 이름
+        i += 1                                      # 레벨
+        flags = body[i]; i += 1
+        i += 2                                      # keepalive
+        n = struct.unpack("!H", body[i:i + 2])[0]; i += 2
+        self.client_id = body[i:i + n].decode("utf-8", "replace"); i += n
+        if flags & 0x04:
+            n = struct.unpack("!H", body[i:i + 2])[0]; i += 2
+            wt = body[i:i + n].decode("utf-8"); i += n
+            n = struct.unpack("!H", body[i:i + 2])[0]; i += 2
+            wp = body[i:i + n]; i += n
+            self.will = (wt, wp, (flags >> 3) & 0x03, bool(flags & 0x20))
+        self.send(b"\x20\x02\x00\x00")
+
+    def _on_publish(self, h, body):
+        qos = (h >> 1) & 0x03
+        retain = bool(h & 0x01)
+        n = struct.unpack("!H", body[:2])[0]
+        topic = body[2:2 + n].decode("utf-8")
+        i = 2 + n
+        if qos:
+            pid = body[i:i + 2]
+            i += 2
+            self.send(b"\x40\x02" + pid)
+            self.broker.stats.puback_out += 1
+        st = self.broker.stats
+        st.pub_in += 1
+        suffix = topic.rsplit("/", 1)[-1]
+        st.by_topic_suffix[suffix] = st.by_topic_suffix.get(suffix, 0) + 1
+        self.broker.route(topic, body[i:], qos, retain)
+
+    def _on_subscribe(self, body):
+        pid = body[:2]
+        i = 2
+        granted = bytearray()
+        new = []
+        while i < len(body):
+            n = struct.unpack("!H", body[i:i + 2])[0]; i += 2
+            filt = body[i:i + n].decode("utf-8"); i += n
+            q = min(body[i], 1); i += 1
+            self.subs[filt] = q
+            granted.append(q)
+            new.append((filt, q))
+        self.send(b"\x90" + _enc_len(2 + len(granted)) + pid + bytes(granted))
+        for filt, q in new:
+            if filt.startswith("$share/"):
+                continue           # 공유 구독은 retain 메시지를 받지 않음
+            for topic, (payload, rq) in list(self.broker.retained.items()):
+                if topic_matches(filt, topic):
+                    self.deliver(topic, payload, min(q, rq), retain=True)
+
+    def _on_unsubscribe(self, body):
+        pid = body[:2]
+        i = 2
+        while i < len(body):
+            n = struct.unpack("!H", body[i:i + 2])[0]; i += 2
+            self.subs.pop(body[i:i + n].decode("utf-8"), None); i += n
+        self.send(b"\xb0\x02" + pid)
+
+
+class MiniBroker:
+    def __init__(self, host: str = "127.0.0.1", port: int = 1883):
+        self.host = host
+        self.port = port
+        self.sessions = set()
+        self.retained = {}     # topic → (payload, qos)
+        self.stats = BrokerStats()
+        self._rr = {}          # 공유 구독 그룹 → 다음 순번
+        self._loop = None
+        self._server = None
+        self._ready = threading.Event()
+
+    def route(self, topic: str, payload: bytes, qos: int, retain: bool):
+        if retain:
+            if payload:
+                self.retained[topic] = (payload, qos)
+            else:
+                self.retained.pop(topic, None)
+        shared = {}            # 그룹 → [(세션, qos), ...]
+        for s in list(self.sessions):
+            best = -1
+            for filt, q in s.subs.items():
+                if filt.startswith("$share/"):
+                    _, group, real = filt.split("/", 2)
+                    if topic_matches(real, topic):
+                        shared.setdefault(group, []).append((s, q))
+                elif q > best and topic_matches(filt, topic):
+                    best = q
+            if best >= 0:
+                s.deliver(topic, payload, min(qos, best))
+        for group, members in shared.items():
+            i = self._rr.get(group, 0)
+            self._rr[group] = i + 1
+            s, q = members[i % len(members)]
+            s.deliver(topic, payload, min(qos, q))
+
+    async def _handle(self, reader, writer):
+        s = _Session(self, reader, writer)
+        self.sessions.add(s)
+        await s.run()
+
+    async def _serve(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self._ready.set()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start(self):
+        """백그라운드 스레드에서 실행"""
+        def _run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self._serve())
+            except asyncio.CancelledError:
+                pass
+        threading.Thread(target=_run, name="mini-broker", daemon=True).start()
+        if not self._ready.wait(5.0):
+            raise RuntimeError("mini broker 시작 실패")
+        return self
+
+    def stop(self):
+        if self._loop and self._server:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="테스트용 최소 MQTT 브로커")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=1883)
+    ap.add_argument("--stats", type=float, default=5.0, help="통계 출력 주기(초)")
+    args = ap.parse_args()
+
+    b = MiniBroker(args.host, args.port).start()
+    print(f"mini broker: {args.host}:{args.port}")
+    prev = b.stats.snapshot()
+    try:
+        while True:
+            time.sleep(args.stats)
+            cur = b.stats.snapshot()
+            rate_in = (cur["pub_in"] - prev["pub_in"]) / args.stats
+            rate_out = (cur["pub_out"] - prev["pub_out"]) / args.stats
+            print(f"clients={len(b.sessions)} pub_in={rate_in:.0f}/s pub_out={rate_out:.0f}/s "
+                  f"puback_out={(cur['puback_out'] - prev['puback_out']) / args.stats:.0f}/s")
+            prev = cur
+    except KeyboardInterrupt:
+        b.stop()
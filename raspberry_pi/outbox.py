@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+서버 발행 저장 후 전달(store-and-forward) 큐
+
+_maybe_publish가 QoS 0으로 보내고 실패하면 버리던 것을
+SQLite(WAL) 추가 전용 저널에 먼저 적고, 전송 스레드가 순서대로 QoS 1로 보낸다.
+  - append() : 호출 스레드가 자기 연결로 저널에 INSERT 하고 커밋한 뒤 돌아옴
+               (WAL + synchronous=NORMAL 이라 fsync 없이 수십 µs, 네트워크 대기 없음)
+               True를 돌려준 메시지는 이미 저널에 있으므로 바로 죽어도 재시작 후 전송된다.
+  - 전송 스레드 : 따로 연결을 열고 연결돼 있으면 id 순서대로 발행
+                 (동시에 PUBACK 기다리는 개수 max_inflight, 초당 rate개 제한)
+  - PUBACK(on_publish) 받은 행만 저널에서 지움
+WAN이 끊겨도 저널에 쌓였다가 재연결 후 순서대로 다시 나가고,
+프로세스가 죽었다 살아나도 저널에 남은 행부터 보낸다.
+
+끊긴 동안 이미 paho에 넘긴(in-flight) 메시지는 paho가 재연결 시 다시 보내므로
+여기서는 저널 커서만 이어서 진행한다. (재시작 직후에는 같은 행이 한 번 더 갈 수 있음 – QoS 1 특성)
+저널이 max_rows를 넘으면 전송 스레드가 in-flight가 아닌 가장 오래된 행부터 지우고 dropped를 올린다.
+"""
+
+import os, sqlite3, threading, time
+from collections import deque
+
+from paho.mqtt import client as mqtt
+
+
+class Outbox:
+    def __init__(self, path: str,
+                 max_rows: int = 100000,
+                 max_inflight: int = 20,
+                 rate: float = 50.0):
+        """
+        path         : 저널 SQLite 파일 경로
+        max_rows     : 저널 최대 행 수 (넘으면 오래된 것부터 버림)
+        max_inflight : PUBACK을 기다리는 최대 메시지 수
+        rate         : 초당 최대 발행 수 (재연결 후 밀린 것 재전송 속도 제한)
+        """
+        self.path = path
+        self.max_rows = max_rows
+        self.max_inflight = max_inflight
+        self.rate = rate
+
+        self.appended = 0   # 저널에 넣은 수
+        self.published = 0  # paho로 넘긴 수
+        self.acked = 0      # PUBACK 받아 저널에서 지운 수
+        self.dropped = 0    # 저널에 못 넣었거나 가득 차서 버린 수
+        self.pending = 0    # 저널에 남은 행 수
+
+        # 호출 스레드용 연결 (전송 스레드는 _run에서 따로 엶), pending 갱신도 같은 락
+        self._lock = threading.Lock()
+        self._db = self._open(check_same_thread=False)
+        self.pending = self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+        if self.pending:
+            print(f"[outbox] 이전 실행에서 못 보낸 메시지 {self.pending}개 재전송 예정")
+
+        self._acks = deque()           # paho 스레드 → 전송 스레드 (mid)
+        self._wake = threading.Event()
+        self._inflight = {}            # mid → 저널 id
+        self._cursor = 0               # 마지막으로 발행한 저널 id
+        self._client = None
+        self._running = False
+        self._t = None
+
+    # ---------- 호출 스레드 쪽 (저널 커밋까지만, 네트워크는 안 기다림) ----------
+    def append(self, topic: str, payload, qos: int = 1):
+        """저널에 커밋되면 True, 디스크 오류/잠금 시간 초과면 False (버림)"""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        with self._lock:
+            try:
+                self._db.execute("INSERT INTO outbox (ts, topic, payload, qos) VALUES (?, ?, ?, ?)",
+                                 (time.time(), topic, payload, qos))
+            except sqlite3.Error as e:
+                self.dropped += 1
+                print(f"[경고] outbox 저널 기록 실패: {e}")
+                return False
+            self.appended += 1
+            self.pending += 1
+        self._wake.set()
+        return True
+
+    def start(self, client):
+        """client: paho Client (publish / is_connected / on_publish 사용)"""
+        self._client = client
+        client.on_publish = self._on_publish
+        if hasattr(client, "max_inflight_messages_set"):
+            client.max_inflight_messages_set(self.max_inflight)
+        self._running = True
+        self._t = threading.Thread(target=self._run, name="outbox", daemon=True)
+        self._t.start()
+        return self
+
+    def close(self, timeout: float = 5.0):
+        """전송 스레드 종료 (못 보낸 것은 저널에 남아 다음 실행 때 전송)"""
+        self._running = False
+        self._wake.set()
+        if self._t:
+            self._t.join(timeout)
+        with self._lock:
+            self._db.close()
+
+    def summary(self) -> str:
+        return (f"outbox pending={self.pending} inflight={len(self._inflight)} "
+                f"sent={self.published} acked={self.acked} drop={self.dropped}")
+
+    def _on_publish(self, client, userdata, mid):
+        self._acks.append(mid)
+        self._wake.set()
+
+    # ---------- 전송 스레드 ----------
+    def _open(self, check_same_thread: bool = True):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # 두 연결이 번갈아 쓰므로 잠금은 짧게만 기다림 (넘기면 append 실패로 처리)
+        db = sqlite3.connect(self.path, isolation_level=None, timeout=1.0,
+                             check_same_thread=check_same_thread)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS outbox ("
+                   "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                   "ts REAL NOT NULL, topic TEXT NOT NULL, payload BLOB NOT NULL, qos INTEGER NOT NULL)")
+        return db
+
+    def _trim(self, db):
+        """max_rows를 넘은 만큼 가장 오래된 행부터 버림 (PUBACK 대기 중인 행은 남김)"""
+        over = self.pending - self.max_rows
+        if over <= 0:
+            return
+        busy = list(self._inflight.values())
+        n = db.execute("DELETE FROM outbox WHERE id IN (SELECT id FROM outbox "
+                       f"WHERE id NOT IN ({','.join('?' * len(busy))}) ORDER BY id LIMIT ?)",
+                       (*busy, over)).rowcount
+        if n > 0:
+            with self._lock:
+                self.pending -= n
+                self.dropped += n
+            print(f"[경고] outbox 저널 가득 참 – 오래된 메시지 {n}개 버림")
+
+    def _delete(self, db, ids):
+        if ids:
+            n = db.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids]).rowcount
+            self.acked += len(ids)
+            with self._lock:
+                self.pending = max(0, self.pending - max(n, 0))
+
+    def _delete_acked(self, db):
+        ids = []
+        while self._acks:
+            jid = self._inflight.pop(self._acks.popleft(), None)
+            if jid is not None:
+                ids.append(jid)
+        self._delete(db, ids)
+
+    def _send(self, db, budget: int):
+        room = min(self.max_inflight - len(self._inflight), budget)
+        if room <= 0:
+            return 0
+        rows = db.execute("SELECT id, topic, payload, qos FROM outbox WHERE id > ? ORDER BY id LIMIT ?",
+                          (self._cursor, room)).fetchall()
+        sent, done = 0, []
+        for jid, topic, payload, qos in rows:
+            res = self._client.publish(topic, payload, qos=qos, retain=False)
+            # NO_CONN: 방금 끊겼지만 QoS 1은 paho가 들고 있다가 재연결 때 보냄
+            if res.rc != mqtt.MQTT_ERR_SUCCESS and not (qos and res.rc == mqtt.MQTT_ERR_NO_CONN):
+                break
+            self._cursor = jid
+            sent += 1
+            self.published += 1
+            if qos:
+                self._inflight[res.mid] = jid
+            else:
+                done.append(jid)
+        self._delete(db, done)
+        # publish() 도중 도착한 PUBACK도 여기서 정리 (mid 등록 후 처리하므로 놓치지 않음)
+        self._delete_acked(db)
+        return sent
+
+    def _run(self):
+        db = self._open()
+        tokens = float(self.max_inflight)
+        last = time.monotonic()
+        while True:
+            self._wake.wait(0.2)
+            self._wake.clear()
+
+            self._delete_acked(db)
+            self._trim(db)
+            if not self._running:
+                break
+
+            now = time.monotonic()
+            tokens = min(float(self.max_inflight), tokens + (now - last) * self.rate)
+            last = now
+            if self.pending > len(self._inflight) and self._client.is_connected():
+                tokens -= self._send(db, int(tokens))
+        db.close()
@@ -1,10 +1,18 @@
-import os, json, ssl, time, signal, sys, csv, joblib
+import os, json, ssl, time, signal, sys, threading
 from datetime import datetime
-from collections import defaultdict, deque
 import numpy as np
-import pandas as pd
 from paho.mqtt import client as mqtt
 
+from inference import FallModel
+from csv_writer import RotatingCsvWriter
+from pipeline import Stage
+from sampler import TickClock
+from bed_store import BedStateStore
+from fall_state import FallStateMachine
+from outbox import Outbox
+from metrics import Registry
+import wire_format
+
 # ========= 기본 설정 =========
 NURSINGHOME_ID = "NH-001"
 ROOM_ID        = "301A"
@@ -14,10 +22,12 @@ MQTT_PORT   = 8883
 
 # 서버로 올리는 주제
 TOPIC               = f"pi/{NURSINGHOME_ID}/{ROOM_ID}/data"   # 예: pi/NH-001/301A/data
+TOPIC_BIN           = f"pi/{NURSINGHOME_ID}/{ROOM_ID}/bin"    # 바이너리 프레임 (wire_format.py)
 # ESP → 라즈베리파이 수신 주제
 LOCAL_TOPIC_SUB     = "esp/+/+/data"                          # esp/{bed_id}/{sensor_id}/data
 # 게이트웨이 상태 주제
 GATEWAY_STATUS_TOPIC = f"gateway/{ROOM_ID}/status"            # 예: gateway/301A/status
+GATEWAY_METRICS_TOPIC = f"gateway/{ROOM_ID}/metrics"          # 지표 JSON (서버로, QoS 0)
 
 LOCAL_BROKER        = "localhost"
 LOCAL_PORT          = 1883
@@ -27,48 +37,51 @@ CERT_FILE = "/home/cap/venvs/IoT/code/certs/client.crt"
 KEY_FILE  = "/home/cap/venvs/IoT/code/certs/client.key"
 
 # 실시간 머신러닝 추론
-MODEL_DIR    = "/home/cap/venvs/IoT/code/models"
+MODEL_DIR    = os.getenv("MODEL_DIR", "/home/cap/venvs/IoT/code/models")
 XGB_PATH     = os.path.join(MODEL_DIR, "xgb_model.pkl")
 SCALER_PATH  = os.path.join(MODEL_DIR, "scaler.pkl")
 FEAT_PATH    = os.path.join(MODEL_DIR, "feature_order.json")
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# bed_id별로 최근 8개 시계열을 쌓을 버퍼
-# blocks[bed_id] = deque(maxlen=8)  # 각 원소는 {"timestamp": ..., "ESP32-1": ..., ...}
-blocks = defaultdict(lambda: deque(maxlen=8))
-
 # label_out 폴더 생성 (없으면 자동 생성)
-LABEL_DIR = os.path.join(SCRIPT_DIR, "label_out")
+LABEL_DIR = os.getenv("LABEL_DIR", os.path.join(SCRIPT_DIR, "label_out"))
 os.makedirs(LABEL_DIR, exist_ok=True)
 
 # label_out 폴더 안에 저장할 CSV 경로
 CSV_PATH = os.path.join(LABEL_DIR, "unlabeled_NH-001_301A.csv")
 
-xgb_model = joblib.load(XGB_PATH)
-scaler    = joblib.load(SCALER_PATH)
+# CSV 백그라운드 기록 설정 (SD 카드 쓰기 횟수 줄이기)
+CSV_QUEUE_SIZE   = int(os.getenv("CSV_QUEUE_SIZE", "10000"))
+CSV_FSYNC_SEC    = float(os.getenv("CSV_FSYNC_SEC", "5.0"))
+CSV_ROTATE_MB    = float(os.getenv("CSV_ROTATE_MB", "0"))      # 0 = 크기 회전 안 함
+CSV_ROTATE_DAILY = os.getenv("CSV_ROTATE_DAILY", "1") == "1"
+CSV_COMPRESS     = os.getenv("CSV_COMPRESS", "")               # "" / "gzip" / "zstd"
 
-with open(FEAT_PATH, "r") as f:
-    FEATURE_ORDER = json.load(f)
+# 스케일러를 접어 넣은 경량 추론기 (pandas 없이 NumPy + inplace_predict)
+fall_model = FallModel(XGB_PATH, SCALER_PATH, FEAT_PATH)
+FEATURE_ORDER = fall_model.feature_order
 
 ULTRA_COLS   = ["ESP32-1", "ESP32-2", "ESP32-3", "ESP32-4"]
 CSV_COLUMNS  = ["timestamp", "bed_id"] + ULTRA_COLS
-STATS      = ["mean", "std", "min", "max", "median"]
 
-# bed_id별 최신 센서 상태 (CSV/스냅샷용)
-bed_ultra_state = defaultdict(lambda: {cid: None for cid in ULTRA_COLS})
+csv_writer = RotatingCsvWriter(
+    CSV_PATH, CSV_COLUMNS,
+    queue_size=CSV_QUEUE_SIZE,
+    fsync_interval=CSV_FSYNC_SEC,
+    max_bytes=int(CSV_ROTATE_MB * 1024 * 1024),
+    rotate_daily=CSV_ROTATE_DAILY,
+    compress=CSV_COMPRESS,
+)
 
-ultra_state = {cid: None for cid in ULTRA_COLS}
+ULTRA_IDX    = {cid: i for i, cid in enumerate(ULTRA_COLS)}
 
-# 초음파 플러시 주기(초) – 0.2초마다 한 번씩 저장 시도
+# 초음파 샘플링 주기(초) – 0.2초 격자마다 스냅샷 저장
 ULTRA_FLUSH_INTERVAL = 0.2
-last_ultra_flush = 0.0  # 마지막으로 CSV 기록 시도한 시각
 
-# bed_id별 시계열 버퍼 (윈도우 용)
+# 침대별 윈도우 (bed_store의 증분 윈도우 사용)
 WINDOW_SIZE   = 8   # 1.6초
 WINDOW_STRIDE = 2   # 0.4초
-bed_series    = defaultdict(lambda: deque(maxlen=WINDOW_SIZE))
-bed_step      = defaultdict(int)  # stride 제어용 카운터
 
 # --- fall_event 상태 계산용 설정 ---
 PRED_INTERVAL_SEC = ULTRA_FLUSH_INTERVAL * WINDOW_STRIDE  # 0.4s 기준
@@ -81,18 +94,91 @@ FALL_WARN_STEPS   = int(FALL_WARN_SEC   / PRED_INTERVAL_SEC + 0.5)  # ≈ 5
 FALL_WINDOW_STEPS = int(FALL_WINDOW_SEC / PRED_INTERVAL_SEC + 0.5)  # ≈ 13
 FALL_SUM_STEPS    = int(FALL_SUM_SEC    / PRED_INTERVAL_SEC + 0.5)  # ≈ 5
 
-# bed별 원시 예측 히스토리와 직전 예측
-fall_pred_hist = defaultdict(lambda: deque(maxlen=FALL_WINDOW_STEPS))
-last_raw_pred  = defaultdict(int)
 # ------------------------------------
 
-# 초당 5번(0.2s) 스냅샷 저장을 위한 타이머
-ULTRA_FLUSH_INTERVAL = 0.2
-last_ultra_flush = 0.0
+# 침대 상태 저장소: bed_id → 정수 슬롯, 센서값/윈도우/예측 히스토리/발행 상태를
+# 미리 잡아둔 배열에 보관 (침대당 메모리 고정)
+MAX_BEDS = int(os.getenv("MAX_BEDS", "64"))
+fall_sm = FallStateMachine(MAX_BEDS, FALL_WINDOW_STEPS, FALL_WARN_STEPS, FALL_SUM_STEPS)
+store = BedStateStore(ULTRA_COLS, WINDOW_SIZE, fall_sm, MAX_BEDS)
 
 
 # 집계 발행 최소 간격(초)
 SERVER_PUB_INTERVAL = float(os.getenv("SERVER_PUB_INTERVAL", "1.0"))
+# 발행 간격을 재는 시계 (replay.py는 재생 속도와 무관하게 데이터 시간으로 바꿔 끼움)
+pub_clock = time.time
+
+# 서버 발행 저장 후 전달 저널 (WAN이 끊겨도 낙상 알림을 잃지 않도록 디스크에 먼저 적음)
+OUTBOX_PATH     = os.getenv("OUTBOX_PATH", os.path.join(SCRIPT_DIR, "outbox.db"))
+OUTBOX_MAX_ROWS = int(os.getenv("OUTBOX_MAX_ROWS", "100000"))
+OUTBOX_INFLIGHT = int(os.getenv("OUTBOX_INFLIGHT", "20"))     # PUBACK 대기 최대 개수
+OUTBOX_RATE     = float(os.getenv("OUTBOX_RATE", "50"))       # 재연결 후 재전송 초당 최대
+# 서버 발행 형식: "json" = 침대마다 JSON 1개 (TOPIC)
+#                 "bin"  = 틱마다 바뀐 침대를 모아 바이너리 프레임 1개 (TOPIC_BIN)
+WIRE_FORMAT = os.getenv("WIRE_FORMAT", "json")
+_pub_batch = {}   # bin 모드: 이번 틱에 보낼 슬롯 → (call_button, fall_event, 시각) – 틱 스레드 전용
+
+outbox = Outbox(OUTBOX_PATH, max_rows=OUTBOX_MAX_ROWS, max_inflight=OUTBOX_INFLIGHT, rate=OUTBOX_RATE)
+
+# 예측마다 터미널 출력 (재생/부하 측정 시에는 0)
+PRINT_PREDICTIONS = os.getenv("PRINT_PREDICTIONS", "1") == "1"
+
+# ESP로 보내는 ACK 방식
+#   each     : 메시지마다 QoS 1 ACK (기존 동작)
+#   qos0     : 메시지마다 QoS 0 ACK (PUBACK 왕복 없음)
+#   coalesce : ACK_COALESCE_SEC마다 토픽별로 1개만 (seq 최고값 + 묶은 개수)
+# ESP는 ACK를 게이트웨이 생존 신호로 쓰므로(GATEWAY_TIMEOUT 3초) 묶는 주기는 그보다 짧게
+ACK_MODE         = os.getenv("ACK_MODE", "each")
+ACK_COALESCE_SEC = float(os.getenv("ACK_COALESCE_SEC", "1.0"))
+
+# ========= 처리 파이프라인 =========
+# MQTT 스레드(파싱/ACK) → ingest 큐 → 틱 스레드(상태 반영, 0.2초 샘플링)
+#   → infer 큐(침대 슬롯으로 워커 고정) → 워커(윈도우/특징/추론/fall_event)
+INFER_WORKERS    = int(os.getenv("INFER_WORKERS", "1"))
+INGEST_QUEUE_MAX = int(os.getenv("INGEST_QUEUE_MAX", "5000"))
+INFER_QUEUE_MAX  = int(os.getenv("INFER_QUEUE_MAX", "50"))     # 틱 단위 배치 개수
+PIPE_STATS_SEC   = float(os.getenv("PIPE_STATS_SEC", "60"))    # 큐 상태 출력 주기 (0 = 끔)
+
+# 지표 (metrics.py): 127.0.0.1:METRICS_PORT/metrics (Prometheus) + 서버 지표 토픽
+METRICS_PORT     = int(os.getenv("METRICS_PORT", "9108"))      # 0 = HTTP 끔
+METRICS_MQTT_SEC = float(os.getenv("METRICS_MQTT_SEC", "60"))  # 0 = MQTT 발행 끔
+
+# 틱 지연/간격/윈도우 길이 히스토그램
+tick_clock = TickClock(ULTRA_FLUSH_INTERVAL, WINDOW_SIZE)
+
+ingest_stage = Stage("ingest", INGEST_QUEUE_MAX)
+infer_stages = [Stage(f"infer-{i}", INFER_QUEUE_MAX) for i in range(INFER_WORKERS)]
+running = True
+
+# ========= 지표 =========
+# 핫패스에서는 inc()/observe()만, 다른 객체가 이미 세는 값은 읽을 때 가져옴(fn)
+metrics = Registry("gw", {"nursinghome_id": NURSINGHOME_ID, "room_id": ROOM_ID})
+m_received    = metrics.counter("messages_received_total", "ESP에서 받은 메시지")
+m_bad         = metrics.counter("messages_bad_total", "JSON/토픽 오류로 버린 메시지")
+metrics.counter("ingest_dropped_total", "ingest 큐가 가득 차서 버린 메시지", fn=lambda: ingest_stage.dropped)
+metrics.gauge("ingest_queue_depth", "ingest 큐 깊이", fn=lambda: ingest_stage.depth())
+m_applied     = metrics.counter("samples_applied_total", "틱 스레드가 반영한 샘플")
+metrics.histogram("tick_lag_ms", "틱이 예정 시각보다 늦은 시간", hist=tick_clock.late_ms)
+metrics.counter("ticks_missed_total", "밀려서 건너뛴 틱", fn=lambda: tick_clock.missed)
+m_flush_ms    = metrics.histogram("flush_ms", "_flush_ultrasonic 처리 시간")
+m_flush_beds  = metrics.counter("flush_beds_total", "스냅샷을 뜬 침대 수 (틱 합계)")
+metrics.histogram("csv_batch_ms", "CSV 배치 기록 시간", hist=csv_writer.batch_ms)
+metrics.counter("csv_rows_written_total", "CSV에 쓴 행", fn=lambda: csv_writer.written)
+metrics.counter("csv_dropped_total", "CSV 큐가 가득 차서 버린 행", fn=lambda: csv_writer.dropped)
+m_windows     = metrics.counter("model_windows_total", "추론 대상이 된 윈도우")
+m_feat_fail   = metrics.counter("model_feature_fail_total", "특징 추출 실패(음수/NaN)로 건너뛴 윈도우")
+m_infer_ms    = metrics.histogram("infer_ms", "배치 추론(스케일링+predict_proba+상태머신) 시간")
+m_infer_beds  = metrics.counter("infer_beds_total", "추론한 침대 수")
+m_infer_err   = metrics.counter("infer_errors_total", "추론 실패 배치")
+metrics.counter("infer_dropped_total", "추론 큐가 가득 차서 버린 틱 배치",
+                fn=lambda: sum(st.dropped for st in infer_stages))
+m_pub         = metrics.counter("publish_total", "서버 전송 큐(outbox)에 넣은 침대 상태 (bin 모드는 프레임 안 레코드 수)")
+m_pub_fail    = metrics.counter("publish_fail_total", "outbox 저널에 못 넣은 침대 상태")
+metrics.gauge("outbox_pending", "저널에 남은(PUBACK 전) 행", fn=lambda: outbox.pending)
+metrics.counter("outbox_acked_total", "PUBACK 받은 행", fn=lambda: outbox.acked)
+metrics.counter("outbox_dropped_total", "저널이 가득 차서 버린 행", fn=lambda: outbox.dropped)
+metrics.gauge("server_connected", "서버 MQTT 연결 여부 (1/0)", fn=lambda: int(server_client.is_connected()))
+metrics.counter("ack_published_total", "ESP로 보낸 ACK", fn=lambda: ack_published)
 
 def _as_int(v, default=None):
     try:
@@ -108,224 +194,162 @@ def get_timestamp():
 
 # ========= 서버 퍼블리셔 =========
 server_client = mqtt.Client(protocol=mqtt.MQTTv311)
-if MQTT_PORT == 8883:
-    server_client.tls_set(
-        ca_certs=CA_FILE,
-        certfile=CERT_FILE,
-        keyfile=KEY_FILE,
-        cert_reqs=ssl.CERT_REQUIRED,
-        tls_version=ssl.PROTOCOL_TLS_CLIENT,
-    )
-server_client.connect(SERVER_HOST, MQTT_PORT, keepalive=60)
-server_client.loop_start()
-print(f"[{get_timestamp()}] 서버 연결 완료: {SERVER_HOST}:{MQTT_PORT}")
 
 
-# ========= 로컬 수집 + 집계 상태 =========
-# bed_id별로 버튼/낙상, 마지막 전송 정보만 관리 (ultrasonic은 서버로 안 보냄)
-beds = defaultdict(lambda: {
-    "call_button": 0,
-    "fall_event": 0,
-    "last_pub": 0.0,
-    "last_sent_sig": None,   # 직전 전송 시그니처(중복 방지)
-})
+def _connect_server():
+    # 인증서는 실제로 연결할 때만 읽음 (재생/부하 도구는 서버 연결 없이 import)
+    if MQTT_PORT == 8883:
+        server_client.tls_set(
+            ca_certs=CA_FILE,
+            certfile=CERT_FILE,
+            keyfile=KEY_FILE,
+            cert_reqs=ssl.CERT_REQUIRED,
+            tls_version=ssl.PROTOCOL_TLS_CLIENT,
+        )
+    server_client.reconnect_delay_set(min_delay=1, max_delay=30)
+    server_client.connect(SERVER_HOST, MQTT_PORT, keepalive=60)
+    server_client.loop_start()
+    outbox.start(server_client)
+    print(f"[{get_timestamp()}] 서버 연결 완료: {SERVER_HOST}:{MQTT_PORT}")
 
 
-def _build_payload(bed_id: str, bstate: dict):
+# ========= 로컬 수집 + 집계 상태 =========
+# 침대별 버튼/낙상, 마지막 전송 정보는 store 배열에서 관리 (ultrasonic은 서버로 안 보냄)
+
+def _build_payload(s: int):
     payload = {
-        "bed_id": bed_id,
-        "call_button": int(bstate["call_button"] or 0),
-        "fall_event": int(bstate["fall_event"] or 0),
+        "bed_id": store.bed_ids[s],
+        "call_button": int(store.call_button[s]),
+        "fall_event": int(store.fall_event[s]),
     }
     return payload
 
-def _flush_ultrasonic_if_due():
-    global last_ultra_flush
-
-    now = time.time()
-    if now - last_ultra_flush < ULTRA_FLUSH_INTERVAL:
+def _flush_ultrasonic():
+    """틱마다 센서 최신값 스냅샷 → CSV + 추론 워커 (틱 스레드에서만 호출)"""
+    n = store.n
+    if n == 0:
         return
-    last_ultra_flush = now
 
+    t0 = time.perf_counter()
     ts = get_timestamp()
-    
-    # print(f"[DEBUG] _flush_ultrasonic_if_due 실행: {ts}")  # 디버그 추가
-
-    for bed_id, state in bed_ultra_state.items():
-        vals = [state[cid] for cid in ULTRA_COLS]
-        non_empty = sum(v is not None for v in vals)
-        
-        # print(f"[DEBUG] bed_id={bed_id}, non_empty={non_empty}, vals={vals}")  # 디버그 추가
-        
-        if non_empty < 3:
-            # print(f"[DEBUG] bed_id={bed_id} 스킵: 센서 데이터 부족 ({non_empty}/4)")  # 디버그 추가
-            continue
 
-        # CSV 기록
-        row = [ts, bed_id] + [v if v is not None else "" for v in vals]
-
-        file_exists = os.path.exists(CSV_PATH)
-        with open(CSV_PATH, "a", newline="") as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                writer.writerow(CSV_COLUMNS)
-            writer.writerow(row)
-        
-        # print(f"[DEBUG] CSV 저장 완료: bed_id={bed_id}")  # 디버그 추가
-
-        # 윈도우용 버퍼에 추가
-        bed_series[bed_id].append({
-            "timestamp": ts,
-            "ESP32-1": vals[0],
-            "ESP32-2": vals[1],
-            "ESP32-3": vals[2],
-            "ESP32-4": vals[3],
-        })
-        bed_step[bed_id] += 1
-        
-        # print(f"[DEBUG] bed_series 길이={len(bed_series[bed_id])}, bed_step={bed_step[bed_id]}")  # 디버그 추가
-
-        # 여기서 바로 모델 실행
-        _maybe_run_model_for_bed(bed_id)
-
-def extract_features_from_window(window_rows):
-    """
-    window_rows: 길이 8 리스트, 각 원소는 {"timestamp":..., "ESP32-1":..., ...}
-    반환: FEATURE_ORDER 길이만큼의 1D numpy 배열. 품질 나쁘면 None.
-    """
-    feats = {}
-
-    for col in ULTRA_COLS:
-        arr = np.array([row[col] for row in window_rows], dtype=float)
-
-        # 실시간에서는 라벨 기반 보간 못 하므로,
-        # 음수/NaN 있으면 이 윈도우는 버리는 방식이 가장 단순하다.
-        if np.any((arr < 0) | np.isnan(arr)):
-            return None
-
-        # 1) 기본 통계
-        feats[f"{col}_mean"]   = float(arr.mean())
-        feats[f"{col}_std"]    = float(arr.std())
-        feats[f"{col}_min"]    = float(arr.min())
-        feats[f"{col}_max"]    = float(arr.max())
-        feats[f"{col}_median"] = float(np.median(arr))
-
-        # 2) 윈도우 안 요동 크기
-        feats[f"{col}_range"]           = float(arr.max() - arr.min())
-        feats[f"{col}_first_last_diff"] = float(arr[-1] - arr[0])
-
-        # 3) 윈도우 안 속도/변화량
-        if len(arr) >= 2:
-            diffs = np.abs(np.diff(arr))        # |x_t - x_{t-1}|
-            feats[f"{col}_mean_diff"] = float(diffs.mean())
-            feats[f"{col}_max_diff"]  = float(diffs.max())
-        else:
-            feats[f"{col}_mean_diff"] = 0.0
-            feats[f"{col}_max_diff"]  = 0.0
-
-    # FEATURE_ORDER 순서에 맞춰 벡터 구성
-    x_vec = np.array([feats[k] for k in FEATURE_ORDER], dtype=float)
-    return x_vec
-
-def _maybe_run_model_for_bed(bed_id: str):
-    buf = bed_series[bed_id]
-    # print(f"[DEBUG] _maybe_run_model_for_bed 호출: bed_id={bed_id}, buf_len={len(buf)}")  # 디버그 추가
-    
-    if len(buf) < WINDOW_SIZE:
-        # print(f"[DEBUG] 윈도우 크기 부족: {len(buf)} < {WINDOW_SIZE}")  # 디버그 추가
+    # 센서 3개 이상 값이 있는 침대만 (전체 침대를 한 번에 판정)
+    vals_all = store.ultra[:n]
+    non_empty = np.count_nonzero(~np.isnan(vals_all), axis=1)
+    slots = np.flatnonzero(non_empty >= 3)
+    if slots.size == 0:
         return
+    snap = vals_all[slots]   # 복사본 (워커로 넘김)
 
-    # stride=2 → 샘플 두 개마다 한 번만 예측
-    step = bed_step[bed_id]
-    if step % WINDOW_STRIDE != 0:
-        # print(f"[DEBUG] stride 조건 불만족: step={step}, stride={WINDOW_STRIDE}, {step % WINDOW_STRIDE}")  # 디버그 추가
-        return
+    shards = [[] for _ in infer_stages]
 
-    # print(f"[DEBUG] 모델 추론 시작!")  # 디버그 추가
-    
-    window_rows = list(buf)  # 최근 8개
-    x_raw = extract_features_from_window(window_rows)
-    if x_raw is None:
-        # print(f"[DEBUG] 특징 추출 실패 (음수/NaN 포함)")  # 디버그 추가
-        return
+    for s, vals in zip(slots.tolist(), snap.tolist()):
+        # CSV 기록 (큐에만 넣고 실제 쓰기는 기록 스레드가 함)
+        row = [ts, store.bed_ids[s]] + [v if v == v else "" for v in vals]
+        csv_writer.write(row)
 
-    # FEATURE_ORDER 순서에 맞게 컬럼 이름 붙여서 DataFrame 생성
-    x_df = pd.DataFrame([x_raw], columns=FEATURE_ORDER)
+        # 침대별 담당 워커로 샘플 전달 (같은 침대는 항상 같은 워커 → 순서 유지)
+        shards[s % INFER_WORKERS].append((s, vals))
 
-    # 스케일링
-    x_scaled = scaler.transform(x_df)
+    for stage, samples in zip(infer_stages, shards):
+        if samples:
+            stage.put(samples)
 
-    # 예측 (라벨 0/1/2)
-    proba = xgb_model.predict_proba(x_scaled)[0]
-    y_hat = int(np.argmax(proba))
-    conf  = float(proba[y_hat])
+    m_flush_beds.inc(slots.size)
+    m_flush_ms.observe((time.perf_counter() - t0) * 1000.0)
 
-    ts = get_timestamp()
+def _infer_worker(stage: Stage):
+    """틱마다 받은 [(슬롯, vals), ...]로 윈도우 갱신 → 배치 추론"""
+    while running:
+        samples = stage.get(timeout=1.0)
+        if samples is None:
+            continue
 
-    # fall_event 상태머신 업데이트
-    hist = fall_pred_hist[bed_id]
-    prev_raw = last_raw_pred[bed_id]
+        due = []  # 이번 틱에 추론할 (슬롯, 특징벡터)
+        for s, vals in samples:
+            # 윈도우용 버퍼에 추가 (누적 통계 갱신)
+            store.windows[s].push(vals)
+            store.step[s] += 1
 
-    hist.append(y_hat)
-    last_raw_pred[bed_id] = y_hat
+            # 예측할 차례면 이번 틱 배치에 추가
+            _maybe_run_model_for_bed(s, due)
 
-    # hist 안에서 연속된 2(run length) 계산
-    run_2 = 0
-    for v in reversed(hist):
-        if v == 2:
-            run_2 += 1
-        else:
-            break
+        # 이번 틱에 모인 침대들을 한 번에 추론
+        try:
+            _run_model_batch(due)
+        except Exception as e:
+            m_infer_err.inc()
+            print(f"\n[{get_timestamp()}] [{stage.name}] 추론 실패: {e}")
+
+def _maybe_run_model_for_bed(s: int, due: list):
+    """윈도우가 준비되고 stride 차례면 (슬롯, 특징벡터)를 due에 추가"""
+    buf = store.windows[s]
+    if len(buf) < WINDOW_SIZE:
+        return
+
+    # stride=2 → 샘플 두 개마다 한 번만 예측
+    step = int(store.step[s])
+    if step % WINDOW_STRIDE != 0:
+        return
 
-    # 5초 창 안에서 2의 개수
-    cnt_2 = sum(1 for v in hist if v == 2)
+    x_raw = buf.features(FEATURE_ORDER)  # 최근 8개
+    if x_raw is None:
+        m_feat_fail.inc()
+        return
 
-    bstate = beds[bed_id]
-    cur_state = int(bstate.get("fall_event", 0))
+    m_windows.inc()
+    due.append((s, x_raw))
 
-    new_state = cur_state
+def _run_model_batch(due: list):
+    """
+    due: [(슬롯, 특징벡터), ...]
+    침대 수와 상관없이 스케일링 1번 + predict_proba 1번으로 처리한다.
+    (호출당 오버헤드가 모델 연산보다 훨씬 크기 때문)
+    """
+    if not due:
+        return
 
-    if prev_raw == 2 and y_hat == 0 and cnt_2 >= FALL_SUM_STEPS:
-        new_state = 2
-    elif run_2 >= FALL_WARN_STEPS:
-        new_state = 1
-    elif cnt_2 == 0:
-        new_state = 0
+    t0 = time.perf_counter()
 
-    bstate["fall_event"] = new_state
+    # 연속된 float32 행렬 (행 = 침대)
+    X = np.empty((len(due), len(FEATURE_ORDER)), dtype=np.float32)
+    for i, (_, x_raw) in enumerate(due):
+        X[i] = x_raw
 
-    # 터미널에 원시 예측 + 최종 상태 같이 출력
-    proba_rounded = np.round(proba, 3)
-    print(f"모델왈={y_hat} 상태={new_state} conf={conf:.3f} proba={proba_rounded} hist={list(hist)}")
+    # 스케일링 + 예측 (라벨 0/1/2)
+    proba_all = fall_model.predict_proba(X)
 
-def _sig_of(bed_id: str, bstate: dict):
-    return (
-        bed_id,
-        int(bstate["call_button"] or 0),
-        int(bstate["fall_event"] or 0),
-    )
+    # fall_event 상태머신: 이번 배치 침대 전체를 한 번에 갱신
+    slots = [s for s, _ in due]
+    y_hat = np.argmax(proba_all, axis=1)
+    new_states = fall_sm.step_all(slots, y_hat)
+    m_infer_ms.observe((time.perf_counter() - t0) * 1000.0)
+    m_infer_beds.inc(len(due))
 
+    # 터미널에 원시 예측 + 최종 상태 같이 출력
+    if not PRINT_PREDICTIONS:
+        return
+    for s, y, st, proba in zip(slots, y_hat.tolist(), new_states.tolist(), proba_all):
+        proba_rounded = np.round(proba, 3)
+        print(f"모델왈={y} 상태={st} conf={float(proba[y]):.3f} proba={proba_rounded} hist={fall_sm.history(s)}")
 
-def _maybe_publish(bed_id: str, prev_call: int | None = None):
-    bstate = beds[bed_id]
-    now = time.time()
+def _maybe_publish(s: int, prev_call: int | None = None):
+    now = pub_clock()
 
     # 최소 전송 간격
-    if now - bstate["last_pub"] < SERVER_PUB_INTERVAL:
+    if now - store.last_pub[s] < SERVER_PUB_INTERVAL:
         return
 
-    cur_call = int(bstate["call_button"] or 0)
-    cur_fall = int(bstate["fall_event"] or 0)
+    cur_call = int(store.call_button[s])
+    cur_fall = int(store.fall_event[s])
 
-    last_sig = bstate["last_sent_sig"]
+    last_fall = int(store.sent_fall[s])
     send = False
 
-    if last_sig is None:
+    if last_fall < 0:
         # 프로그램 시작 후 첫 전송
         send = True
     else:
-        _, last_call, last_fall = last_sig
-
         # 1) fall_event 값이 바뀌면 전송
         if cur_fall != last_fall:
             send = True
@@ -337,24 +361,122 @@ def _maybe_publish(bed_id: str, prev_call: int | None = None):
     if not send:
         return
 
+    if WIRE_FORMAT == "bin":
+        # 틱 끝에 _flush_publish_batch()가 프레임으로 묶어서 보냄
+        # 전송 기록은 그 프레임이 저널에 들어간 뒤에 남김 (한 틱에 침대당 한 번, 먼저 들어온 상태)
+        if s not in _pub_batch:
+            _pub_batch[s] = (cur_call, cur_fall, now)
+        return
+
     payload = {
-        "bed_id": bed_id,
+        "bed_id": store.bed_ids[s],
         "call_button": cur_call,   # 현재 상태 그대로 실어 보냄
         "fall_event": cur_fall,
     }
 
-    res = server_client.publish(TOPIC, json.dumps(payload), qos=0, retain=False)
-    if res.rc == mqtt.MQTT_ERR_SUCCESS:
-        bstate["last_pub"] = now
-        bstate["last_sent_sig"] = (bed_id, cur_call, cur_fall)
+    # 저널에 넣기만 함 (전송/재전송은 outbox 스레드가 QoS 1로)
+    if outbox.append(TOPIC, json.dumps(payload), qos=1):
+        m_pub.inc()
+        store.last_pub[s] = now
+        store.sent_call[s] = cur_call
+        store.sent_fall[s] = cur_fall
     else:
-        print(f"\n[{get_timestamp()}] 서버 전송 실패 rc={res.rc}")
+        m_pub_fail.inc()
+        print(f"\n[{get_timestamp()}] 서버 전송 저널 기록 실패 – 재시도 예정")
+
+
+def _publish_fall_changes():
+    """
+    추론 워커가 바꾼 fall_event 중 아직 안 보낸 침대를 발행 (틱 스레드, 틱마다)
+    다음 샘플을 기다리지 않으므로 센서가 조용해져도 낙상 전이가 늦거나 빠지지 않는다.
+    최소 간격/저널 기록 실패로 못 보낸 침대도 다음 틱에 다시 본다.
+    """
+    n = store.n
+    if n == 0:
+        return
+    for s in np.flatnonzero(store.fall_event[:n] != store.sent_fall[:n]).tolist():
+        _maybe_publish(s)
+
+
+def _flush_publish_batch():
+    """bin 모드: 이번 틱에 모인 침대 상태를 프레임으로 묶어 저널에 넣음 (틱 스레드)"""
+    if not _pub_batch:
+        return
+    items = list(_pub_batch.items())
+    _pub_batch.clear()
+    for i in range(0, len(items), wire_format.MAX_RECORDS):
+        chunk = items[i:i + wire_format.MAX_RECORDS]
+        frame, = wire_format.encode_frames([(store.bed_ids[s], c, f) for s, (c, f, _) in chunk])
+        if not outbox.append(TOPIC_BIN, frame, qos=1):
+            # 전송 기록을 안 남겼으므로 fall_event 변화는 다음 틱에 다시 보냄
+            m_pub_fail.inc(len(chunk))
+            print(f"\n[{get_timestamp()}] 서버 전송 저널 기록 실패 – 침대 {len(chunk)}개 재시도 예정")
+            continue
+        m_pub.inc(len(chunk))
+        for s, (c, f, t) in chunk:
+            store.last_pub[s] = t
+            store.sent_call[s] = c
+            store.sent_fall[s] = f
 
 
 # ========= 로컬 브로커(ESP → PI) 콜백 =========
 ignore_retained = True
 local_client = None
 
+# ACK 페이로드는 토픽/상태별로 한 번만 만들어 둠 (json.dumps 반복 안 함)
+_ack_cache = {}      # (bed_id, sensor_id, status) → (ack 토픽, bytes)
+# coalesce 모드: ack 토픽 → [status, seq 최고값, 묶인 개수]
+_ack_pending = {}
+_ack_lock = threading.Lock()
+ack_published = 0    # 실제로 발행한 ACK 수
+ack_covered = 0      # ACK로 확인해 준 데이터 메시지 수
+
+
+def _ack_for(bed_id: str, sensor_id: str, status: str):
+    key = (bed_id, sensor_id, status)
+    hit = _ack_cache.get(key)
+    if hit is None:
+        hit = (f"esp/{bed_id}/{sensor_id}/ack", json.dumps({"status": status}).encode("utf-8"))
+        _ack_cache[key] = hit
+    return hit
+
+
+def _send_ack(client, bed_id: str, sensor_id: str, status: str, seq):
+    global ack_published, ack_covered
+
+    if ACK_MODE == "coalesce":
+        topic = _ack_for(bed_id, sensor_id, status)[0]
+        with _ack_lock:
+            p = _ack_pending.get(topic)
+            if p is None:
+                _ack_pending[topic] = [status, seq, 1]
+            else:
+                p[0] = status
+                if seq is not None and (p[1] is None or seq > p[1]):
+                    p[1] = seq
+                p[2] += 1
+        return
+
+    topic, payload = _ack_for(bed_id, sensor_id, status)
+    client.publish(topic, payload, qos=0 if ACK_MODE == "qos0" else 1, retain=False)
+    ack_published += 1
+    ack_covered += 1
+
+
+def _flush_coalesced_acks(client):
+    """묶어둔 ACK를 토픽별로 1개씩 발행 (틱 스레드)"""
+    global _ack_pending, ack_published, ack_covered
+
+    with _ack_lock:
+        pending, _ack_pending = _ack_pending, {}
+    for topic, (status, seq, n) in pending.items():
+        body = {"status": status, "n": n}
+        if seq is not None:
+            body["seq"] = seq
+        client.publish(topic, json.dumps(body, separators=(",", ":")), qos=1, retain=False)
+        ack_published += 1
+        ack_covered += n
+
 
 def on_local_connect(client, userdata, flags, rc):
     print(f"[{get_timestamp()}] 로컬 브로커 연결 성공 (rc={rc})")
@@ -372,14 +494,17 @@ def on_local_message(client, userdata, msg):
         return
     ignore_retained = False
 
+    m_received.inc()
     try:
         data = json.loads(msg.payload.decode("utf-8"))
     except Exception as e:
+        m_bad.inc()
         print(f"\n[오류] JSON 파싱 실패: {e}")
         return
 
     parts = msg.topic.split("/")
     if len(parts) < 4:
+        m_bad.inc()
         print(f"\n[오류] 토픽 형식 오류: {msg.topic}")
         return
 
@@ -389,44 +514,116 @@ def on_local_message(client, userdata, msg):
     # 여기서는 ultrasonic은 모델용/CSV용으로만 사용
     u_val = data.get("ultrasonic_cm", data.get("ultrasonic"))
 
-    # print(f"[DEBUG] 메시지 수신: bed_id={bed_id}, sensor={sensor_id_from_topic}, ultrasonic={u_val}")  # 디버그 추가
-
     call_raw = _as_int(data.get("call_button"), 0) or 0
     call_button = 1 if call_raw else 0
 
-    bstate = beds[bed_id]
-    prev_call = int(bstate["call_button"] or 0)
-    bstate["call_button"] = call_button
+    # ACK 발행 (paho 송신 큐에 넣기만 함, 방식은 ACK_MODE)
+    status = "received" if u_val is not None else "skipped"
+    _send_ack(client, bed_id, sensor_id_from_topic, status, _as_int(data.get("seq")))
+
+    # 나머지 처리는 틱 스레드로 넘김 (가득 차면 버림 – 수신 루프는 절대 막지 않음)
+    ingest_stage.put((bed_id, sensor_id_from_topic, u_val, call_button))
+
+def _apply_sample(bed_id: str, sensor_id_from_topic: str, u_val, call_button: int):
+    """수신 샘플을 침대 상태에 반영 (틱 스레드에서만 호출)"""
+    s = store.slot(bed_id)
+    if s is None:
+        return
+    m_applied.inc()
+
+    prev_call = int(store.call_button[s])
+    store.call_button[s] = call_button
 
     # 토픽에서 센서 ID 정규화
     sensor_id = sensor_id_from_topic
     if sensor_id.lower().startswith("esp32-"):
         sensor_id = "ESP32-" + sensor_id.split("-", 1)[1]
 
-    if u_val is not None and sensor_id in ULTRA_COLS:
+    col = ULTRA_IDX.get(sensor_id)
+    if u_val is not None and col is not None:
         try:
-            bed_ultra_state[bed_id][sensor_id] = float(u_val)
-            # print(f"[DEBUG] bed_ultra_state 업데이트: bed_id={bed_id}, {sensor_id}={u_val}")  # 디버그 추가
-        except Exception as e:
-            # print(f"[DEBUG] 초음파 값 저장 실패: {e}")  # 디버그 추가
+            store.ultra[s, col] = float(u_val)
+        except Exception:
             pass
 
-    # ACK 발행
-    status = "received" if u_val is not None else "skipped"
-    ack_topic = f"esp/{bed_id}/{sensor_id_from_topic}/ack"
-    client.publish(ack_topic, json.dumps({"status": status}), qos=1, retain=False)
-
-    # 초음파 버퍼/모델 실행
-    _flush_ultrasonic_if_due()
-
     # 서버 전송
-    _maybe_publish(bed_id, prev_call)
+    _maybe_publish(s, prev_call)
+
+def _tick_loop():
+    """
+    perf_counter 격자(ULTRA_FLUSH_INTERVAL)로 샘플링.
+    틱 사이에는 ingest 큐를 비우고, 틱 시각이 되면 스냅샷을 뜬다.
+    메시지가 몰리거나 끊겨도 샘플 간격은 일정하게 유지된다.
+    """
+    last_stats = time.time()
+    last_ack = time.time()
+    last_metrics = time.time()
+    next_t = time.perf_counter()
+    while running:
+        next_t += ULTRA_FLUSH_INTERVAL
+
+        # 다음 틱까지 수신 샘플 반영
+        while True:
+            remaining = next_t - time.perf_counter()
+            if remaining <= 0:
+                break
+            item = ingest_stage.get(timeout=remaining)
+            if item is None:
+                break
+            try:
+                _apply_sample(*item)
+            except Exception as e:
+                print(f"\n[{get_timestamp()}] 샘플 처리 실패: {e}")
+
+        fired = time.perf_counter()
+        tick_clock.mark(next_t, fired)
+
+        # 한 주기 이상 밀렸으면 밀린 틱은 건너뛰고 격자에 다시 맞춤
+        behind = int((fired - next_t) // ULTRA_FLUSH_INTERVAL)
+        if behind > 0:
+            tick_clock.missed += behind
+            next_t += behind * ULTRA_FLUSH_INTERVAL
+
+        # 초음파 스냅샷/모델 실행, 지난 추론으로 바뀐 fall_event 발행
+        _flush_ultrasonic()
+        _publish_fall_changes()
+        _flush_publish_batch()
+
+        if ACK_MODE == "coalesce" and local_client and time.time() - last_ack >= ACK_COALESCE_SEC:
+            last_ack = time.time()
+            _flush_coalesced_acks(local_client)
+
+        if PIPE_STATS_SEC > 0 and time.time() - last_stats >= PIPE_STATS_SEC:
+            last_stats = time.time()
+            _print_pipeline_stats()
+
+        if METRICS_MQTT_SEC > 0 and time.time() - last_metrics >= METRICS_MQTT_SEC:
+            last_metrics = time.time()
+            _publish_metrics()
+
+def _publish_metrics():
+    """지표 요약을 서버 지표 토픽으로 (QoS 0 – 끊겨 있으면 그냥 버림, outbox 안 씀)"""
+    if not server_client.is_connected():
+        return
+    snap = metrics.snapshot()
+    snap["ts"] = get_timestamp()
+    server_client.publish(GATEWAY_METRICS_TOPIC, json.dumps(snap, separators=(",", ":")), qos=0)
+
+def _print_pipeline_stats():
+    parts = [ingest_stage.summary()] + [st.summary() for st in infer_stages]
+    parts.append(f"csv depth={csv_writer.qsize()} drop={csv_writer.dropped}")
+    parts.append(f"ack({ACK_MODE}) sent={ack_published} covered={ack_covered}")
+    parts.append(outbox.summary())
+    print(f"\n[{get_timestamp()}] [파이프라인] " + " | ".join(parts))
+    print(f"[{get_timestamp()}] [샘플링] {tick_clock.summary()}")
 
 def on_local_disconnect(client, userdata, rc):
     print(f"\n[{get_timestamp()}] 로컬 브로커 연결 해제 (rc={rc})")
 
 
 def signal_handler(sig, frame):
+    global running
+    running = False
     ts = get_timestamp()
     print(f"\n[{ts}] 프로그램 종료 중...")
     if local_client:
@@ -436,6 +633,8 @@ def signal_handler(sig, frame):
             local_client.disconnect()
         except Exception:
             pass
+    csv_writer.close()
+    outbox.close()
     if server_client:
         try:
             server_client.loop_stop()
@@ -453,6 +652,12 @@ def main():
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
+    _connect_server()
+
+    if METRICS_PORT > 0:
+        metrics.serve(METRICS_PORT)
+        print(f"[{get_timestamp()}] 지표: http://127.0.0.1:{METRICS_PORT}/metrics")
+
     local_client = mqtt.Client()
     # LWT: 비정상 종료 시 offline 자동 발행
     local_client.will_set(GATEWAY_STATUS_TOPIC, "offline", qos=1, retain=True)
@@ -461,6 +666,11 @@ def main():
     local_client.on_message    = on_local_message
     local_client.on_disconnect = on_local_disconnect
 
+    # 틱 스레드 + 추론 워커 시작
+    threading.Thread(target=_tick_loop, name="tick", daemon=True).start()
+    for st in infer_stages:
+        threading.Thread(target=_infer_worker, args=(st,), name=st.name, daemon=True).start()
+
     local_client.connect(LOCAL_BROKER, LOCAL_PORT, keepalive=60)
 
     print(f"[{get_timestamp()}] 게이트웨이 브리지 시작...")
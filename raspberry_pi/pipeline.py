@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+게이트웨이 처리 단계 사이의 큐 (backpressure + 통계)
+
+MQTT 수신 → 틱(샘플링) → 추론 워커 사이를 크기가 정해진 큐로 잇는다.
+put()은 절대 블록하지 않고, 가득 차면 버리고 dropped를 올린다.
+"""
+
+import queue
+
+
+class Stage:
+    __slots__ = ("name", "q", "maxsize", "enqueued", "dropped", "max_depth")
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self.q = queue.Queue(maxsize=maxsize)
+        self.enqueued = 0    # 넣은 개수
+        self.dropped = 0     # 큐가 가득 차서 버린 개수
+        self.max_depth = 0   # 마지막 stats() 이후 최대 깊이
+
+    def put(self, item) -> bool:
+        try:
+            self.q.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        d = self.q.qsize()
+        if d > self.max_depth:
+            self.max_depth = d
+        return True
+
+    def get(self, timeout=None):
+        """항목 하나. timeout 동안 없으면 None"""
+        try:
+            return self.q.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def get_nowait(self):
+        try:
+            return self.q.get_nowait()
+        except queue.Empty:
+            return None
+
+    def depth(self) -> int:
+        return self.q.qsize()
+
+    def stats(self, reset_max: bool = True) -> dict:
+        s = {
+            "depth": self.depth(),
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+        }
+        if reset_max:
+            self.max_depth = s["depth"]
+        return s
+
+    def summary(self) -> str:
+        """한 줄 요약 (최대 깊이는 초기화)"""
+        s = self.stats()
+        return f"{self.name} depth={s['depth']}/{self.maxsize} max={s['max_depth']} in={s['enqueued']} drop={s['dropped']}"
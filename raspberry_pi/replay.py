@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+pi_publisher 오프라인 재생기 (ESP32 없이 부하/회귀 테스트)
+
+캡처해 둔 CSV(label_out/*.csv, 라벨링 CSV)나 MQTT JSON 라인 로그를
+pi_publisher와 같은 경로로 흘려보낸다.
+  on_local_message(파싱/ACK) → ingest 큐 → 틱(상태 반영 + 스냅샷)
+    → infer 워커(윈도우/특징/추론) → fall_event 상태머신
+틱은 벽시계 대신 데이터 시간 기준 0.2초 격자로 재생기가 직접 돌리고,
+틱마다 추론 워커가 끝날 때까지 기다리므로 결과(전이)는 속도와 무관하게 같다.
+
+입력 형식
+  - CSV : timestamp,bed_id,ESP32-1..4 (label_out) 또는 timestamp,label,ESP32-1..4
+          한 행 = 한 틱 (bed_id 없는 파일은 --bed 값 사용)
+  - JSONL: 한 줄에 {"ts": "YYYY-mm-dd HH:MM:SS.fff" 또는 epoch초, "topic": "esp/A/ESP32-1/data",
+           "payload": {...} 또는 문자열}
+
+사용 예
+    MODEL_DIR=models/251127 python replay.py label_out/unlabeled_NH-001_301A.csv --speed max
+    MODEL_DIR=models/251127 python replay.py "dataset/test Sets/"*.csv --beds 40 --speed 5
+"""
+
+import os, csv, json, time, argparse, tempfile, threading
+from datetime import datetime
+
+# pi_publisher import 전에 설정 (CSV는 임시 폴더로, 예측 출력/주기 통계 끔)
+os.environ.setdefault("LABEL_DIR", tempfile.mkdtemp(prefix="replay_"))
+os.environ.setdefault("PRINT_PREDICTIONS", "0")
+os.environ.setdefault("PIPE_STATS_SEC", "0")
+os.environ.setdefault("CSV_ROTATE_DAILY", "0")
+os.environ.setdefault("OUTBOX_PATH", os.path.join(os.environ["LABEL_DIR"], "outbox.db"))
+os.environ.setdefault("OUTBOX_RATE", "100000")
+if "MODEL_DIR" not in os.environ:
+    _here = os.path.dirname(os.path.abspath(__file__))
+    _models = os.path.join(_here, "models")
+    if os.path.isdir(_models):
+        os.environ["MODEL_DIR"] = os.path.join(_models, sorted(os.listdir(_models))[-1])
+
+import numpy as np
+import pi_publisher as pp
+
+TICK = pp.ULTRA_FLUSH_INTERVAL
+
+
+# ========= 입력 읽기 =========
+class _Msg:
+    """paho MQTTMessage 대신 쓰는 최소 객체"""
+    __slots__ = ("topic", "payload", "retain")
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+        self.retain = False
+
+
+class _RecordingClient:
+    """publish만 받아서 세어두는 클라이언트 (ACK / 서버 전송용, QoS 1은 바로 PUBACK)"""
+
+    class _Res:
+        rc = 0
+
+        def __init__(self, mid):
+            self.mid = mid
+
+    def __init__(self):
+        self.count = 0
+        self.last = None
+        self.on_publish = None
+
+    def is_connected(self):
+        return True
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.count += 1
+        self.last = (topic, payload)
+        res = self._Res(self.count)
+        if qos and self.on_publish:
+            self.on_publish(self, None, res.mid)
+        return res
+
+
+def _parse_ts(v):
+    if isinstance(v, (int, float)):
+        return float(v)
+    for fmt in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.strptime(v, fmt).timestamp()
+        except ValueError:
+            pass
+    raise ValueError(f"시간 형식 오류: {v!r}")
+
+
+def csv_ticks(path, default_bed):
+    """CSV → 틱 리스트. 각 틱은 [(topic, payload bytes), ...]"""
+    ticks = []
+    cur, cur_ts, cur_beds = [], None, set()
+    with open(path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            bed = r.get("bed_id") or default_bed
+            ts = r.get("timestamp")
+            # 같은 timestamp의 여러 침대 행은 한 틱 (같은 침대가 또 나오면 다음 틱)
+            if cur and (ts != cur_ts or bed in cur_beds):
+                ticks.append(cur)
+                cur, cur_beds = [], set()
+            cur_ts = ts
+            cur_beds.add(bed)
+            for cid in pp.ULTRA_COLS:
+                v = r.get(cid)
+                if v in (None, ""):
+                    continue
+                body = json.dumps({"ultrasonic_cm": float(v), "call_button": 0}).encode("utf-8")
+                cur.append((f"esp/{bed}/{cid}/data", body))
+    if cur:
+        ticks.append(cur)
+    return ticks
+
+
+def jsonl_ticks(path):
+    """MQTT JSON 라인 → 데이터 시간 0.2초 격자 틱 리스트"""
+    events = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            d = json.loads(line)
+            payload = d.get("payload", {})
+            if not isinstance(payload, (bytes, str)):
+                payload = json.dumps(payload)
+            if isinstance(payload, str):
+                payload = payload.encode("utf-8")
+            events.append((_parse_ts(d["ts"]), d["topic"], payload))
+    if not events:
+        return []
+    events.sort(key=lambda e: e[0])
+    t0 = events[0][0]
+    n = int((events[-1][0] - t0) / TICK) + 1
+    ticks = [[] for _ in range(n)]
+    for t, topic, payload in events:
+        ticks[min(n - 1, int((t - t0) / TICK))].append((topic, payload))
+    return ticks
+
+
+def fan_out(ticks, n_beds):
+    """같은 입력을 침대 n개로 복제 (bed_id에 -k 붙임) – 용량 산정용"""
+    if n_beds <= 1:
+        return ticks
+    out = []
+    for msgs in ticks:
+        tick = []
+        for topic, payload in msgs:
+            parts = topic.split("/")
+            for k in range(n_beds):
+                p = list(parts)
+                p[1] = f"{parts[1]}-{k}"
+                tick.append(("/".join(p), payload))
+        out.append(tick)
+    return out
+
+
+def merge(streams):
+    """여러 파일의 틱을 같은 격자에 겹침"""
+    n = max((len(s) for s in streams), default=0)
+    return [[m for s in streams if i < len(s) for m in s[i]] for i in range(n)]
+
+
+# ========= 재생 =========
+class Replayer:
+    def __init__(self):
+        self.ack_client = _RecordingClient()
+        pp.server_client = _RecordingClient()
+        pp.outbox.start(pp.server_client)
+
+        self.parse_us = []     # 메시지 1개 파싱/ACK/큐 투입
+        self.tick_us = []      # 틱: ingest 반영 + 스냅샷 + 워커 전달
+        self.infer_us = []     # 워커 배치 1개 (특징/추론/상태머신)
+        self.e2e_us = []       # 틱 시작 → 그 틱의 추론 완료
+        self.transitions = []  # (틱 번호, bed_id, 이전, 이후)
+        self.tick_no = 0
+
+        self._done = 0
+        self._cv = threading.Condition()
+
+        # 워커 배치 완료 시각 측정
+        orig_batch = pp._run_model_batch
+
+        def timed_batch(due):
+            t0 = time.perf_counter()
+            try:
+                orig_batch(due)
+            finally:
+                self.infer_us.append((time.perf_counter() - t0) * 1e6)
+                with self._cv:
+                    self._done += 1
+                    self._cv.notify_all()
+        pp._run_model_batch = timed_batch
+
+        # fall_event 전이 기록
+        sm = pp.fall_sm
+        orig_step_all = sm.step_all
+
+        def step_all(slots, ys):
+            before = sm.state[np.asarray(slots, dtype=np.int64)].copy()
+            after = orig_step_all(slots, ys)
+            for s, b, a in zip(slots, before.tolist(), after.tolist()):
+                if b != a:
+                    self.transitions.append((self.tick_no, pp.store.bed_ids[s], b, a))
+            return after
+        sm.step_all = step_all
+
+        for st in pp.infer_stages:
+            threading.Thread(target=pp._infer_worker, args=(st,), name=st.name, daemon=True).start()
+
+    def _submitted(self):
+        return sum(st.enqueued for st in pp.infer_stages)
+
+    def run(self, ticks, speed):
+        """speed: 배속 (0 = 최대 속도)"""
+        n_msgs = 0
+        start = time.perf_counter()
+        # 서버 발행 최소 간격도 데이터 시간으로 (벽시계면 max 배속에서 대부분 억제됨)
+        t_data = time.time()
+        pp.pub_clock = lambda: t_data + self.tick_no * TICK
+        for i, msgs in enumerate(ticks):
+            self.tick_no = i
+            if speed > 0:
+                due = start + i * TICK / speed
+                d = due - time.perf_counter()
+                if d > 0:
+                    time.sleep(d)
+
+            # 1) MQTT 수신 단계
+            for topic, payload in msgs:
+                t0 = time.perf_counter()
+                pp.on_local_message(self.ack_client, None, _Msg(topic, payload))
+                self.parse_us.append((time.perf_counter() - t0) * 1e6)
+            n_msgs += len(msgs)
+
+            # 2) 틱 단계 (pp._tick_loop 한 바퀴와 같음)
+            t0 = time.perf_counter()
+            item = pp.ingest_stage.get_nowait()
+            while item is not None:
+                pp._apply_sample(*item)
+                item = pp.ingest_stage.get_nowait()
+            pp._flush_ultrasonic()
+            pp._publish_fall_changes()
+            pp._flush_publish_batch()
+            t1 = time.perf_counter()
+            self.tick_us.append((t1 - t0) * 1e6)
+
+            # 3) 이번 틱 추론 완료까지 대기
+            target = self._submitted()
+            with self._cv:
+                self._cv.wait_for(lambda: self._done >= target, timeout=10.0)
+            self.e2e_us.append((time.perf_counter() - t0) * 1e6)
+
+        # 마지막 틱 추론 결과도 다음 틱처럼 발행
+        pp._publish_fall_changes()
+        pp._flush_publish_batch()
+        wall = time.perf_counter() - start
+        return n_msgs, wall
+
+
+def _pct(xs):
+    if not xs:
+        return "n=0"
+    a = np.asarray(xs)
+    return (f"n={a.size} p50={np.percentile(a, 50):.0f}us p90={np.percentile(a, 90):.0f}us "
+            f"p99={np.percentile(a, 99):.0f}us max={a.max():.0f}us")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="pi_publisher 오프라인 재생")
+    ap.add_argument("inputs", nargs="+", help="CSV 또는 .jsonl 파일")
+    ap.add_argument("--speed", default="max", help="1, 5, ... 배속 또는 max")
+    ap.add_argument("--beds", type=int, default=1, help="입력을 침대 N개로 복제")
+    ap.add_argument("--bed", default="A", help="bed_id 열이 없는 CSV에 쓸 bed_id")
+    ap.add_argument("--show", type=int, default=20, help="출력할 전이 개수")
+    ap.add_argument("--metrics", action="store_true", help="끝나고 게이트웨이 지표(Prometheus 텍스트) 출력")
+    args = ap.parse_args()
+
+    streams = []
+    for p in args.inputs:
+        streams.append(jsonl_ticks(p) if p.endswith((".jsonl", ".json")) else csv_ticks(p, args.bed))
+    ticks = fan_out(merge(streams), args.beds)
+    speed = 0.0 if args.speed == "max" else float(args.speed)
+
+    print(f"모델: {os.environ.get('MODEL_DIR')}  틱 {len(ticks)}개 (데이터 {len(ticks) * TICK:.1f}초), 속도={args.speed}")
+    r = Replayer()
+    n_msgs, wall = r.run(ticks, speed)
+
+    n_beds = pp.store.n
+    print("=" * 60)
+    print(f"침대 {n_beds}개, 메시지 {n_msgs}개, {wall:.2f}초")
+    print(f"처리량: {n_msgs / wall:,.0f} samples/s, {len(ticks) / wall:,.1f} ticks/s")
+    print(f"  파싱   {_pct(r.parse_us)}")
+    print(f"  틱     {_pct(r.tick_us)}")
+    print(f"  추론   {_pct(r.infer_us)}")
+    print(f"  틱+추론 {_pct(r.e2e_us)}")
+    if r.e2e_us:
+        p99 = np.percentile(r.e2e_us, 99) / 1e6
+        print(f"  → 틱 예산 {TICK * 1000:.0f}ms 중 p99 {p99 * 1000:.1f}ms 사용"
+              f" (같은 비율이면 약 {int(n_beds * TICK / p99) if p99 > 0 else 0}개 침대까지)")
+    print(f"  drop: ingest={pp.ingest_stage.dropped} infer={sum(st.dropped for st in pp.infer_stages)}"
+          f" csv={pp.csv_writer.dropped} 침대초과={pp.store.rejected}")
+    pp.outbox.close()
+    print(f"서버 발행 {pp.server_client.count}개 ({pp.outbox.summary()})")
+    print(f"fall_event 전이 {len(r.transitions)}개")
+    for tick_no, bed, b, a in r.transitions[:args.show]:
+        print(f"  t={tick_no * TICK:8.1f}s bed={bed} {b}->{a}")
+
+    pp.csv_writer.close()
+    if args.metrics:
+        print("=" * 60)
+        print(pp.metrics.render(), end="")
+
+
+if __name__ == "__main__":
+    main()
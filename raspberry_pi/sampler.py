@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+고정 격자 샘플링 타이밍 통계
+
+pi_labeling.writer_loop처럼 perf_counter 기준 next_t += 주기 격자로 틱을 돌리고,
+각 틱이 예정 시각보다 얼마나 늦었는지 / 틱 간격 / 윈도우(N틱) 실제 길이를
+히스토그램으로 모은다. 모델이 학습한 1.6초 윈도우가 실제로도 1.6초인지 확인용.
+"""
+
+import bisect
+from collections import deque
+
+# 지연(ms) 버킷 상한 – 로그 간격
+LATE_BOUNDS_MS = [0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+
+class Histogram:
+    """고정 버킷 히스토그램 (값 단위는 호출하는 쪽에서 정함)"""
+
+    __slots__ = ("bounds", "counts", "count", "sum", "max")
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)   # 마지막 = +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, v: float):
+        self.counts[bisect.bisect_left(self.bounds, v)] += 1
+        self.count += 1
+        self.sum += v
+        if v > self.max:
+            self.max = v
+
+    def percentile(self, p: float) -> float:
+        """p(0~100) 분위가 들어있는 버킷의 상한 (마지막 버킷이면 max)"""
+        if not self.count:
+            return 0.0
+        rank = p / 100.0 * self.count
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= rank and c:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def summary(self, unit: str = "ms") -> str:
+        return (f"n={self.count} mean={self.mean():.1f}{unit} p50<={self.percentile(50):g}{unit} "
+                f"p99<={self.percentile(99):g}{unit} max={self.max:.1f}{unit}")
+
+
+class TickClock:
+    """
+    틱 타이밍 기록.
+    mark(예정시각, 실제시각)을 틱마다 호출 (둘 다 perf_counter 초).
+    """
+
+    def __init__(self, period: float, window_ticks: int):
+        self.period = period
+        self.window_ticks = window_ticks
+        period_ms = period * 1000.0
+        window_ms = period_ms * (window_ticks - 1)   # 샘플 N개 = 간격 N-1개
+
+        self.late_ms = Histogram(LATE_BOUNDS_MS)
+        # 간격/윈도우 길이는 목표값 ±(지연 버킷)으로 본다
+        self.interval_ms = Histogram([period_ms + d for d in [-b for b in reversed(LATE_BOUNDS_MS)] + LATE_BOUNDS_MS])
+        self.window_ms   = Histogram([window_ms + d for d in [-b for b in reversed(LATE_BOUNDS_MS)] + LATE_BOUNDS_MS])
+        self.target_window_ms = window_ms
+
+        self.ticks = 0
+        self.missed = 0     # 한 주기 이상 밀려서 건너뛴 틱 수
+        self._recent = deque(maxlen=window_ticks)
+
+    def mark(self, scheduled: float, fired: float):
+        self.ticks += 1
+        self.late_ms.observe(max(0.0, fired - scheduled) * 1000.0)
+        if self._recent:
+            self.interval_ms.observe((fired - self._recent[-1]) * 1000.0)
+        self._recent.append(fired)
+        if len(self._recent) == self.window_ticks:
+            self.window_ms.observe((fired - self._recent[0]) * 1000.0)
+
+    def summary(self) -> str:
+        return (f"ticks={self.ticks} missed={self.missed}\n"
+                f"  늦음   {self.late_ms.summary()}\n"
+                f"  간격   {self.interval_ms.summary()}\n"
+                f"  윈도우 {self.window_ms.summary()} (목표 {self.target_window_ms:.0f}ms)")
@@ -0,0 +1,80 @@
+"""
+window_features 증분 구현 = 기준 구현(extract_features_from_window) 동일성 검사
+
+    python -m pytest test_window_features.py
+데이터셋 CSV("jupyter lab/datasets/datasets/*.csv") 한 파일을 한 침대로 보고
+매 샘플마다 두 구현의 특징 벡터를 비교한다.
+"""
+
+import csv, glob, os, random
+from collections import deque
+
+import numpy as np
+import pytest
+
+from window_features import BedWindow, ULTRA_COLS, extract_features_from_window
+
+DATASET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "..", "jupyter lab", "datasets", "datasets")
+DATASETS = sorted(glob.glob(os.path.join(DATASET_DIR, "*.csv")))
+
+# 모델과 무관하게 모든 특징을 비교
+ALL_FEATURES = [f"{c}_{s}" for c in ULTRA_COLS for s in (
+    "mean", "std", "min", "max", "median",
+    "range", "first_last_diff", "mean_diff", "max_diff",
+)]
+
+
+def _load_csv_rows(path, cols=ULTRA_COLS):
+    rows = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            rows.append([float(r[c]) if r.get(c) not in (None, "") else None for c in cols])
+    return rows
+
+
+def _compare(rows, size, atol=1e-9):
+    """(비교 횟수, 불일치 수)"""
+    win = BedWindow(size)
+    buf = deque(maxlen=size)
+    checked = mismatched = 0
+    for vals in rows:
+        win.push(vals)
+        buf.append(dict(zip(ULTRA_COLS, (float("nan") if v is None else v for v in vals))))
+        if len(buf) < size:
+            continue
+        ref = extract_features_from_window(list(buf), ALL_FEATURES)
+        got = win.features(ALL_FEATURES)
+        checked += 1
+        if ref is None or got is None:
+            mismatched += (ref is None) != (got is None)
+        elif not np.allclose(ref, got, rtol=0, atol=atol):
+            mismatched += 1
+    return checked, mismatched
+
+
+@pytest.mark.parametrize("path", DATASETS, ids=os.path.basename)
+def test_matches_reference_on_dataset(path):
+    checked, mismatched = _compare(_load_csv_rows(path), size=8)
+    assert checked > 0
+    assert mismatched == 0
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 8, 16])
+def test_matches_reference_with_bad_values(size):
+    # 불량값(None/음수)과 같은 값 반복(std=0, 최소/최대 동률)이 섞인 입력
+    rnd = random.Random(size)
+
+    def value():
+        x = rnd.random()
+        if x < 0.01:
+            return None
+        if x < 0.02:
+            return -1.0
+        return 50.0 if x < 0.4 else rnd.uniform(0, 300)
+
+    rows = [[value() for _ in ULTRA_COLS] for _ in range(5000)]
+    # 값 수백 cm 에 std 0.01 미만인 윈도우는 누적합 상쇄 오차가 1e-9 를 넘을 수 있음
+    checked, mismatched = _compare(rows, size, atol=1e-6)
+    assert checked > 0
+    assert mismatched == 0
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+침대별 슬라이딩 윈도우 특징 계산 (증분 방식)
+
+pi_publisher는 0.2초마다 침대별로 샘플 1개를 추가하고, stride마다
+윈도우(8개) 통계를 모델에 넣는다. 매번 NumPy 배열을 새로 만들어
+처음부터 다시 계산하던 것을, 샘플이 들어올 때 누적값만 갱신하도록 바꾼 모듈.
+
+  - 평균/표준편차 : 합, 제곱합 (기준값 K만큼 이동시켜 상쇄 오차 완화)
+  - 최소/최대     : 링 칸 번호를 담는 원형 단조 큐
+  - 중앙값        : 길이 고정 정렬 버퍼 (윈도우가 작아서 insort로 충분)
+  - 변화량        : |x_t - x_{t-1}| 합 + 원형 단조 큐(최대값)
+버퍼는 처음에 윈도우 크기만큼 잡아 두고 샘플마다 새 객체를 만들지 않는다.
+
+기준 구현(extract_features_from_window)과 같은지: python -m pytest test_window_features.py
+"""
+
+import math
+from bisect import bisect_left, insort
+
+import numpy as np
+
+ULTRA_COLS = ["ESP32-1", "ESP32-2", "ESP32-3", "ESP32-4"]
+
+# 누적합 부동소수 오차가 쌓이지 않도록 이 횟수마다 윈도우 전체로 다시 합산
+RESYNC_EVERY = 4096
+
+INF = float("inf")
+
+
+def extract_features_from_window(window_rows, feature_order, cols=ULTRA_COLS):
+    """
+    (기준 구현) 윈도우 전체를 매번 다시 계산한다.
+    window_rows: 각 원소는 {"timestamp":..., "ESP32-1":..., ...}
+    반환: feature_order 길이만큼의 1D numpy 배열. 품질 나쁘면 None.
+    """
+    feats = {}
+
+    for col in cols:
+        arr = np.array([row[col] for row in window_rows], dtype=float)
+
+        # 실시간에서는 라벨 기반 보간 못 하므로,
+        # 음수/NaN 있으면 이 윈도우는 버리는 방식이 가장 단순하다.
+        if np.any((arr < 0) | np.isnan(arr)):
+            return None
+
+        # 1) 기본 통계
+        feats[f"{col}_mean"]   = float(arr.mean())
+        feats[f"{col}_std"]    = float(arr.std())
+        feats[f"{col}_min"]    = float(arr.min())
+        feats[f"{col}_max"]    = float(arr.max())
+        feats[f"{col}_median"] = float(np.median(arr))
+
+        # 2) 윈도우 안 요동 크기
+        feats[f"{col}_range"]           = float(arr.max() - arr.min())
+        feats[f"{col}_first_last_diff"] = float(arr[-1] - arr[0])
+
+        # 3) 윈도우 안 속도/변화량
+        if len(arr) >= 2:
+            diffs = np.abs(np.diff(arr))        # |x_t - x_{t-1}|
+            feats[f"{col}_mean_diff"] = float(diffs.mean())
+            feats[f"{col}_max_diff"]  = float(diffs.max())
+        else:
+            feats[f"{col}_mean_diff"] = 0.0
+            feats[f"{col}_max_diff"]  = 0.0
+
+    # feature_order 순서에 맞춰 벡터 구성
+    x_vec = np.array([feats[k] for k in feature_order], dtype=float)
+    return x_vec
+
+
+class _ColumnWindow:
+    """
+    센서 1개(열 1개)에 대한 고정 길이 윈도우 + 누적 통계
+
+    버퍼는 모두 생성할 때 size 길이 리스트로 잡아 두고 칸만 바꿔 쓴다 (샘플마다 튜플/리스트 없음).
+      - vals  : 값 링, 불량값은 NaN
+      - diffs : 변화량 링 (직전 값 → 이 값의 변화량을 이 값과 같은 칸에), 불량 구간은 NaN
+      - min/max/dmax 큐 : 링의 칸 번호를 담는 원형 단조 큐 (값은 링에서 읽음)
+      - sorted_vals : 정상값 정렬 버퍼 (앞 n_sorted 칸만 사용, 뒤는 inf 로 채워 길이 고정)
+    """
+
+    __slots__ = (
+        "size", "vals", "pos", "seq", "n", "bad",
+        "shift", "s1", "s2",
+        "min_q", "min_h", "min_n", "max_q", "max_h", "max_n",
+        "sorted_vals", "n_sorted",
+        "diffs", "d_sum", "dmax_q", "dmax_h", "dmax_n",
+    )
+
+    def __init__(self, size: int):
+        self.size = size
+        self.vals = [0.0] * size     # 값 링
+        self.pos = 0                 # 다음 값을 쓸 칸 (가득 차면 가장 오래된 값의 칸)
+        self.seq = 0                 # 지금까지 들어온 샘플 수 (누적합 재계산 주기)
+        self.n = 0                   # 윈도우 안 샘플 수 (≤ size)
+        self.bad = 0                 # 윈도우 안 불량값(음수/NaN) 개수
+
+        self.shift = None            # 분산 계산 기준값 K
+        self.s1 = 0.0                # Σ(x-K)    (정상값만)
+        self.s2 = 0.0                # Σ(x-K)^2
+
+        # 원형 단조 큐 = 버퍼(링의 칸 번호) + 머리 위치(_h) + 길이(_n)
+        self.min_q = [0] * size      # 값 단조 증가
+        self.min_h = self.min_n = 0
+        self.max_q = [0] * size      # 값 단조 감소
+        self.max_h = self.max_n = 0
+        self.sorted_vals = [INF] * size   # 앞 n_sorted 칸이 정상값, 나머지 inf
+        self.n_sorted = 0
+
+        self.diffs = [0.0] * size    # 변화량 링
+        self.d_sum = 0.0
+        self.dmax_q = [0] * size     # 변화량 단조 감소
+        self.dmax_h = self.dmax_n = 0
+
+    # ---------- 갱신 ----------
+    def push(self, v):
+        v = float("nan") if v is None else float(v)
+        size = self.size
+        slot = self.pos
+        prev_slot = slot - 1 if slot else size - 1
+        self.pos = slot + 1 if slot + 1 < size else 0
+        seq = self.seq
+        self.seq = seq + 1
+
+        # 1) 오래된 값 제거 (가장 오래된 값은 지금 덮어쓸 칸에 있음)
+        if self.n == size:
+            self._pop_oldest(slot)
+        else:
+            self.n += 1
+
+        vals = self.vals
+        bad_v = v != v or v < 0          # NaN 또는 음수
+
+        # 2) 변화량 추가 (직전 값과 쌍)
+        if self.n > 1:
+            prev = vals[prev_slot]
+            if bad_v or prev != prev:
+                d = float("nan")
+            else:
+                d = abs(v - prev)
+                self.d_sum += d
+                q, diffs = self.dmax_q, self.diffs
+                h, k = self.dmax_h, self.dmax_n
+                while k:
+                    j = h + k - 1
+                    if diffs[q[j - size if j >= size else j]] > d:
+                        break
+                    k -= 1
+                j = h + k
+                q[j - size if j >= size else j] = slot
+                self.dmax_n = k + 1
+            self.diffs[slot] = d
+
+        # 3) 값 추가
+        if bad_v:
+            v = float("nan")
+            self.bad += 1
+        else:
+            if self.shift is None:
+                self.shift = v
+            dv = v - self.shift
+            self.s1 += dv
+            self.s2 += dv * dv
+
+            q, h, k = self.min_q, self.min_h, self.min_n
+            while k:
+                j = h + k - 1
+                if vals[q[j - size if j >= size else j]] < v:
+                    break
+                k -= 1
+            j = h + k
+            q[j - size if j >= size else j] = slot
+            self.min_n = k + 1
+
+            q, h, k = self.max_q, self.max_h, self.max_n
+            while k:
+                j = h + k - 1
+                if vals[q[j - size if j >= size else j]] > v:
+                    break
+                k -= 1
+            j = h + k
+            q[j - size if j >= size else j] = slot
+            self.max_n = k + 1
+
+            # 정렬 버퍼: 맨 끝 inf 하나를 빼고 끼워 넣음 (길이 그대로 → 재할당 없음)
+            sv = self.sorted_vals
+            sv.pop()
+            insort(sv, v)
+            self.n_sorted += 1
+        vals[slot] = v
+
+        if seq and seq % RESYNC_EVERY == 0:
+            self._resync()
+
+    def _pop_oldest(self, slot):
+        """slot 칸의 값(윈도우의 가장 오래된 값) 제거"""
+        size = self.size
+        v = self.vals[slot]
+        if v != v:
+            self.bad -= 1
+        else:
+            dv = v - self.shift
+            self.s1 -= dv
+            self.s2 -= dv * dv
+            if self.min_n and self.min_q[self.min_h] == slot:
+                self.min_h = self.min_h + 1 if self.min_h + 1 < size else 0
+                self.min_n -= 1
+            if self.max_n and self.max_q[self.max_h] == slot:
+                self.max_h = self.max_h + 1 if self.max_h + 1 < size else 0
+                self.max_n -= 1
+            sv = self.sorted_vals
+            del sv[bisect_left(sv, v, 0, self.n_sorted)]
+            sv.append(INF)
+            self.n_sorted -= 1
+
+        # 빠지는 값과 다음 값 사이의 변화량도 같이 빠진다
+        if size > 1:
+            nxt = slot + 1 if slot + 1 < size else 0
+            d = self.diffs[nxt]
+            if d == d:
+                self.d_sum -= d
+                if self.dmax_n and self.dmax_q[self.dmax_h] == nxt:
+                    self.dmax_h = self.dmax_h + 1 if self.dmax_h + 1 < size else 0
+                    self.dmax_n -= 1
+
+    def _resync(self):
+        """누적합을 윈도우 값으로 다시 계산 (기준값도 최근 값으로 옮김)"""
+        size, n, pos = self.size, self.n, self.pos
+        order = [(pos - n + i) % size for i in range(n)]     # 오래된 칸 → 최근 칸
+        good = [self.vals[i] for i in order if self.vals[i] == self.vals[i]]
+        self.shift = good[-1] if good else None
+        self.s1 = sum(v - self.shift for v in good) if good else 0.0
+        self.s2 = sum((v - self.shift) ** 2 for v in good) if good else 0.0
+        ds = [self.diffs[i] for i in order[1:]]
+        self.d_sum = sum(d for d in ds if d == d)
+
+    # ---------- 조회 ----------
+    def ready(self) -> bool:
+        return self.n == self.size and self.bad == 0
+
+    def stats(self, out: dict, col: str):
+        size, n, pos = self.size, self.n, self.pos
+        vals = self.vals
+        vmin = vals[self.min_q[self.min_h]]
+        vmax = vals[self.max_q[self.max_h]]
+
+        mean_d = self.s1 / n
+        if vmax == vmin:
+            std = 0.0
+        else:
+            std = math.sqrt(max(0.0, self.s2 / n - mean_d * mean_d))
+
+        sv = self.sorted_vals
+        h = n // 2
+        median = sv[h] if n % 2 else (sv[h - 1] + sv[h]) / 2.0
+
+        out[f"{col}_mean"]   = self.shift + mean_d
+        out[f"{col}_std"]    = std
+        out[f"{col}_min"]    = vmin
+        out[f"{col}_max"]    = vmax
+        out[f"{col}_median"] = median
+
+        out[f"{col}_range"]           = vmax - vmin
+        out[f"{col}_first_last_diff"] = vals[pos - 1] - vals[(pos - n) % size]
+
+        if n >= 2:
+            out[f"{col}_mean_diff"] = self.d_sum / (n - 1)
+            out[f"{col}_max_diff"]  = self.diffs[self.dmax_q[self.dmax_h]]
+        else:
+            out[f"{col}_mean_diff"] = 0.0
+            out[f"{col}_max_diff"]  = 0.0
+
+
+class BedWindow:
+    """
+    침대 1개의 4채널 슬라이딩 윈도우.
+    push()로 0.2초 샘플을 넣고, features()로 FEATURE_ORDER 벡터를 얻는다.
+    """
+
+    __slots__ = ("size", "cols", "_cols")
+
+    def __init__(self, size: int, cols=ULTRA_COLS):
+        self.size = size
+        self.cols = list(cols)
+        self._cols = [_ColumnWindow(size) for _ in self.cols]
+
+    def __len__(self):
+        return self._cols[0].n
+
+    def push(self, vals):
+        """vals: cols 순서의 센서값 리스트 (None/음수는 불량값으로 처리)"""
+        for cw, v in zip(self._cols, vals):
+            cw.push(v)
+
+    def features(self, feature_order):
+        """윈도우가 가득 차고 불량값이 없으면 특징 벡터, 아니면 None"""
+        if len(self) < self.size:
+            return None
+        feats = {}
+        for col, cw in zip(self.cols, self._cols):
+            if cw.bad:
+                return None
+            cw.stats(feats, col)
+        return np.array([feats[k] for k in feature_order], dtype=float)